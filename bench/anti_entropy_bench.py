@@ -0,0 +1,66 @@
+"""
+Convergence time and idle bandwidth of anti-entropy, adaptive vs fixed.
+
+For each mode a local 3-node cluster is started, node1 receives --polls
+updates through /internal/counter/update only (so push replication does
+not help) and the time until every node has them is measured. The cluster
+is then left idle for --idle seconds and the anti-entropy bytes pulled
+during that window are summed from /metrics.
+
+Usage:
+    python bench/anti_entropy_bench.py --polls 500 --idle 30
+"""
+import argparse
+import time
+
+import httpx
+
+from cluster import HEADERS, LocalCluster
+
+
+def total_ae_bytes(urls) -> int:
+    return sum(httpx.get(f"{u}/metrics").json()["anti_entropy"]["bytes_total"] for u in urls)
+
+
+def run(mode: str, polls: int, idle: float, base_port: int) -> dict:
+    env = {"ANTI_ENTROPY_ADAPTIVE": "1" if mode == "adaptive" else "0"}
+    with LocalCluster(3, base_port=base_port, env=env) as cluster:
+        # let anti-entropy loops get past their startup delay
+        time.sleep(5)
+
+        node1, others = cluster.urls[0], cluster.urls[1:]
+        with httpx.Client(headers=HEADERS) as client:
+            for i in range(polls):
+                client.post(
+                    f"{node1}/internal/counter/update",
+                    json={"poll_id": f"p{i}", "option": "A", "node_id": "node1", "value": 1},
+                ).raise_for_status()
+
+        started = time.monotonic()
+        while True:
+            if all(len(httpx.get(f"{u}/polls").json()["poll_ids"]) >= polls for u in others):
+                break
+            time.sleep(0.1)
+        converged = time.monotonic() - started
+
+        before = total_ae_bytes(cluster.urls)
+        time.sleep(idle)
+        idle_bytes = total_ae_bytes(cluster.urls) - before
+
+    return {"mode": mode, "convergence_s": round(converged, 2), "idle_bytes": idle_bytes}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=500)
+    parser.add_argument("--idle", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=18900)
+    args = parser.parse_args()
+
+    for mode in ("fixed", "adaptive"):
+        r = run(mode, args.polls, args.idle, args.port)
+        print(f"{r['mode']:>8}: convergence={r['convergence_s']}s idle_bytes={r['idle_bytes']} over {args.idle}s")
+
+
+if __name__ == "__main__":
+    main()
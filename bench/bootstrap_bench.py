@@ -0,0 +1,117 @@
+"""
+Time-to-ready of a node bootstrapping from a peer snapshot.
+
+Starts a "source" node (uvicorn subprocess) on a synthetic data directory of
+roughly --mb megabytes, then starts an empty node in-process pointing at it
+and measures how long its lifespan startup (bootstrap + recovery) takes.
+
+Usage:
+    python bench/bootstrap_bench.py --mb 1024
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+NODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node")
+TOKEN = "bench-token"
+
+
+def write_synthetic_checkpoint(path: str, target_bytes: int, nodes: int = 5) -> int:
+    """
+    Write a checkpoint.json of about target_bytes. Returns the number of polls.
+    """
+    polls = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"polls": {')
+        while f.tell() < target_bytes:
+            counts = {
+                opt: {f"node{n}": (polls * 7 + n) % 1000 + 1 for n in range(1, nodes + 1)}
+                for opt in ("A", "B", "C")
+            }
+            if polls:
+                f.write(",")
+            f.write(json.dumps(f"poll{polls:08d}"))
+            f.write(":")
+            f.write(json.dumps({"counts": counts, "closed": False}))
+            polls += 1
+        f.write("}}")
+    return polls
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/status", timeout=1.0).raise_for_status()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=1024, help="approximate state size in MB")
+    parser.add_argument("--port", type=int, default=18901)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bootstrap-bench-")
+    src_dir = os.path.join(work, "src")
+    dst_dir = os.path.join(work, "dst")
+    os.makedirs(src_dir)
+
+    t0 = time.perf_counter()
+    polls = write_synthetic_checkpoint(os.path.join(src_dir, "checkpoint.json"), args.mb * 1024 * 1024)
+    size = os.path.getsize(os.path.join(src_dir, "checkpoint.json"))
+    print(f"generated {polls} polls, {size / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s")
+
+    env = dict(
+        os.environ,
+        NODE_ID="source",
+        PORT=str(args.port),
+        DATA_DIR=src_dir,
+        INTERNAL_TOKEN=TOKEN,
+        PEERS="",
+    )
+    source = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=NODE_DIR,
+        env=env,
+    )
+
+    try:
+        source_url = f"http://127.0.0.1:{args.port}"
+        wait_ready(source_url, timeout=3600)
+
+        os.environ.update(
+            NODE_ID="fresh",
+            DATA_DIR=dst_dir,
+            INTERNAL_TOKEN=TOKEN,
+            PEERS=source_url,
+            BASE_STARTUP_DELAY="3600",
+        )
+        sys.path.insert(0, NODE_DIR)
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        t0 = time.perf_counter()
+        with TestClient(app) as client:
+            ready = time.perf_counter() - t0
+            n = len(client.get("/polls").json()["poll_ids"])
+
+        print(f"time-to-ready: {ready:.2f}s for {size / 1e6:.1f} MB ({n} polls recovered)")
+    finally:
+        source.terminate()
+        source.wait()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Helpers to run a small cluster of nodes as local uvicorn processes
+(no Docker), used by the benchmarks in this folder.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+NODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node")
+TOKEN = "bench-token"
+HEADERS = {"X-Internal-Token": TOKEN}
+
+
+class LocalCluster:
+    def __init__(self, size: int, base_port: int = 18900, env: Dict[str, str] | None = None):
+        self.size = size
+        self.base_port = base_port
+        self.env = env or {}
+        self.work = tempfile.mkdtemp(prefix="cluster-bench-")
+        self.procs: List[subprocess.Popen] = []
+
+    def url(self, i: int) -> str:
+        return f"http://127.0.0.1:{self.base_port + i}"
+
+    @property
+    def urls(self) -> List[str]:
+        return [self.url(i) for i in range(1, self.size + 1)]
+
+    def _spawn(self, i: int, peers: List[str], size: int) -> None:
+        env = dict(
+            os.environ,
+            NODE_ID=f"node{i}",
+            PORT=str(self.base_port + i),
+            ADVERTISE_URL=self.url(i),
+            PEERS=",".join(peers),
+            CLUSTER_SIZE=str(size),
+            DATA_DIR=os.path.join(self.work, f"node{i}"),
+            INTERNAL_TOKEN=TOKEN,
+            BASE_STARTUP_DELAY="0",
+            LOG_LEVEL="WARNING",
+            **self.env,
+        )
+        self.procs.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app",
+                 "--port", str(self.base_port + i), "--log-level", "warning"],
+                cwd=NODE_DIR,
+                env=env,
+            )
+        )
+
+    def start(self) -> "LocalCluster":
+        for i in range(1, self.size + 1):
+            peers = [self.url(j) for j in range(1, self.size + 1) if j != i]
+            self._spawn(i, peers, self.size)
+
+        for url in self.urls:
+            wait_ready(url)
+        return self
+
+    def add_node(self) -> str:
+        """
+        Start one more node that only knows node1; it joins at runtime.
+        """
+        self.size += 1
+        self._spawn(self.size, [self.url(1)], 2)
+        wait_ready(self.url(self.size))
+        return self.url(self.size)
+
+    def stop(self) -> None:
+        for p in self.procs:
+            p.terminate()
+        for p in self.procs:
+            p.wait()
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def __enter__(self) -> "LocalCluster":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/status", timeout=1.0).raise_for_status()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready")
@@ -0,0 +1,104 @@
+"""
+Vote latency and throughput per durability level.
+
+A local 3-node cluster is started with rate limits off. For each level,
+--clients concurrent clients send --votes votes in total to node1, every
+vote carrying "durability": <level>. p50/p99 latency, votes/s and WAL
+fsyncs per vote on node1 are reported. Votes rejected by admission control
+(503/429) are retried after a short pause and counted.
+
+Latency differences only show when fsync is expensive (a real disk, not a
+write-cached VM volume); fsyncs per vote do not depend on the hardware.
+
+Usage:
+    python bench/durability_bench.py --votes 2000 --clients 32
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from cluster import LocalCluster
+
+LEVELS = ("fsync", "group", "replicated", "memory")
+
+
+async def group_flushes(http: httpx.AsyncClient, url: str) -> int:
+    resp = await http.get(f"{url}/metrics")
+    return resp.json()["durability"]["group_commit"]["flushes"]
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_level(url: str, level: str, votes: int, clients: int) -> dict:
+    latencies: list[float] = []
+    rejected = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(votes):
+        queue.put_nowait(i)
+
+    async def client(http: httpx.AsyncClient) -> None:
+        nonlocal rejected
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            while True:
+                started = time.perf_counter()
+                resp = await http.post(
+                    f"{url}/vote",
+                    json={"poll_id": f"{level}-{i % 50}", "option": "A", "durability": level},
+                )
+                if resp.status_code not in (429, 503):
+                    break
+                rejected += 1
+                await asyncio.sleep(0.05)
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as http:
+        flushes = await group_flushes(http, url)
+        started = time.perf_counter()
+        await asyncio.gather(*[client(http) for _ in range(clients)])
+        elapsed = time.perf_counter() - started
+        # let background flushes (replicated) finish before counting
+        await asyncio.sleep(0.5)
+        flushes = await group_flushes(http, url) - flushes
+
+    fsyncs = votes if level == "fsync" else flushes
+    return {
+        "level": level,
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 2),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 2),
+        "votes_per_s": round(votes / elapsed),
+        "fsyncs_per_vote": round(fsyncs / votes, 3),
+        "rejected": rejected,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18900)
+    args = parser.parse_args()
+
+    env = {"RATE_LIMIT_CLIENT_RPS": "0", "RATE_LIMIT_POLL_RPS": "0"}
+    with LocalCluster(3, base_port=args.port, env=env) as cluster:
+        node1 = cluster.urls[0]
+        for level in LEVELS:
+            r = asyncio.run(run_level(node1, level, args.votes, args.clients))
+            print(
+                f"{r['level']:>10}: p50={r['p50_ms']}ms p99={r['p99_ms']}ms "
+                f"{r['votes_per_s']} votes/s fsyncs/vote={r['fsyncs_per_vote']} rejected={r['rejected']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
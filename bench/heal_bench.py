@@ -0,0 +1,123 @@
+"""
+Heal cost of merging a diverged remote state, at --components components.
+
+"legacy" is the previous path: pydantic-validate the ClusterCRDTState, then
+one CounterUpdate, one WAL append (and fsync) and one apply per newer
+component. "batched" is merge_cluster_state: plain-dict decode, a single
+traversal that plans the merge, one WAL batch with one fsync, then an
+in-place apply. Both start from the same local state and write to a
+throwaway DATA_DIR; fsyncs are counted around each run.
+
+Usage:
+    python bench/heal_bench.py --components 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="heal-bench-")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+from app import state  # noqa: E402
+from app.codec import decode_cluster_state  # noqa: E402
+from app.locks import state_lock  # noqa: E402
+from app.models import ClusterCRDTState, CounterUpdate  # noqa: E402
+from app.replication import merge_cluster_state  # noqa: E402
+from app.storage import append_wal_update, ensure_storage, truncate_wal  # noqa: E402
+
+OPTIONS = 3
+NODES = 5
+
+
+def build_states(components: int) -> tuple[dict, bytes]:
+    """
+    Local state and a remote state that is ahead on every component.
+    """
+    polls = max(1, components // (OPTIONS * NODES))
+    local = {
+        f"poll{i:07d}": {
+            f"opt{o}": {f"node{n}": 1 for n in range(1, NODES + 1)}
+            for o in range(OPTIONS)
+        }
+        for i in range(polls)
+    }
+    remote = {
+        "polls": {
+            pid: {"counts": {opt: {n: v + 1 for n, v in nodes.items()} for opt, nodes in opts.items()}}
+            for pid, opts in local.items()
+        }
+    }
+    return local, json.dumps(remote).encode("utf-8")
+
+
+def heal_legacy(body: bytes) -> int:
+    other = ClusterCRDTState.model_validate_json(body)
+    applied = 0
+    for poll_id, poll in other.polls.items():
+        for opt, nodes in poll.counts.items():
+            for node_id, value in nodes.items():
+                upd = CounterUpdate(poll_id=poll_id, option=opt, node_id=node_id, value=value)
+                with state_lock:
+                    if state.would_change_update(upd):
+                        append_wal_update(upd)
+                        state.apply_update(upd)
+                        applied += 1
+    return applied
+
+
+def heal_batched(body: bytes) -> int:
+    return merge_cluster_state(decode_cluster_state(body))
+
+
+class FsyncCounter:
+    def __init__(self) -> None:
+        self.calls = 0
+        self._fsync = os.fsync
+
+    def __enter__(self) -> "FsyncCounter":
+        def counting(fd):
+            self.calls += 1
+            return self._fsync(fd)
+
+        os.fsync = counting
+        return self
+
+    def __exit__(self, *exc) -> None:
+        os.fsync = self._fsync
+
+
+def measure(label: str, heal, local: dict, body: bytes) -> None:
+    state.replace_cluster_state(json.loads(json.dumps(local)), [])
+    truncate_wal()
+
+    with FsyncCounter() as fsyncs:
+        t0 = time.perf_counter()
+        applied = heal(body)
+        elapsed = time.perf_counter() - t0
+
+    print(
+        f"  {label:<7} heal {elapsed * 1000:10.1f} ms   applied {applied:8d}"
+        f"   fsyncs {fsyncs.calls:8d}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--components", type=int, default=100_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="only run the batched path")
+    args = parser.parse_args()
+
+    ensure_storage()
+    local, body = build_states(args.components)
+    print(f"heal ({args.components} divergent components, {len(body) / 1e6:.1f} MB remote state)")
+    if not args.skip_legacy:
+        measure("legacy", heal_legacy, local, body)
+    measure("batched", heal_batched, local, body)
+    truncate_wal()
+
+
+if __name__ == "__main__":
+    main()
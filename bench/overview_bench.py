@@ -0,0 +1,89 @@
+"""
+Cost of a cluster-wide convergence check, per-node reads vs GET /cluster/overview.
+
+A local 3-node cluster is loaded with --polls polls through
+/internal/cluster-merge and left to converge. "per-node" is what the
+PowerShell tests do today, extended to every poll: /status from each
+node, then the counts of every poll from each node (one batched
+POST /polls/counts per node, the cheapest existing read) and a compare.
+"overview" is one GET /cluster/overview: the first call (cold per-poll
+digests), then refresh=true with warm digests, then a cached one.
+
+Usage:
+    python bench/overview_bench.py --polls 20000
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+from cluster import HEADERS, LocalCluster
+
+
+def load(url: str, polls: int) -> None:
+    state = {
+        "polls": {
+            f"p{i}": {"counts": {"A": {"node1": i % 7 + 1}, "B": {"node2": 1}}, "closed": False}
+            for i in range(polls)
+        },
+        "archived": {},
+    }
+    httpx.post(
+        f"{url}/internal/cluster-merge",
+        content=json.dumps(state).encode("utf-8"),
+        headers={**HEADERS, "Content-Type": "application/json"},
+        timeout=120.0,
+    ).raise_for_status()
+
+
+def per_node_check(client: httpx.Client, urls) -> tuple[bool, int]:
+    nbytes = 0
+    views = []
+    for url in urls:
+        resp = client.get(f"{url}/status")
+        nbytes += len(resp.content)
+        poll_ids = client.get(f"{url}/polls").json()["poll_ids"]
+        counts = {}
+        for start in range(0, len(poll_ids), 1000):
+            resp = client.post(f"{url}/polls/counts", json={"poll_ids": poll_ids[start:start + 1000]})
+            nbytes += len(resp.content)
+            counts.update(resp.json()["polls"])
+        views.append(counts)
+    return all(v == views[0] for v in views), nbytes
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, round(1000 * (time.perf_counter() - started), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=18900)
+    args = parser.parse_args()
+
+    env = {"RATE_LIMIT_CLIENT_RPS": "0", "RATE_LIMIT_POLL_RPS": "0"}
+    with LocalCluster(3, base_port=args.port, env=env) as cluster:
+        node1 = cluster.urls[0]
+        load(node1, args.polls)
+
+        with httpx.Client(timeout=120.0) as client:
+            resp, ms = timed(lambda: client.get(f"{node1}/cluster/overview"))
+            print(f"      cold: {ms} ms, {len(resp.content)} bytes, converged={resp.json()['converged']}")
+            while not client.get(f"{node1}/cluster/overview", params={"refresh": True}).json()["converged"]:
+                time.sleep(1)
+
+            (same, nbytes), ms = timed(lambda: per_node_check(client, cluster.urls))
+            print(f"  per-node: {ms} ms, {nbytes} bytes, converged={same}")
+
+            for label, params in (("overview", {"refresh": True}), ("cached", {})):
+                resp, ms = timed(lambda: client.get(f"{node1}/cluster/overview", params=params))
+                body = resp.json()
+                print(f"{label:>10}: {ms} ms, {len(resp.content)} bytes, converged={body['converged']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Startup recovery cost of the checkpoint, at --polls polls.
+
+"v2" loads the whole JSON checkpoint into g_counter (the previous format).
+"v3" only maps the indexed checkpoint and parses its index; polls are read
+on first access. For each: time to ready, memory retained after loading
+(tracemalloc, separate run), and the cost of the first read of one poll.
+
+Usage:
+    python bench/recovery_bench.py --polls 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+from app import state  # noqa: E402
+from app.checkpoint import LazyCheckpoint, encode_checkpoint_chunks  # noqa: E402
+from app.codec import decode_checkpoint, encode_checkpoint  # noqa: E402
+
+
+def build_counter(polls: int, options: int = 3, nodes: int = 5) -> dict:
+    return {
+        f"poll{i:07d}": {
+            f"opt{o}": {f"node{n}": (i + o + n) % 1000 + 1 for n in range(1, nodes + 1)}
+            for o in range(options)
+        }
+        for i in range(polls)
+    }
+
+
+def load_v2(path: str) -> None:
+    with open(path, "rb") as f:
+        counter, closed = decode_checkpoint(f.read())
+    state.replace_cluster_state(counter, closed)
+
+
+def load_v3(path: str) -> None:
+    state.replace_cluster_state({}, [], LazyCheckpoint.open(path))
+
+
+def measure(label: str, load, path: str, poll_id: str) -> None:
+    t0 = time.perf_counter()
+    load(path)
+    ready = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    state.query_poll_counts(poll_id)
+    first_read = time.perf_counter() - t0
+    state.replace_cluster_state({}, [])
+
+    tracemalloc.start()
+    load(path)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    state.replace_cluster_state({}, [])
+
+    print(
+        f"  {label:<4} ready {ready * 1000:9.1f} ms   retained {retained / 1e6:8.1f} MB"
+        f"   first read {first_read * 1e6:7.1f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    counter = build_counter(args.polls)
+    tmp = tempfile.mkdtemp(prefix="recovery-bench-")
+    v2_path = os.path.join(tmp, "checkpoint.v2")
+    v3_path = os.path.join(tmp, "checkpoint.v3")
+
+    with open(v2_path, "wb") as f:
+        f.write(encode_checkpoint(counter, ()))
+    with open(v3_path, "wb") as f:
+        for chunk in encode_checkpoint_chunks(counter, set(), LazyCheckpoint()):
+            f.write(chunk)
+    del counter
+
+    poll_id = f"poll{args.polls // 2:07d}"
+    print(f"recovery ({args.polls} polls)")
+    measure("v2", load_v2, v2_path, poll_id)
+    measure("v3", load_v3, v3_path, poll_id)
+    print(
+        f"checkpoint size: v2 {os.path.getsize(v2_path) / 1e6:.1f} MB,"
+        f" v3 {os.path.getsize(v3_path) / 1e6:.1f} MB"
+    )
+    os.remove(v2_path)
+    os.remove(v3_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Export / checkpoint / load cost of the state serializer, at --polls polls.
+
+"legacy" reproduces the original path: export_cluster_state() (copies +
+one PollCRDTState per poll), model_dump(), json.dump(indent=2) and
+ClusterCRDTState(**data) on load. "fast" is the codec path used now.
+Time is wall clock of an untraced run; peak memory is the tracemalloc peak
+of a second, traced run.
+
+Usage:
+    python bench/serialization_bench.py --polls 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+from app import state  # noqa: E402
+from app.codec import decode_checkpoint, encode_checkpoint, encode_cluster_state  # noqa: E402
+from app.models import ClusterCRDTState  # noqa: E402
+
+
+def populate(polls: int, options: int = 3, nodes: int = 5) -> None:
+    counter = {
+        f"poll{i:07d}": {
+            f"opt{o}": {f"node{n}": (i + o + n) % 1000 + 1 for n in range(1, nodes + 1)}
+            for o in range(options)
+        }
+        for i in range(polls)
+    }
+    state.replace_cluster_state(counter, [])
+
+
+def measure(label: str, fn):
+    # timed and traced in separate runs: tracemalloc slows allocations down
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<12} {elapsed * 1000:9.1f} ms   peak {peak / 1e6:8.1f} MB")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    populate(args.polls)
+    path = os.path.join(tempfile.mkdtemp(prefix="ser-bench-"), "checkpoint.json")
+
+    print(f"legacy ({args.polls} polls)")
+    measure("export", lambda: state.export_cluster_state())
+
+    def legacy_checkpoint():
+        payload = state.export_cluster_state().model_dump()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    measure("checkpoint", legacy_checkpoint)
+    legacy_size = os.path.getsize(path)
+
+    def legacy_load():
+        with open(path, "r", encoding="utf-8") as f:
+            return ClusterCRDTState(**json.load(f))
+
+    measure("load", legacy_load)
+
+    print(f"fast ({args.polls} polls)")
+    measure("export", lambda: encode_cluster_state(state.g_counter, state.closed_polls, {}))
+
+    def fast_checkpoint():
+        with open(path, "wb") as f:
+            f.write(encode_checkpoint(state.g_counter, state.closed_polls))
+
+    measure("checkpoint", fast_checkpoint)
+    fast_size = os.path.getsize(path)
+
+    def fast_load():
+        with open(path, "rb") as f:
+            return decode_checkpoint(f.read())
+
+    measure("load", fast_load)
+
+    print(f"checkpoint size: legacy {legacy_size / 1e6:.1f} MB, fast {fast_size / 1e6:.1f} MB")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
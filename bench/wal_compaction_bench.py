@@ -0,0 +1,83 @@
+"""
+WAL size and replay time before and after compaction.
+
+Writes --votes counter updates spread over --components components (each
+record carries the component's new absolute value, as /vote does), then
+measures the on-disk WAL and the time to replay it; compacts and measures
+again. Writes go to a throwaway DATA_DIR in batches, so fsync cost is not
+part of the numbers.
+
+Usage:
+    python bench/wal_compaction_bench.py --votes 1000000 --components 10000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="wal-bench-")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "node"))
+
+from app.storage import (  # noqa: E402
+    append_wal_batch,
+    compact_wal,
+    ensure_storage,
+    load_wal_records,
+    truncate_wal,
+    wal_size_bytes,
+)
+
+BATCH = 10_000
+
+
+def write_votes(votes: int, components: int) -> None:
+    rng = random.Random(0)
+    keys = [(f"poll{i // 15:06d}", f"opt{i // 5 % 3}", f"node{i % 5}") for i in range(components)]
+    values = [0] * components
+
+    batch = []
+    for _ in range(votes):
+        i = rng.randrange(components)
+        values[i] += 1
+        batch.append((*keys[i], values[i]))
+        if len(batch) == BATCH:
+            append_wal_batch(batch)
+            batch = []
+    append_wal_batch(batch)
+
+
+def measure(label: str) -> None:
+    t0 = time.perf_counter()
+    records = load_wal_records()
+    replay = time.perf_counter() - t0
+    print(
+        f"  {label:<6} size {wal_size_bytes() / 1e6:8.1f} MB   records {len(records):9d}"
+        f"   replay {replay * 1000:9.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--components", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    ensure_storage()
+    truncate_wal()
+    write_votes(args.votes, args.components)
+
+    print(f"wal compaction ({args.votes} votes over {args.components} components)")
+    measure("before")
+    t0 = time.perf_counter()
+    compact_wal(0)
+    print(f"  compaction {(time.perf_counter() - t0) * 1000:.1f} ms")
+    measure("after")
+    truncate_wal()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# admission control + backpressure for the vote path
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List
+
+from fastapi import HTTPException, Request
+
+from .config import (
+    RATE_LIMIT_CLIENT_RPS,
+    RATE_LIMIT_CLIENT_BURST,
+    RATE_LIMIT_POLL_RPS,
+    RATE_LIMIT_POLL_BURST,
+    RATE_LIMIT_MAX_KEYS,
+    REPLICATION_MAX_INFLIGHT,
+    REPLICATION_HIGH_WATERMARK,
+    WAL_HIGH_WATERMARK_BYTES,
+    TRUSTED_PROXIES,
+)
+from .storage import wal_size_bytes
+from .executors import io_executor
+from .membership import tuning
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: float) -> float:
+        """
+        Take one token. Returns 0 on success, otherwise the number of seconds
+        until a token becomes available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per key, bounded to max_keys (least recently used
+    buckets are dropped; a dropped bucket simply restarts full).
+    Only used from the event loop, so no locking.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def try_acquire(self, key: str, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+
+        return bucket.try_acquire(now)
+
+
+client_limiter = RateLimiter(RATE_LIMIT_CLIENT_RPS, RATE_LIMIT_CLIENT_BURST, RATE_LIMIT_MAX_KEYS)
+poll_limiter = RateLimiter(RATE_LIMIT_POLL_RPS, RATE_LIMIT_POLL_BURST, RATE_LIMIT_MAX_KEYS)
+
+_replication_inflight = 0
+_replication_tasks: set[asyncio.Task] = set()
+
+counters: Dict[str, int] = {
+    "accepted": 0,
+    "rejected_client_rate": 0,
+    "rejected_poll_rate": 0,
+    "rejected_replication_backlog": 0,
+    "rejected_wal_backlog": 0,
+    "rejected_io_backlog": 0,
+    "replication_dropped": 0,
+}
+
+
+def _parse_networks(spec: str) -> List[ipaddress.IPv4Network | ipaddress.IPv6Network]:
+    networks = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("Ignoring TRUSTED_PROXIES entry %r", item)
+    return networks
+
+
+trusted_proxies = _parse_networks(TRUSTED_PROXIES)
+
+
+@lru_cache(maxsize=1024)
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in net for net in trusted_proxies)
+
+
+def client_key(request: Request) -> str:
+    host = request.client.host if request.client else "unknown"
+    # Behind the proxy the peer address is nginx; it forwards the real one.
+    # Anyone else could send a fresh X-Real-IP per request and never run
+    # out of tokens, so the header only counts from a trusted proxy.
+    if trusted_proxies and _is_trusted_proxy(host):
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip
+    return host
+
+
+def _reject(status_code: int, counter: str, detail: str, retry_after: float) -> None:
+    counters[counter] += 1
+    raise HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def check_vote_admission(request: Request, poll_id: str) -> None:
+    """
+    Fast rejection before any lock, WAL write or replication work:
+    - 503 when the replication backlog, the WAL or the io queue is past
+      its watermark
+    - 429 when the client or the poll is over its rate limit
+    """
+    if _replication_inflight >= REPLICATION_HIGH_WATERMARK:
+        _reject(503, "rejected_replication_backlog", "Replication backlog full", 1)
+
+    if wal_size_bytes() >= WAL_HIGH_WATERMARK_BYTES:
+        _reject(503, "rejected_wal_backlog", "WAL backlog full", tuning.checkpoint_interval)
+
+    if io_executor.full():
+        _reject(503, "rejected_io_backlog", "Storage queue full", 1)
+
+    now = time.monotonic()
+
+    wait = client_limiter.try_acquire(client_key(request), now)
+    if wait > 0:
+        _reject(429, "rejected_client_rate", "Client rate limit exceeded", wait)
+
+    wait = poll_limiter.try_acquire(poll_id, now)
+    if wait > 0:
+        _reject(429, "rejected_poll_rate", "Poll rate limit exceeded", wait)
+
+    counters["accepted"] += 1
+
+
+def spawn_replication(make_coro: Callable[[], Awaitable[None]]) -> bool:
+    """
+    Start a best-effort replication task unless REPLICATION_MAX_INFLIGHT
+    tasks are already running. A dropped push is repaired by anti-entropy.
+    Returns True iff the task was started.
+    """
+    global _replication_inflight
+
+    if _replication_inflight >= REPLICATION_MAX_INFLIGHT:
+        counters["replication_dropped"] += 1
+        return False
+
+    _replication_inflight += 1
+    task = asyncio.create_task(make_coro())
+    _replication_tasks.add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        global _replication_inflight
+        _replication_inflight -= 1
+        _replication_tasks.discard(t)
+
+    task.add_done_callback(_done)
+    return True
+
+
+def admission_stats() -> dict:
+    return {
+        "replication_inflight": _replication_inflight,
+        "wal_size_bytes": wal_size_bytes(),
+        "counters": dict(counters),
+        "thresholds": {
+            "replication_max_inflight": REPLICATION_MAX_INFLIGHT,
+            "replication_high_watermark": REPLICATION_HIGH_WATERMARK,
+            "wal_high_watermark_bytes": WAL_HIGH_WATERMARK_BYTES,
+            "client_rate_rps": RATE_LIMIT_CLIENT_RPS,
+            "client_burst": RATE_LIMIT_CLIENT_BURST,
+            "poll_rate_rps": RATE_LIMIT_POLL_RPS,
+            "poll_burst": RATE_LIMIT_POLL_BURST,
+        },
+    }
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from .config import DATA_DIR, ARCHIVE_FILE, ARCHIVE_INDEX_FILE, ARCHIVE_CACHE_SIZE
+from .locks import storage_lock
+
+logger = logging.getLogger(__name__)
+
+PollCounts = Dict[str, Dict[str, int]]
+
+# archive_index[poll_id] = (offset, length, digest) of the latest record
+# for that poll inside ARCHIVE_FILE. Loaded once at startup; the poll data
+# itself stays on disk and is read lazily.
+archive_index: Dict[str, Tuple[int, int, str]] = {}
+
+_cache: "OrderedDict[str, PollCounts]" = OrderedDict()
+
+
+def poll_digest(counts: PollCounts) -> str:
+    """
+    Order-independent digest of one poll's counts, used by anti-entropy to
+    compare archived polls without shipping their state.
+    """
+    canonical = json.dumps(counts, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_archive_index() -> None:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    archive_index.clear()
+    _cache.clear()
+
+    if not os.path.exists(ARCHIVE_INDEX_FILE):
+        return
+
+    with storage_lock:
+        with open(ARCHIVE_INDEX_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    for poll_id, (offset, length, digest) in data.items():
+        archive_index[poll_id] = (int(offset), int(length), str(digest))
+
+    logger.info("Archive index loaded: polls=%d", len(archive_index))
+
+
+def _write_index() -> None:
+    tmp_file = ARCHIVE_INDEX_FILE + ".tmp"
+    payload = {pid: list(entry) for pid, entry in archive_index.items()}
+
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_file, ARCHIVE_INDEX_FILE)
+
+
+def is_archived(poll_id: str) -> bool:
+    return poll_id in archive_index
+
+
+def archived_digests() -> Dict[str, str]:
+    return {pid: entry[2] for pid, entry in archive_index.items()}
+
+
+def archived_digest(poll_id: str) -> str | None:
+    entry = archive_index.get(poll_id)
+    return entry[2] if entry is not None else None
+
+
+def archive_polls(polls: Dict[str, PollCounts]) -> None:
+    """
+    Append the given polls to the archive and publish them in the index.
+    Data is fsync'd before the index is replaced, so the index never points
+    to bytes that are not on disk.
+    """
+    if not polls:
+        return
+
+    with storage_lock:
+        new_entries: List[Tuple[str, Tuple[int, int, str]]] = []
+
+        with open(ARCHIVE_FILE, "ab") as f:
+            for poll_id, counts in polls.items():
+                record = {"poll_id": poll_id, "counts": counts}
+                data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                offset = f.tell()
+                f.write(data)
+                new_entries.append((poll_id, (offset, len(data), poll_digest(counts))))
+            f.flush()
+            os.fsync(f.fileno())
+
+        for poll_id, entry in new_entries:
+            archive_index[poll_id] = entry
+            _cache.pop(poll_id, None)
+
+        _write_index()
+
+
+def read_archived_poll(poll_id: str) -> PollCounts | None:
+    """
+    Lazily read one archived poll. Recently read polls are kept in a small
+    LRU cache so repeated reads of the same cold poll do not hit the disk.
+    """
+    entry = archive_index.get(poll_id)
+    if entry is None:
+        return None
+
+    cached = _cache.get(poll_id)
+    if cached is not None:
+        _cache.move_to_end(poll_id)
+        return cached
+
+    offset, length, _ = entry
+    with storage_lock:
+        with open(ARCHIVE_FILE, "rb") as f:
+            f.seek(offset)
+            raw = f.read(length)
+
+    counts: PollCounts = json.loads(raw)["counts"]
+
+    _cache[poll_id] = counts
+    if len(_cache) > ARCHIVE_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+    return counts
+
@@ -0,0 +1,234 @@
+"""
+Fast bootstrap of a node that starts with an empty data directory.
+
+Instead of rebuilding state through many anti-entropy rounds, the node picks
+one healthy peer and streams its on-disk state (checkpoint, WAL tail and
+archive) straight into local storage. The normal recovery path then loads it.
+
+Stream format: for each file, one JSON header line
+{"name": ..., "size": ...} followed by exactly `size` raw bytes.
+"""
+import io
+import json
+import logging
+import os
+import random
+import time
+from typing import BinaryIO, Iterator, List, Tuple
+
+import httpx
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from .config import (
+    PEERS,
+    DATA_DIR,
+    CHECKPOINT_FILE,
+    WAL_FILE,
+    ARCHIVE_FILE,
+    ARCHIVE_INDEX_FILE,
+    CONNECT_TIMEOUT,
+    REQUEST_TIMEOUT,
+    BOOTSTRAP_CHUNK_SIZE,
+)
+from .locks import state_lock, storage_lock
+from .security import verify_internal_token
+from .storage import ensure_storage, is_checkpoint_empty, read_wal_bytes, wal_size_bytes
+from .utils import internal_auth_headers
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Files in the order they are streamed. The archive index goes last so that
+# a receiver never publishes an index pointing past the archive data.
+SNAPSHOT_FILES = {
+    "checkpoint": CHECKPOINT_FILE,
+    "wal": WAL_FILE,
+    "archive": ARCHIVE_FILE,
+    "archive_index": ARCHIVE_INDEX_FILE,
+}
+
+
+def _open_snapshot() -> List[Tuple[str, BinaryIO, int]]:
+    """
+    Take a consistent cut of the local files.
+
+    Holding state_lock + storage_lock guarantees no WAL append, checkpoint
+    or archive write is in progress. Checkpoint and archive index are
+    replaced atomically, so an open descriptor keeps the old inode alive;
+    the archive is append-only, so its current size bounds a valid prefix.
+    The WAL is truncated in place at checkpoint time and split into
+    segments by compaction, so all its segments are copied now, as one
+    file (they only hold updates since the last checkpoint).
+    """
+    ensure_storage()
+    opened: List[Tuple[str, BinaryIO, int]] = []
+
+    with state_lock:
+        with storage_lock:
+            for name, path in SNAPSHOT_FILES.items():
+                if not os.path.exists(path):
+                    continue
+
+                if name == "wal":
+                    data = read_wal_bytes()
+                    opened.append((name, io.BytesIO(data), len(data)))
+                    continue
+
+                f = open(path, "rb")
+                opened.append((name, f, os.fstat(f.fileno()).st_size))
+
+    return opened
+
+
+def _iter_snapshot(files: List[Tuple[str, BinaryIO, int]]) -> Iterator[bytes]:
+    try:
+        for name, f, size in files:
+            header = json.dumps({"name": name, "size": size}) + "\n"
+            yield header.encode("utf-8")
+
+            remaining = size
+            while remaining > 0:
+                chunk = f.read(min(BOOTSTRAP_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"Snapshot file {name} shrank while streaming")
+                remaining -= len(chunk)
+                yield chunk
+    finally:
+        for _, f, _ in files:
+            f.close()
+
+
+@router.get("/internal/bootstrap/snapshot")
+def internal_bootstrap_snapshot(_: None = Depends(verify_internal_token)):
+    files = _open_snapshot()
+    return StreamingResponse(_iter_snapshot(files), media_type="application/octet-stream")
+
+
+def is_storage_empty() -> bool:
+    """
+    True iff this node has never persisted any state.
+    """
+    ensure_storage()
+    if os.path.exists(ARCHIVE_INDEX_FILE) or wal_size_bytes() > 0:
+        return False
+
+    return is_checkpoint_empty()
+
+
+async def _is_healthy(client: httpx.AsyncClient, peer: str) -> bool:
+    """
+    At startup there is no heartbeat history yet, so health is probed
+    directly through /status.
+    """
+    try:
+        resp = await client.get(f"{peer}/status", timeout=CONNECT_TIMEOUT)
+        resp.raise_for_status()
+        return True
+    except Exception as e:
+        logger.info("Bootstrap: peer %s not reachable: %r", peer, e)
+        return False
+
+
+async def _stream_snapshot_from_peer(client: httpx.AsyncClient, peer: str) -> int:
+    """
+    Stream a peer snapshot into `<file>.bootstrap` temporaries and move them
+    into place only once every file has been received completely.
+    Returns the number of bytes received.
+    """
+    tmp_paths: List[Tuple[str, str]] = []
+    out: BinaryIO | None = None
+    total = 0
+
+    try:
+        async with client.stream(
+            "GET",
+            f"{peer}/internal/bootstrap/snapshot",
+            headers=internal_auth_headers(),
+        ) as resp:
+            resp.raise_for_status()
+
+            buf = b""
+            remaining = 0
+
+            async for chunk in resp.aiter_bytes(BOOTSTRAP_CHUNK_SIZE):
+                buf += chunk
+                total += len(chunk)
+
+                while buf:
+                    if out is None:
+                        nl = buf.find(b"\n")
+                        if nl < 0:
+                            break
+                        header = json.loads(buf[:nl])
+                        buf = buf[nl + 1:]
+
+                        path = SNAPSHOT_FILES[header["name"]]
+                        tmp_path = path + ".bootstrap"
+                        tmp_paths.append((tmp_path, path))
+                        out = open(tmp_path, "wb")
+                        remaining = int(header["size"])
+
+                    part = buf[:remaining]
+                    buf = buf[remaining:]
+                    out.write(part)
+                    remaining -= len(part)
+
+                    if remaining == 0:
+                        out.flush()
+                        os.fsync(out.fileno())
+                        out.close()
+                        out = None
+
+            if out is not None or buf:
+                raise IOError("Snapshot stream ended mid-file")
+    except BaseException:
+        if out is not None:
+            out.close()
+        for tmp_path, _ in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    with storage_lock:
+        for tmp_path, path in tmp_paths:
+            os.replace(tmp_path, path)
+
+    return total
+
+
+async def bootstrap_from_peer() -> str | None:
+    """
+    Fill an empty data directory from one healthy peer.
+    Returns the peer used, or None if no peer could serve a snapshot
+    (the node then converges through normal anti-entropy).
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    started = time.monotonic()
+
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+    ) as client:
+        candidates = list(PEERS)
+        random.shuffle(candidates)
+
+        for peer in candidates:
+            if not await _is_healthy(client, peer):
+                continue
+
+            try:
+                received = await _stream_snapshot_from_peer(client, peer)
+            except Exception as e:
+                logger.warning("Bootstrap from %s failed: %r", peer, e)
+                continue
+
+            logger.info(
+                "Bootstrap from %s completed: bytes=%d elapsed=%.2fs",
+                peer,
+                received,
+                time.monotonic() - started,
+            )
+            return peer
+
+    logger.info("Bootstrap skipped: no peer could serve a snapshot")
+    return None
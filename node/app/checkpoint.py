@@ -0,0 +1,151 @@
+"""
+Indexed checkpoint format, read through mmap.
+
+Layout (format v3):
+    MAGIC
+    one compact JSON object per poll: {option: {node_id: value}}
+    index JSON: {"polls": {poll_id: [offset, length, closed, digest]}}
+    8-byte little-endian offset of the index
+    END_MAGIC
+
+Opening a checkpoint only parses the index; a poll's counts are parsed
+when it is first read or updated. The digest is archive.poll_digest() of
+the counts, so anti-entropy can tell that a remote copy equals a lazy poll
+without parsing it. Entries written before the digest was added have
+three fields; their digest is computed on first use. Writing a new
+checkpoint copies the raw bytes of polls that were never loaded, so cold
+polls never reach the heap.
+Files that do not start with MAGIC are JSON checkpoints (v1/v2, codec.py).
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Set, Tuple
+
+from .archive import poll_digest
+
+MAGIC = b"VCK3\n"
+END_MAGIC = b"VCK3"
+_FOOTER = struct.Struct("<Q")
+_FOOTER_SIZE = _FOOTER.size + len(END_MAGIC)
+
+PollCounts = Dict[str, Dict[str, int]]
+
+
+class LazyCheckpoint:
+    """
+    Read-only view of a v3 checkpoint. index[poll_id] = (offset, length, closed)
+    for polls that have not been materialized in memory yet, digests[poll_id]
+    their count digests.
+    """
+
+    def __init__(self) -> None:
+        self.index: Dict[str, Tuple[int, int, bool]] = {}
+        self.digests: Dict[str, str] = {}
+        self._file = None
+        self._mm: mmap.mmap | None = None
+
+    @classmethod
+    def open(cls, path: str) -> "LazyCheckpoint":
+        lazy = cls()
+        f = open(path, "rb")
+        size = os.fstat(f.fileno()).st_size
+        if size < len(MAGIC) + _FOOTER_SIZE:
+            f.close()
+            raise ValueError("checkpoint: file too short")
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:len(MAGIC)] != MAGIC or mm[size - len(END_MAGIC):] != END_MAGIC:
+            mm.close()
+            f.close()
+            raise ValueError("checkpoint: bad magic")
+
+        (index_offset,) = _FOOTER.unpack(mm[size - _FOOTER_SIZE:size - len(END_MAGIC)])
+        index = json.loads(mm[index_offset:size - _FOOTER_SIZE])
+        for pid, entry in index["polls"].items():
+            lazy.index[pid] = (int(entry[0]), int(entry[1]), bool(entry[2]))
+            if len(entry) > 3:
+                lazy.digests[pid] = entry[3]
+        lazy._file = f
+        lazy._mm = mm
+        return lazy
+
+    def __contains__(self, poll_id: str) -> bool:
+        return poll_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def raw(self, poll_id: str) -> bytes:
+        off, length, _ = self.index[poll_id]
+        return self._mm[off:off + length]
+
+    def read(self, poll_id: str) -> PollCounts | None:
+        if poll_id not in self.index:
+            return None
+        return json.loads(self.raw(poll_id))
+
+    def digest(self, poll_id: str) -> str:
+        digest = self.digests.get(poll_id)
+        if digest is None:
+            digest = self.digests[poll_id] = poll_digest(self.read(poll_id))
+        return digest
+
+    def is_closed(self, poll_id: str) -> bool:
+        entry = self.index.get(poll_id)
+        return entry is not None and entry[2]
+
+    def discard(self, poll_id: str) -> None:
+        self.index.pop(poll_id, None)
+        self.digests.pop(poll_id, None)
+
+    def close(self) -> None:
+        # The old inode stays readable until closed even after os.replace.
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def is_v3(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_checkpoint_chunks(
+    hot: Dict[str, PollCounts],
+    closed: Set[str],
+    lazy: LazyCheckpoint,
+) -> Iterator[bytes]:
+    """
+    Yield a v3 checkpoint: hot polls are encoded and digested, lazy polls
+    not in `hot` are copied as raw bytes with their stored digest.
+    """
+    offset = 0
+    index: Dict[str, List] = {}
+
+    yield MAGIC
+    offset += len(MAGIC)
+
+    for poll_id, counts in hot.items():
+        data = json.dumps(counts, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index[poll_id] = [offset, len(data), 1 if poll_id in closed else 0, poll_digest(counts)]
+        yield data
+        offset += len(data)
+
+    for poll_id, (_, length, was_closed) in lazy.index.items():
+        if poll_id in hot:
+            continue
+        index[poll_id] = [offset, length, 1 if was_closed else 0, lazy.digest(poll_id)]
+        yield lazy.raw(poll_id)
+        offset += length
+
+    yield json.dumps({"polls": index}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    yield _FOOTER.pack(offset) + END_MAGIC
+
+
+def empty_checkpoint() -> bytes:
+    return b"".join(encode_checkpoint_chunks({}, set(), LazyCheckpoint()))
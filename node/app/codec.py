@@ -0,0 +1,179 @@
+"""
+Fast (de)serialization of the internal CRDT state.
+
+Checkpoints and state exports are produced straight from the in-memory
+dicts with one compact json.dumps, without per-poll model objects or
+intermediate copies. Loading a checkpoint (trusted local data) only runs
+cheap structural checks in place instead of pydantic validation; the
+parsed dicts become g_counter as they are. Option and node id strings
+repeat across every poll, but json.loads already shares repeated object
+keys within one document, so they are not duplicated in memory.
+
+Remote cluster states (anti-entropy) are decoded the same way: json.loads
+plus the structural checks pydantic would apply, returning plain dicts in
+the wire layout, so merging large states allocates no model per poll.
+
+Checkpoint format v2:
+    {"v": 2, "polls": {poll_id: {option: {node_id: value}}}, "closed": [poll_id, ...]}
+Checkpoints without "v" are the original pydantic layout. Both are still
+read at startup; new checkpoints are written in the indexed v3 format
+(checkpoint.py).
+"""
+import json
+from typing import TYPE_CHECKING, Dict, Iterable, List, Set, Tuple
+
+if TYPE_CHECKING:
+    from .checkpoint import LazyCheckpoint
+
+CHECKPOINT_VERSION = 2
+
+PollCounts = Dict[str, Dict[str, int]]
+Counter = Dict[str, PollCounts]
+
+
+def _dumps(payload: object) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# v2 writer; nodes write v3 now, kept for bench/serialization_bench.py
+def encode_checkpoint(counter: Counter, closed: Iterable[str]) -> bytes:
+    return _dumps({"v": CHECKPOINT_VERSION, "polls": counter, "closed": sorted(closed)})
+
+
+# Polls per json.dumps call when encoding a full state. One dumps call holds
+# the GIL throughout, so big states are encoded in slices to let the event
+# loop thread run in between.
+ENCODE_SLICE = 1024
+
+
+def encode_cluster_state(
+    counter: Counter,
+    closed: Set[str],
+    archived: Dict[str, str],
+    lazy: "LazyCheckpoint | None" = None,
+) -> bytes:
+    """
+    Wire format of ClusterCRDTState. Per-poll wrappers only reference the
+    existing count dicts; nothing is copied before encoding. Lazy polls are
+    spliced in as the raw JSON bytes stored in the checkpoint.
+    """
+    parts: List[bytes] = []
+
+    items = list(counter.items())
+    for start in range(0, len(items), ENCODE_SLICE):
+        polls = {
+            poll_id: {"counts": counts, "closed": poll_id in closed}
+            for poll_id, counts in items[start:start + ENCODE_SLICE]
+        }
+        parts.append(_dumps(polls)[1:-1])
+
+    if lazy is not None:
+        for poll_id, (_, _, was_closed) in lazy.index.items():
+            if poll_id in counter:
+                continue
+            parts.append(
+                _dumps(poll_id) + b':{"counts":' + lazy.raw(poll_id)
+                + (b',"closed":true}' if was_closed else b',"closed":false}')
+            )
+
+    return b'{"polls":{' + b",".join(parts) + b'},"archived":' + _dumps(archived) + b"}"
+
+
+def _check_counts(poll_id: str, counts: object) -> PollCounts:
+    if not isinstance(counts, dict):
+        raise ValueError(f"poll {poll_id!r}: counts must be an object")
+
+    for opt, nodes in counts.items():
+        if not isinstance(nodes, dict):
+            raise ValueError(f"poll {poll_id!r} option {opt!r}: expected an object")
+        for value in nodes.values():
+            if type(value) is not int or value < 0:
+                raise ValueError(f"poll {poll_id!r} option {opt!r}: invalid value {value!r}")
+    return counts
+
+
+def decode_checkpoint(raw: bytes) -> Tuple[Counter, List[str]]:
+    """
+    Parse a checkpoint into (g_counter, closed poll ids).
+    Raises ValueError if the structure is not the expected one.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict) or not isinstance(data.get("polls"), dict):
+        raise ValueError("checkpoint: missing 'polls' object")
+
+    counter: Counter = {}
+    closed: List[str] = []
+
+    if data.get("v") == CHECKPOINT_VERSION:
+        for poll_id, counts in data["polls"].items():
+            counter[poll_id] = _check_counts(poll_id, counts)
+        closed = [pid for pid in data.get("closed", []) if pid in counter]
+        return counter, closed
+
+    # legacy layout: polls[poll_id] = {"counts": ..., "closed": ...}
+    for poll_id, poll_state in data["polls"].items():
+        if not isinstance(poll_state, dict):
+            raise ValueError(f"poll {poll_id!r}: expected an object")
+        counter[poll_id] = _check_counts(poll_id, poll_state.get("counts", {}))
+        if poll_state.get("closed"):
+            closed.append(poll_id)
+    return counter, closed
+
+
+# same bounds as CounterUpdate, so that every merged component can be
+# replayed from the WAL
+MAX_POLL_ID = 64
+MAX_OPTION = 32
+MAX_NODE_ID = 64
+
+
+def _check_ids(poll_id: str, counts: PollCounts) -> None:
+    if not 0 < len(poll_id) <= MAX_POLL_ID:
+        raise ValueError(f"poll {poll_id!r}: invalid poll id length")
+    for opt, nodes in counts.items():
+        if not 0 < len(opt) <= MAX_OPTION:
+            raise ValueError(f"poll {poll_id!r}: invalid option {opt!r}")
+        for node_id in nodes:
+            if not 0 < len(node_id) <= MAX_NODE_ID:
+                raise ValueError(f"poll {poll_id!r}: invalid node id {node_id!r}")
+
+
+def _check_cluster_state(data: object) -> dict:
+    if not isinstance(data, dict) or not isinstance(data.get("polls"), dict):
+        raise ValueError("cluster state: missing 'polls' object")
+
+    for poll_id, poll_state in data["polls"].items():
+        if not isinstance(poll_state, dict) or "counts" not in poll_state:
+            raise ValueError(f"poll {poll_id!r}: expected an object with 'counts'")
+        _check_ids(poll_id, _check_counts(poll_id, poll_state["counts"]))
+        closed = poll_state.setdefault("closed", False)
+        if type(closed) is not bool:
+            raise ValueError(f"poll {poll_id!r}: 'closed' must be a boolean")
+
+    archived = data.setdefault("archived", {})
+    if not isinstance(archived, dict) or not all(type(d) is str for d in archived.values()):
+        raise ValueError("cluster state: 'archived' must map poll ids to digests")
+    return data
+
+
+def decode_cluster_state(raw: bytes) -> dict:
+    """
+    Parse a ClusterCRDTState body into
+    {"polls": {poll_id: {"counts": ..., "closed": bool}}, "archived": {...}}.
+    Raises ValueError if the structure is not the expected one.
+    """
+    return _check_cluster_state(json.loads(raw))
+
+
+def encode_exchange_result(missing: dict, applied_updates: int, node: str) -> bytes:
+    return _dumps({"missing": missing, "applied_updates": applied_updates, "node": node})
+
+
+def decode_exchange_result(raw: bytes) -> Tuple[dict, int, str]:
+    """
+    Parse an ExchangeResult body into (missing state, applied_updates, node).
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict) or type(data.get("applied_updates")) is not int:
+        raise ValueError("exchange result: missing 'applied_updates'")
+    return _check_cluster_state(data.get("missing")), data["applied_updates"], str(data.get("node"))
@@ -6,11 +6,18 @@ NODE_ID = os.getenv("NODE_ID", "nodeX")
 PORT = int(os.getenv("PORT", "8000"))
 PEERS = [p.strip() for p in os.getenv("PEERS", "").split(",") if p.strip()]
 CLUSTER_SIZE = int(os.getenv("CLUSTER_SIZE", str(len(PEERS) + 1)))
+# URL other nodes use to reach this one (heartbeat sender, membership entry)
+ADVERTISE_URL = os.getenv("ADVERTISE_URL", f"http://{NODE_ID}:{PORT}")
 BASE_STARTUP_DELAY = float(os.getenv("BASE_STARTUP_DELAY", "4"))
 
 DATA_DIR = os.getenv("DATA_DIR", "/data")
 CHECKPOINT_FILE = os.path.join(DATA_DIR, "checkpoint.json")
 WAL_FILE = os.path.join(DATA_DIR, "wal.jsonl")
+WAL_SEALED_FILE = os.path.join(DATA_DIR, "wal.sealed.jsonl")
+WAL_COMPACTED_FILE = os.path.join(DATA_DIR, "wal.compacted.jsonl")
+ARCHIVE_FILE = os.path.join(DATA_DIR, "archive.jsonl")
+ARCHIVE_INDEX_FILE = os.path.join(DATA_DIR, "archive.idx.json")
+BOOT_EPOCH_FILE = os.path.join(DATA_DIR, "boot_epoch")
 INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "")
 
 def adaptive_fanout(n: int) -> int:
@@ -35,6 +42,23 @@ def adaptive_connect_timeout(n: int) -> float:
 def adaptive_request_timeout(n: int) -> float:
     return 3.0 if n <= 10 else 5.0
 
+def adaptive_anti_entropy_bounds(n: int) -> tuple[float, float]:
+    interval = adaptive_anti_entropy_interval(n)
+    low = float(os.getenv("ANTI_ENTROPY_MIN_INTERVAL", str(max(1.0, interval / 4))))
+    high = float(os.getenv("ANTI_ENTROPY_MAX_INTERVAL", str(4 * interval)))
+    return low, high
+
+def adaptive_suspect_timeout(n: int) -> float:
+    return max(3 * adaptive_heartbeat_interval(n), 10.0)
+
+def adaptive_dead_timeout(n: int) -> float:
+    return max(2 * adaptive_suspect_timeout(n), 20.0)
+
+def adaptive_checkpoint_interval(n: int) -> float:
+    return 10.0 if n <= 10 else 15.0
+
+# Values at startup. Membership changes recompute them at runtime: code that
+# must follow the current cluster size reads membership.tuning instead.
 FANOUT = adaptive_fanout(CLUSTER_SIZE)
 HEARTBEAT_INTERVAL = adaptive_heartbeat_interval(CLUSTER_SIZE)
 ANTI_ENTROPY_INTERVAL = adaptive_anti_entropy_interval(CLUSTER_SIZE)
@@ -42,6 +66,91 @@ STARTUP_DELAY = adaptive_startup_delay(CLUSTER_SIZE)
 CONNECT_TIMEOUT = adaptive_connect_timeout(CLUSTER_SIZE)
 REQUEST_TIMEOUT = adaptive_request_timeout(CLUSTER_SIZE)
 
-SUSPECT_TIMEOUT = max(3 * HEARTBEAT_INTERVAL, 10.0)
-DEAD_TIMEOUT = max(2 * SUSPECT_TIMEOUT, 20.0)
-CHECKPOINT_INTERVAL = 10.0 if CLUSTER_SIZE <= 10 else 15.0
\ No newline at end of file
+# Adaptive anti-entropy: the interval moves between these bounds depending
+# on whether rounds find divergence (see scheduler.py).
+ANTI_ENTROPY_ADAPTIVE = os.getenv("ANTI_ENTROPY_ADAPTIVE", "1") == "1"
+ANTI_ENTROPY_MIN_INTERVAL, ANTI_ENTROPY_MAX_INTERVAL = adaptive_anti_entropy_bounds(CLUSTER_SIZE)
+
+SUSPECT_TIMEOUT = adaptive_suspect_timeout(CLUSTER_SIZE)
+DEAD_TIMEOUT = adaptive_dead_timeout(CLUSTER_SIZE)
+CHECKPOINT_INTERVAL = adaptive_checkpoint_interval(CLUSTER_SIZE)
+
+# A closed poll is evicted to the on-disk archive once it has not changed
+# for ARCHIVE_AFTER seconds.
+ARCHIVE_AFTER = float(os.getenv("ARCHIVE_AFTER", "60"))
+ARCHIVE_CACHE_SIZE = int(os.getenv("ARCHIVE_CACHE_SIZE", "128"))
+
+# An open poll that has not changed for LAZY_EVICT_AFTER seconds leaves
+# memory at the next checkpoint and is read back from it lazily (0 = never).
+LAZY_EVICT_AFTER = float(os.getenv("LAZY_EVICT_AFTER", "300"))
+
+# WAL compaction: once the active WAL reaches WAL_COMPACT_MIN_BYTES it is
+# sealed and folded in the background to one record per component
+# (checked every WAL_COMPACT_INTERVAL seconds, 0 = disabled).
+WAL_COMPACT_INTERVAL = float(os.getenv("WAL_COMPACT_INTERVAL", "2"))
+WAL_COMPACT_MIN_BYTES = int(os.getenv("WAL_COMPACT_MIN_BYTES", str(1024 * 1024)))
+
+# Fast bootstrap: a node with an empty DATA_DIR streams a peer snapshot
+# before joining gossip.
+BOOTSTRAP_ENABLED = os.getenv("BOOTSTRAP_ENABLED", "1") == "1"
+BOOTSTRAP_CHUNK_SIZE = int(os.getenv("BOOTSTRAP_CHUNK_SIZE", str(1024 * 1024)))
+
+# Admission control on /vote. A rate of 0 disables the corresponding limit.
+RATE_LIMIT_CLIENT_RPS = float(os.getenv("RATE_LIMIT_CLIENT_RPS", "50"))
+RATE_LIMIT_CLIENT_BURST = float(os.getenv("RATE_LIMIT_CLIENT_BURST", "100"))
+RATE_LIMIT_POLL_RPS = float(os.getenv("RATE_LIMIT_POLL_RPS", "500"))
+RATE_LIMIT_POLL_BURST = float(os.getenv("RATE_LIMIT_POLL_BURST", "1000"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+REPLICATION_MAX_INFLIGHT = int(os.getenv("REPLICATION_MAX_INFLIGHT", "256"))
+REPLICATION_HIGH_WATERMARK = int(os.getenv("REPLICATION_HIGH_WATERMARK", str(REPLICATION_MAX_INFLIGHT * 3 // 4)))
+WAL_HIGH_WATERMARK_BYTES = int(os.getenv("WAL_HIGH_WATERMARK_BYTES", str(64 * 1024 * 1024)))
+# Proxies whose X-Real-IP header names the client for the per-client rate
+# limit, as comma-separated IPs or CIDR networks. Any other peer address is
+# the client itself.
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+# Internal transport: per-peer in-flight cap and keepalive pool. The pool is
+# a little larger than the cap so heartbeats always find a free connection.
+PEER_MAX_INFLIGHT = int(os.getenv("PEER_MAX_INFLIGHT", "16"))
+PEER_MAX_CONNECTIONS = int(os.getenv("PEER_MAX_CONNECTIONS", str(PEER_MAX_INFLIGHT + 2)))
+PEER_KEEPALIVE_EXPIRY = float(os.getenv("PEER_KEEPALIVE_EXPIRY", "30"))
+
+# Durability of local votes (see durability.py): default level, per-poll
+# levels as "pattern=level" pairs (fnmatch patterns, first match wins, e.g.
+# "live-*=memory,flash-*=group"), the group fsync delay, how many failed
+# fsyncs in a row fail the waiting votes, and the number of peer acks a
+# "replicated" vote waits for (at most REPLICATED_ACK_TIMEOUT).
+DURABILITY_DEFAULT = os.getenv("DURABILITY_DEFAULT", "fsync")
+DURABILITY_POLLS = os.getenv("DURABILITY_POLLS", "")
+GROUP_COMMIT_DELAY_MS = float(os.getenv("GROUP_COMMIT_DELAY_MS", "5"))
+GROUP_COMMIT_MAX_ATTEMPTS = int(os.getenv("GROUP_COMMIT_MAX_ATTEMPTS", "3"))
+REPLICATED_ACKS = int(os.getenv("REPLICATED_ACKS", "1"))
+REPLICATED_ACK_TIMEOUT = float(os.getenv("REPLICATED_ACK_TIMEOUT", "1.0"))
+
+# Cluster overview (see overview.py): how long a result is reused, the
+# per-peer timeout of the fan-out, the number of digest buckets per node
+# and the max number of divergent polls listed.
+CLUSTER_OVERVIEW_TTL = float(os.getenv("CLUSTER_OVERVIEW_TTL", "2.0"))
+CLUSTER_OVERVIEW_TIMEOUT = float(os.getenv("CLUSTER_OVERVIEW_TIMEOUT", "1.0"))
+CLUSTER_DIGEST_BUCKETS = int(os.getenv("CLUSTER_DIGEST_BUCKETS", "256"))
+CLUSTER_OVERVIEW_MAX_POLLS = int(os.getenv("CLUSTER_OVERVIEW_MAX_POLLS", "100"))
+
+# Max number of poll ids in one POST /polls/counts request.
+POLL_BATCH_MAX = int(os.getenv("POLL_BATCH_MAX", "1000"))
+
+# Read-your-writes: how long a read carrying a session token waits for the
+# written component when the origin node cannot provide it.
+SESSION_WAIT_TIMEOUT = float(os.getenv("SESSION_WAIT_TIMEOUT", "0.5"))
+
+# Logging: level of the root logger, "json" or "text" output, and the max
+# per-second rate of sampled per-update records (0 disables sampling).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_PER_SEC = float(os.getenv("LOG_SAMPLE_PER_SEC", "10"))
+
+# Executors for blocking work (see executors.py): worker threads and the
+# max number of pending jobs per pool.
+IO_WORKERS = int(os.getenv("IO_WORKERS", "4"))
+IO_MAX_PENDING = int(os.getenv("IO_MAX_PENDING", "1024"))
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", "2"))
+MERGE_MAX_PENDING = int(os.getenv("MERGE_MAX_PENDING", "16"))
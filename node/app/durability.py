@@ -0,0 +1,144 @@
+# durability levels for local votes
+"""
+When is a vote acknowledged?
+
+  fsync       the WAL record is fsynced before the reply (default). Survives
+              a crash of this node.
+  group       the record is fsynced by the next group commit (see
+              groupcommit.py) before the reply. Same guarantee as fsync,
+              a few ms more latency, one fsync shared by many votes.
+  replicated  the reply waits until REPLICATED_ACKS peers applied the update
+              (or REPLICATED_ACK_TIMEOUT expires); the local flush is
+              requested but not awaited. Survives a crash of this node as
+              long as one acking peer survives. Falls back to group when not
+              enough peers ack in time.
+  memory      no WAL record at all; the vote reaches disk with the next
+              checkpoint and other nodes through replication. Can be lost
+              if this node crashes before either happens.
+
+Only "fsync" votes are durable before they can reach peers. A "group" vote
+is counted (and can be exported by anti-entropy) while its flush is still
+pending, which may fail; "replicated" and "memory" votes are pushed out
+before they are durable here at all. If they were counted in the NODE_ID component, a crash would roll
+that component back locally while peers keep the higher value; the next
+votes would reuse the lost values and be dropped by every peer's
+max-merge, even those acknowledged at "fsync". They are therefore counted
+in a separate component, f"{NODE_ID}@{epoch}", with a new epoch on every
+start (storage.next_boot_epoch). The NODE_ID component only ever holds
+"fsync" votes, and a per-boot component is never written again after a
+restart, so a crash loses at most the non-durable votes themselves.
+
+The level comes from the vote itself, then the first DURABILITY_POLLS rule
+matching the poll id, then DURABILITY_DEFAULT.
+"""
+import logging
+from fnmatch import fnmatchcase
+from typing import List, Tuple
+
+from .config import (
+    NODE_ID,
+    DURABILITY_DEFAULT,
+    DURABILITY_POLLS,
+    REPLICATED_ACKS,
+    REPLICATED_ACK_TIMEOUT,
+)
+from .models import CounterUpdate
+from .groupcommit import group_commit
+from .replication import replicate_update_with_acks
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("fsync", "group", "replicated", "memory")
+# levels whose WAL record is fsynced before the vote is visible to peers
+DURABLE_LEVELS = ("fsync",)
+
+
+def _parse_rules(spec: str) -> List[Tuple[str, str]]:
+    rules = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        pattern, _, level = item.partition("=")
+        pattern, level = pattern.strip(), level.strip()
+        if not pattern or level not in LEVELS:
+            logger.warning("Ignoring DURABILITY_POLLS entry %r", item)
+            continue
+        rules.append((pattern, level))
+    return rules
+
+
+if DURABILITY_DEFAULT not in LEVELS:
+    logger.warning("Unknown DURABILITY_DEFAULT %r, using fsync", DURABILITY_DEFAULT)
+    default_level = "fsync"
+else:
+    default_level = DURABILITY_DEFAULT
+
+poll_rules = _parse_rules(DURABILITY_POLLS)
+
+_writes = {level: 0 for level in LEVELS}
+_replicated_fallbacks = 0
+
+# component of non-durable votes; set by start_epoch() before serving
+volatile_node_id = NODE_ID
+
+
+def start_epoch(epoch: int) -> None:
+    global volatile_node_id
+    volatile_node_id = f"{NODE_ID}@{epoch}"
+
+
+def component_node_id(level: str) -> str:
+    """
+    G-Counter component a local vote at `level` is counted in.
+    """
+    return NODE_ID if level in DURABLE_LEVELS else volatile_node_id
+
+
+def level_for(poll_id: str, requested: str | None = None) -> str:
+    if requested is not None:
+        return requested
+    for pattern, level in poll_rules:
+        if fnmatchcase(poll_id, pattern):
+            return level
+    return default_level
+
+
+async def complete_write(level: str, upd: CounterUpdate, seq: int) -> dict:
+    """
+    Wait until the vote `upd` (WAL record `seq`, 0 if none) meets `level`.
+    Returns the durability part of the /vote response.
+    """
+    global _replicated_fallbacks
+
+    _writes[level] += 1
+    result = {"level": level}
+
+    if level == "group":
+        await group_commit.wait(seq)
+
+    elif level == "replicated":
+        acks = await replicate_update_with_acks(upd, REPLICATED_ACKS, REPLICATED_ACK_TIMEOUT)
+        result["acks"] = acks
+        if acks >= REPLICATED_ACKS:
+            group_commit.request(seq)
+        else:
+            # not enough copies elsewhere: make the local one durable
+            _replicated_fallbacks += 1
+            await group_commit.wait(seq)
+            result["fallback"] = "group"
+
+    return result
+
+
+def durability_stats() -> dict:
+    return {
+        "default": default_level,
+        "volatile_component": volatile_node_id,
+        "polls": [f"{pattern}={level}" for pattern, level in poll_rules],
+        "replicated_acks": REPLICATED_ACKS,
+        "replicated_ack_timeout": REPLICATED_ACK_TIMEOUT,
+        "writes": dict(_writes),
+        "replicated_fallbacks": _replicated_fallbacks,
+        "group_commit": group_commit.stats(),
+    }
@@ -0,0 +1,79 @@
+"""
+Execution model: the event loop only does networking.
+
+Anything that takes state_lock/storage_lock, fsyncs or walks the whole
+state runs on one of two dedicated thread pools:
+
+- io_executor: WAL appends, checkpoints and short state reads/writes on the
+  request path (votes, closes, session reads)
+- merge_executor: CPU-heavy anti-entropy work (state encode, decode, merge)
+
+Each pool has a bounded number of pending jobs; further callers wait on
+the loop without blocking it, and /vote is rejected with 503 while the
+io queue is full (see admission.py). Sync `def` handlers already run in
+the framework threadpool and keep doing so.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from .config import IO_WORKERS, IO_MAX_PENDING, MERGE_WORKERS, MERGE_MAX_PENDING
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_pending: int) -> None:
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.queued_full = 0
+
+    def full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._slots
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        slots = self._semaphore()
+        if slots.locked():
+            self.queued_full += 1
+
+        async with slots:
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._pool, functools.partial(fn, *args)
+                )
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "waited_for_slot": self.queued_full,
+        }
+
+
+io_executor = BoundedExecutor("io", IO_WORKERS, IO_MAX_PENDING)
+merge_executor = BoundedExecutor("merge", MERGE_WORKERS, MERGE_MAX_PENDING)
+
+
+def executor_stats() -> dict:
+    return {"io": io_executor.stats(), "merge": merge_executor.stats()}
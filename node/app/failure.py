@@ -1,111 +1,158 @@
 # heartbeat loop + status computation
 import time
 import asyncio
-import httpx
+import logging
 import random
 from fastapi import APIRouter, Depends
-from urllib.parse import urlparse
-from .config import PEERS, NODE_ID, PORT, HEARTBEAT_INTERVAL, SUSPECT_TIMEOUT, DEAD_TIMEOUT, INTERNAL_TOKEN, FANOUT, REQUEST_TIMEOUT, CONNECT_TIMEOUT, STARTUP_DELAY
+from .config import PEERS, NODE_ID, ADVERTISE_URL, STARTUP_DELAY
 from .security import verify_internal_token
 from .utils import internal_auth_headers
+from .transport import peer_request
+from .scheduler import anti_entropy_scheduler
+from .membership import registry, tuning
+from .models import MembershipTable
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Manteniamo lo stato solo per i peer "ufficiali" (quelli in PEERS)
-peer_last_seen = {peer: 0.0 for peer in PEERS}
+# last heartbeat per peer URL; members without an entry are UNKNOWN
+peer_last_seen: dict[str, float] = {}
 
 
-def _normalize_sender(sender: str) -> str:
+@router.post("/internal/heartbeat")
+async def internal_heartbeat(sender: str, _: None = Depends(verify_internal_token)):
     """
-    Normalize sender so that it matches one of the configured PEERS
-    using structured URL parsing instead of string heuristics.
-
-    Examples:
-    - http://node2:8002 -> http://node2:8002
-    - http://node2      -> http://node2:8002   (if uniquely identifiable in PEERS)
-    - node2:8002        -> http://node2:8002
+    Endpoint used by peers to signal they are alive.
+    Updates last_seen only for active members, avoiding duplicate identities.
+    The reply carries our membership digest for gossip. Runs on the event
+    loop: registry.resolve() fills the registry's cache, and membership
+    tables are only modified there.
     """
-    sender = sender.strip()
-    if not sender:
-        return sender
+    now = time.monotonic()
+    peer = registry.resolve(sender)
 
-    parsed_sender = urlparse(sender if "://" in sender else f"http://{sender}")
-    sender_host = parsed_sender.hostname
-    sender_port = parsed_sender.port
+    if peer is not None:
+        last = peer_last_seen.get(peer, 0.0)
+        if last != 0.0 and now - last > tuning.suspect_timeout:
+            # back from SUSPECT/DEAD: it may hold updates we missed
+            anti_entropy_scheduler.mark_recovered(peer)
+        peer_last_seen[peer] = now
 
-    if sender_host is None:
-        return sender
+    return {
+        "ok": True,
+        "node": NODE_ID,
+        "received_from": peer or sender,
+        "members": registry.digest,
+    }
 
-    # Exact host:port match against configured peers
-    for peer in PEERS:
-        parsed_peer = urlparse(peer if "://" in peer else f"http://{peer}")
-        if parsed_peer.hostname == sender_host and parsed_peer.port == sender_port:
-            return peer
 
-    # Fallback: if sender has no port, try unique hostname match
-    if sender_port is None:
-        matches = []
-        for peer in PEERS:
-            parsed_peer = urlparse(peer if "://" in peer else f"http://{peer}")
-            if parsed_peer.hostname == sender_host:
-                matches.append(peer)
+def _forget_peers(added: list[str], removed: list[str]) -> None:
+    """
+    Drop the failure-detector and anti-entropy entries of peers that left
+    the cluster. A peer that rejoins starts again from UNKNOWN.
+    """
+    for peer in removed:
+        peer_last_seen.pop(peer, None)
+        anti_entropy_scheduler.forget(peer)
 
-        if len(matches) == 1:
-            return matches[0]
 
-    return sender
+registry.subscribe(_forget_peers)
 
 
-@router.post("/internal/heartbeat")
-def internal_heartbeat(sender: str, _: None = Depends(verify_internal_token)):
-    """
-    Endpoint used by peers to signal they are alive.
-    Updates last_seen only for configured peers, avoiding duplicate identities.
-    """
-    now = time.monotonic()
-    sender = _normalize_sender(sender)
+async def _sync_membership(peer: str) -> None:
+    try:
+        resp = await peer_request(
+            peer,
+            "POST",
+            "/internal/membership/sync",
+            bounded=False,
+            json=registry.table().model_dump(),
+        )
+        resp.raise_for_status()
+        registry.merge(MembershipTable.model_validate(resp.json()).members)
+    except Exception as e:
+        logger.info("Membership sync with %s failed: %r", peer, e)
 
-    if sender in peer_last_seen:
-        peer_last_seen[sender] = now
 
-    return {"ok": True, "node": NODE_ID, "received_from": sender}
+async def join_cluster() -> None:
+    """
+    Announce this node to one of its PEERS and adopt the returned table;
+    gossip spreads the join to everyone else. Retries until a peer answers.
+    If gossip later marks this node as left, registry.merge() announces it
+    again.
+    """
+    body = {"url": registry.self_url, "node_id": NODE_ID}
+
+    while True:
+        for peer in random.sample(PEERS, len(PEERS)):
+            try:
+                resp = await peer_request(
+                    peer,
+                    "POST",
+                    "/internal/membership/join",
+                    bounded=False,
+                    json=body,
+                )
+                resp.raise_for_status()
+                registry.merge(MembershipTable.model_validate(resp.json()).members)
+                logger.info("Joined the cluster through %s (size %d)", peer, tuning.size)
+                return
+            except Exception as e:
+                logger.info("Join through %s failed: %r", peer, e)
+
+        await asyncio.sleep(tuning.heartbeat_interval)
 
 
 async def heartbeat_loop():
     """
     Loop in background: invia heartbeat a tutti i peer (best effort).
     """
-    if not PEERS:
-        return
-
-    my_sender = f"http://{NODE_ID}:{PORT}"
-
     await asyncio.sleep(STARTUP_DELAY + random.uniform(0, 2))
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)) as client:
-        while True:
-            for peer in heartbeat_targets():
-                try:
-                    await client.post(
-                        f"{peer}/internal/heartbeat",
-                        params={"sender": my_sender},
-                        headers=internal_auth_headers()
-                    )
-                except Exception:
-                    # peer down/unreachable: ignora, verrà segnato SUSPECT/DEAD dai timeout
-                    pass
-
-            await asyncio.sleep(HEARTBEAT_INTERVAL)
-
-def heartbeat_targets(max_targets: int = FANOUT) -> list[str]:
+    while True:
+        for peer in heartbeat_targets():
+            try:
+                # unbounded: heartbeats must not queue behind replication
+                resp = await peer_request(
+                    peer,
+                    "POST",
+                    "/internal/heartbeat",
+                    bounded=False,
+                    params={"sender": ADVERTISE_URL},
+                    headers=internal_auth_headers()
+                )
+                digest = resp.json().get("members")
+            except Exception:
+                # peer down/unreachable: ignora, verrà segnato SUSPECT/DEAD dai timeout
+                continue
+
+            if digest is not None and digest != registry.digest:
+                await _sync_membership(peer)
+
+        await asyncio.sleep(tuning.heartbeat_interval)
+
+def heartbeat_targets(max_targets: int | None = None) -> list[str]:
     states = get_peer_states()
-    candidates = [peer for peer in PEERS if states.get(peer) != "DEAD"]
+    candidates = [peer for peer in registry.peers if states.get(peer) != "DEAD"]
+    max_targets = tuning.fanout if max_targets is None else max_targets
 
     if len(candidates) <= max_targets:
         return candidates
 
     return random.sample(candidates, max_targets)
 
+
+def _peer_state(last: float, now: float) -> tuple[str, float | None]:
+    if last == 0.0:
+        return "UNKNOWN", None
+
+    age = now - last
+    if age <= tuning.suspect_timeout:
+        return "ALIVE", age
+    if age <= tuning.dead_timeout:
+        return "SUSPECT", age
+    return "DEAD", age
+
 @router.get("/status")
 def status():
     """
@@ -114,18 +161,8 @@ def status():
     now = time.monotonic()
     result = {"node": NODE_ID, "peers": []}
 
-    for peer, last in peer_last_seen.items():
-        age = None if last == 0.0 else (now - last)
-
-        if last == 0.0:
-            state = "UNKNOWN"
-        elif age <= SUSPECT_TIMEOUT:
-            state = "ALIVE"
-        elif age <= DEAD_TIMEOUT:
-            state = "SUSPECT"
-        else:
-            state = "DEAD"
-
+    for peer in registry.peers:
+        state, age = _peer_state(peer_last_seen.get(peer, 0.0), now)
         result["peers"].append(
             {
                 "peer": peer,
@@ -138,20 +175,7 @@ def status():
 
 def get_peer_states() -> dict[str, str]:
     now = time.monotonic()
-    states: dict[str, str] = {}
-
-    for peer, last in peer_last_seen.items():
-        age = None if last == 0.0 else (now - last)
-
-        if last == 0.0:
-            state = "UNKNOWN"
-        elif age <= SUSPECT_TIMEOUT:
-            state = "ALIVE"
-        elif age <= DEAD_TIMEOUT:
-            state = "SUSPECT"
-        else:
-            state = "DEAD"
-
-        states[peer] = state
-
-    return states
+    return {
+        peer: _peer_state(peer_last_seen.get(peer, 0.0), now)[0]
+        for peer in registry.peers
+    }
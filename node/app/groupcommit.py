@@ -0,0 +1,151 @@
+"""
+Group commit for the WAL.
+
+Writers append records without fsync (append_wal_update(..., sync=False))
+and hand the record's sequence number to the committer. A single flusher
+thread waits until the first pending record is GROUP_COMMIT_DELAY_MS old,
+then runs one sync_wal(), which makes every record written so far durable.
+Under load one fsync therefore covers many writes, and a writer waits at
+most about one delay plus one fsync.
+
+request() only asks for a flush (background durability); wait() also
+suspends the caller's coroutine until its record is on disk. If
+GROUP_COMMIT_MAX_ATTEMPTS fsyncs in a row fail, every pending wait() raises
+the error, as an "fsync" vote would, instead of waiting for a disk that
+may never recover; the next request() tries again.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import List, Tuple
+
+from .config import GROUP_COMMIT_DELAY_MS, GROUP_COMMIT_MAX_ATTEMPTS
+from .histogram import Histogram
+from .storage import sync_wal
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitter:
+    def __init__(self, delay: float, max_attempts: int) -> None:
+        self.delay = delay
+        self.max_attempts = max(1, max_attempts)
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._durable = 0
+        self._first_pending = 0.0
+        self._waiters: List[Tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._thread: threading.Thread | None = None
+        self.flushes = 0
+        self.records = 0
+        self.failed_flushes = 0
+        self.failed_batches = 0
+        self.wait_time = Histogram()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def request(self, seq: int) -> None:
+        """
+        Ask for record `seq` to be flushed soon. Thread-safe, never blocks.
+        """
+        with self._cond:
+            if seq <= self._durable:
+                return
+            if self._requested <= self._durable:
+                self._first_pending = time.monotonic()
+            self._requested = max(self._requested, seq)
+            self._ensure_thread()
+            self._cond.notify()
+
+    async def wait(self, seq: int) -> None:
+        """
+        Return once record `seq` is durable. Raises the fsync error if the
+        flush keeps failing.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        started = time.monotonic()
+        with self._cond:
+            if seq <= self._durable:
+                return
+            self._waiters.append((seq, loop, fut))
+        self.request(seq)
+        await fut
+        self.wait_time.observe(time.monotonic() - started)
+
+    def _fail_waiters(self, error: Exception) -> None:
+        with self._cond:
+            failed, self._waiters = self._waiters, []
+            # give up on this batch; a later request() retries the fsync
+            self._requested = self._durable
+            self.failed_batches += 1
+
+        for _, loop, fut in failed:
+            loop.call_soon_threadsafe(_reject, fut, error)
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            with self._cond:
+                while self._requested <= self._durable:
+                    self._cond.wait()
+                remaining = self._first_pending + self.delay - time.monotonic()
+
+            if remaining > 0:
+                time.sleep(remaining)
+
+            try:
+                durable = sync_wal()
+            except Exception as e:
+                failures += 1
+                self.failed_flushes += 1
+                logger.warning("Group commit fsync failed (%d/%d): %r", failures, self.max_attempts, e)
+                if failures >= self.max_attempts:
+                    failures = 0
+                    self._fail_waiters(e)
+                else:
+                    time.sleep(self.delay or 0.01)
+                continue
+
+            failures = 0
+            with self._cond:
+                self.flushes += 1
+                self.records += max(0, durable - self._durable)
+                self._durable = max(self._durable, durable)
+                if self._requested > self._durable:
+                    # written after the fsync started: next batch
+                    self._first_pending = time.monotonic()
+
+                ready = [w for w in self._waiters if w[0] <= self._durable]
+                self._waiters = [w for w in self._waiters if w[0] > self._durable]
+
+            for _, loop, fut in ready:
+                loop.call_soon_threadsafe(_resolve, fut)
+
+    def stats(self) -> dict:
+        return {
+            "delay_ms": round(self.delay * 1000, 3),
+            "flushes": self.flushes,
+            "records": self.records,
+            "records_per_flush": round(self.records / self.flushes, 2) if self.flushes else 0.0,
+            "failed_flushes": self.failed_flushes,
+            "failed_batches": self.failed_batches,
+            "wait": self.wait_time.snapshot(),
+        }
+
+
+def _resolve(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _reject(fut: asyncio.Future, error: Exception) -> None:
+    if not fut.done():
+        fut.set_exception(error)
+
+
+group_commit = GroupCommitter(GROUP_COMMIT_DELAY_MS / 1000.0, GROUP_COMMIT_MAX_ATTEMPTS)
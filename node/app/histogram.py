@@ -0,0 +1,41 @@
+# fixed-bucket latency histogram for low-overhead live metrics
+import bisect
+from typing import List
+
+# upper bounds in milliseconds; the last bucket is open-ended
+DEFAULT_BUCKETS_MS = (0.01, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+class Histogram:
+    """
+    Counts of durations per bucket, plus count/sum/max.
+    Not thread-safe by itself: callers record under a lock they already hold
+    (see InstrumentedRLock) or from a single thread.
+    """
+
+    def __init__(self, buckets_ms=DEFAULT_BUCKETS_MS) -> None:
+        self.bounds = tuple(b / 1000.0 for b in buckets_ms)
+        self.buckets_ms = tuple(buckets_ms)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
@@ -1,7 +1,71 @@
 import threading
+import time
 
-state_lock = threading.RLock()
+from .histogram import Histogram
+
+
+class InstrumentedRLock:
+    """
+    threading.RLock that records how long threads wait for it and how long
+    the outermost acquisition holds it. Both are recorded while the lock is
+    held, so the histograms need no lock of their own.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired_at = 0.0
+        self.wait = Histogram()
+        self.hold = Histogram()
+        self.contended = 0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        t0 = time.perf_counter()
+        if self._lock.acquire(blocking=False):
+            waited = 0.0
+        else:
+            if not self._lock.acquire(blocking, timeout):
+                return False
+            waited = time.perf_counter() - t0
+
+        if self._depth == 0:
+            self._acquired_at = time.perf_counter()
+            self.wait.observe(waited)
+            if waited:
+                self.contended += 1
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self.hold.observe(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def reset(self) -> None:
+        with self:
+            self.wait.reset()
+            self.hold.reset()
+            self.contended = 0
+
+    def stats(self) -> dict:
+        # Read without taking the lock, so that it never waits behind a long
+        # holder (e.g. a checkpoint); a record in flight may be missed.
+        return {
+            "contended": self.contended,
+            "wait": self.wait.snapshot(),
+            "hold": self.hold.snapshot(),
+        }
+
+
+state_lock = InstrumentedRLock("state_lock")
 
 # Protects all file I/O (WAL, checkpoint). May be acquired while holding
 # state_lock, but never acquire state_lock while holding storage_lock.
-storage_lock = threading.RLock()
\ No newline at end of file
+storage_lock = InstrumentedRLock("storage_lock")
@@ -0,0 +1,146 @@
+# logging setup: queue-based async handler, JSON records, per-category sampling
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from .config import NODE_ID, LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_PER_SEC
+from .security import verify_internal_token
+
+router = APIRouter()
+
+_listener: logging.handlers.QueueListener | None = None
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. Fields passed through `extra=` are kept.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "node": NODE_ID,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue the record as is: message formatting and I/O both happen on the
+    listener thread. Arguments passed to a log call must therefore not be
+    mutated afterwards.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class CategorySampler(logging.Filter):
+    """
+    Rate-limit records that carry a `category` (per-update firehose) to
+    LOG_SAMPLE_PER_SEC per category, whatever their level. The next emitted
+    record of a category reports how many were suppressed in between.
+    Records without a category always pass.
+    """
+
+    def __init__(self, per_sec: float):
+        super().__init__()
+        self.per_sec = per_sec
+        self._lock = threading.Lock()
+        self._window: Dict[str, tuple[float, int]] = {}
+        self._suppressed: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        if category is None or self.per_sec <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            start, count = self._window.get(category, (now, 0))
+            if now - start >= 1.0:
+                start, count = now, 0
+
+            if count >= self.per_sec:
+                self._window[category] = (start, count)
+                self._suppressed[category] = self._suppressed.get(category, 0) + 1
+                return False
+
+            self._window[category] = (start, count + 1)
+            suppressed = self._suppressed.pop(category, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def setup_logging() -> None:
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(CategorySampler(LOG_SAMPLE_PER_SEC))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class LogLevelIn(BaseModel):
+    logger: str
+    level: str
+
+
+@router.get("/internal/logging")
+def internal_get_logging(_: None = Depends(verify_internal_token)):
+    loggers = {
+        name: logging.getLevelName(lg.level)
+        for name, lg in logging.root.manager.loggerDict.items()
+        if isinstance(lg, logging.Logger) and name.startswith("app")
+    }
+    return {"root": logging.getLevelName(logging.getLogger().level), "loggers": loggers}
+
+
+@router.post("/internal/logging")
+def internal_set_logging(body: LogLevelIn, _: None = Depends(verify_internal_token)):
+    """
+    Change one logger's level at runtime, e.g.
+    {"logger": "app.replication", "level": "DEBUG"} to enable its firehose.
+    """
+    level = logging.getLevelName(body.level.upper())
+    if not isinstance(level, int):
+        raise HTTPException(status_code=400, detail=f"Unknown level {body.level!r}")
+
+    logging.getLogger(body.logger or None).setLevel(level)
+    return {"ok": True, "logger": body.logger, "level": logging.getLevelName(level)}
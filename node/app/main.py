@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from contextlib import asynccontextmanager
 import asyncio
 import logging
@@ -6,72 +6,154 @@ from pathlib import Path
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from .locks import state_lock
-from .config import NODE_ID, CHECKPOINT_INTERVAL
-from .models import VoteIn
+from .config import (
+    NODE_ID,
+    PEERS,
+    BOOTSTRAP_ENABLED,
+    WAL_COMPACT_INTERVAL,
+    WAL_COMPACT_MIN_BYTES,
+)
+from .models import VoteIn, PollClose, PollCountsQuery
 
 from .state import (
     build_local_update,
     apply_update,
     query_poll_counts,
+    query_polls,
     replace_cluster_state,
-    list_polls
+    list_polls,
+    is_poll_closed,
+    close_poll,
+    evict_cold_polls,
+    checkpoint_chunks,
+    remap_checkpoint,
 )
 from .replication import (
     router as replication_router,
     replicate_update_to_peers,
+    replicate_poll_close_to_peers,
+    apply_poll_close,
     anti_entropy_loop,
-    close_replication_clients,
 )
-from .failure import router as failure_router, heartbeat_loop
+from .failure import router as failure_router, heartbeat_loop, join_cluster
+from .membership import router as membership_router, registry, tuning
 from .storage import (
     ensure_storage,
     load_checkpoint,
-    load_wal_updates,
+    load_wal_records,
     write_checkpoint,
     truncate_wal,
     append_wal_update,
+    compact_wal,
+    wal_stats,
+    next_boot_epoch,
+)
+from .archive import load_archive_index
+from .scheduler import anti_entropy_scheduler
+from .logs import setup_logging, router as logs_router
+from .transport import warm_up, close_transport, transport_stats
+from .admission import check_vote_admission, spawn_replication, admission_stats
+from .executors import io_executor, executor_stats
+from .durability import (
+    level_for,
+    complete_write,
+    durability_stats,
+    component_node_id,
+    start_epoch,
+)
+from .profiling import router as profiling_router, loop_monitor
+from .overview import router as overview_router
+from .session import router as session_router, encode_token, wait_for_session
+from .bootstrap import (
+    router as bootstrap_router,
+    is_storage_empty,
+    bootstrap_from_peer,
 )
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).resolve().parent
 UI_DIR = BASE_DIR / "ui"
 
+def _checkpoint() -> None:
+    with state_lock:
+        # Evict before exporting so the new checkpoint stops carrying
+        # polls that now live in the archive.
+        evicted = evict_cold_polls()
+        if evicted:
+            logger.info("Archived %d cold closed polls", evicted)
+        write_checkpoint(checkpoint_chunks())
+        unloaded = remap_checkpoint()
+        if unloaded:
+            logger.info("Moved %d idle polls out of memory", unloaded)
+        truncate_wal()
+
+
 async def checkpoint_loop():
     while True:
-        await asyncio.sleep(CHECKPOINT_INTERVAL)
-        from .state import export_cluster_state
+        await asyncio.sleep(tuning.checkpoint_interval)
+        try:
+            await io_executor.run(_checkpoint)
+        except Exception as e:
+            logger.warning("Checkpoint failed: %r", e)
 
-        with state_lock:
-            state = export_cluster_state()
-            write_checkpoint(state)
-            truncate_wal()
+
+async def wal_compaction_loop():
+    while True:
+        await asyncio.sleep(WAL_COMPACT_INTERVAL)
+        try:
+            res = await io_executor.run(compact_wal, WAL_COMPACT_MIN_BYTES)
+        except Exception as e:
+            logger.warning("WAL compaction failed: %r", e)
+            continue
+        if res:
+            logger.info("Compacted WAL: %d records -> %d", *res)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     ensure_storage()
 
-    # Recovery: checkpoint + WAL replay
-    snapshot = load_checkpoint()
-    replace_cluster_state(snapshot)
+    # Bootstrap: a fresh or wiped node copies one peer's storage first, so
+    # that it joins gossip already caught up.
+    if BOOTSTRAP_ENABLED and PEERS and is_storage_empty():
+        await bootstrap_from_peer()
 
-    wal_updates = load_wal_updates()
-    for upd in wal_updates:
-        apply_update(upd)
+    # Recovery: archive index + checkpoint index (polls load lazily) + WAL replay
+    load_archive_index()
+    counter, closed, lazy = load_checkpoint()
+    replace_cluster_state(counter, closed, lazy)
+
+    wal_records = load_wal_records()
+    for rec in wal_records:
+        if isinstance(rec, PollClose):
+            close_poll(rec.poll_id)
+        else:
+            apply_update(rec)
+
+    # new component for this boot's non-durable votes (see durability.py)
+    start_epoch(next_boot_epoch())
+
+    await warm_up()
 
     tasks = [
+        asyncio.create_task(loop_monitor.run(), name="loop_monitor"),
         asyncio.create_task(heartbeat_loop(), name="heartbeat_loop"),
         asyncio.create_task(anti_entropy_loop(), name="anti_entropy_loop"),
         asyncio.create_task(checkpoint_loop(), name="checkpoint_loop"),
     ]
+    if PEERS:
+        tasks.append(asyncio.create_task(join_cluster(), name="join_cluster"))
+    if WAL_COMPACT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(wal_compaction_loop(), name="wal_compaction_loop"))
+
     try:
         yield
     finally:
         for task in tasks:
             task.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
-        await close_replication_clients()
+        await close_transport()
 
 
 app = FastAPI(
@@ -81,6 +163,12 @@ app = FastAPI(
 
 app.include_router(replication_router)
 app.include_router(failure_router)
+app.include_router(membership_router)
+app.include_router(bootstrap_router)
+app.include_router(logs_router)
+app.include_router(session_router)
+app.include_router(profiling_router)
+app.include_router(overview_router)
 
 app.mount("/ui", StaticFiles(directory=str(UI_DIR), html=True), name="ui")
 
@@ -96,18 +184,101 @@ def get_polls():
     return {"poll_ids": poll_ids, "node": NODE_ID}
 
 
-@app.post("/vote")
-async def vote(v: VoteIn):
+@app.post("/polls/counts")
+async def get_polls_counts(q: PollCountsQuery):
+    """
+    Counts of many polls in one request, read from one consistent state
+    view. Session tokens are not honoured here; use GET /poll/{poll_id}.
+    """
+    poll_ids = list(dict.fromkeys(q.poll_ids))
+    polls = await io_executor.run(query_polls, poll_ids, q.per_node)
+    return {"polls": polls, "node": NODE_ID}
+
+
+@app.get("/metrics")
+async def metrics():
+    # on the loop: registry, scheduler and transport tables change there
+    return {
+        "node": NODE_ID,
+        "admission": admission_stats(),
+        "transport": transport_stats(),
+        "anti_entropy": anti_entropy_scheduler.stats(),
+        "executors": executor_stats(),
+        "wal": wal_stats(),
+        "membership": registry.stats(),
+        "durability": durability_stats(),
+    }
+
+
+def _record_local_vote(poll_id: str, option: str, level: str):
+    """
+    Returns (update, WAL sequence number). Only "fsync" syncs here; the
+    other levels are completed by complete_write().
+    """
     with state_lock:
-        upd = build_local_update(v.poll_id, v.option, NODE_ID)
-        append_wal_update(upd)
+        if is_poll_closed(poll_id):
+            raise HTTPException(status_code=409, detail="Poll is closed")
+        upd = build_local_update(poll_id, option, component_node_id(level))
+        seq = 0
+        if level != "memory":
+            seq = append_wal_update(upd, sync=level == "fsync")
         apply_update(upd)
+        return upd, seq
+
 
-    asyncio.create_task(replicate_update_to_peers(upd))
-    return {"ok": True, "node": NODE_ID, "update": upd.model_dump()}
+def _read_poll(poll_id: str) -> dict:
+    with state_lock:
+        counts = query_poll_counts(poll_id)
+        closed = is_poll_closed(poll_id)
+    return {"poll_id": poll_id, "counts": counts, "closed": closed, "node": NODE_ID}
+
+
+@app.post("/vote")
+async def vote(v: VoteIn, request: Request):
+    check_vote_admission(request, v.poll_id)
+
+    level = level_for(v.poll_id, v.durability)
+
+    # WAL fsync and state_lock stay off the event loop
+    upd, seq = await io_executor.run(_record_local_vote, v.poll_id, v.option, level)
+
+    durability = await complete_write(level, upd, seq)
+    if level != "replicated":
+        # "replicated" already pushed to its peers in complete_write()
+        spawn_replication(lambda: replicate_update_to_peers(upd))
+    return {
+        "ok": True,
+        "node": NODE_ID,
+        "update": upd.model_dump(),
+        "session_token": encode_token(upd),
+        "durability": durability,
+    }
+
+
+@app.post("/poll/{poll_id}/close")
+async def close(poll_id: str):
+    try:
+        changed = await io_executor.run(apply_poll_close, poll_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown poll")
+    spawn_replication(lambda: replicate_poll_close_to_peers(poll_id))
+    return {"ok": True, "poll_id": poll_id, "changed": changed, "node": NODE_ID}
 
 
 @app.get("/poll/{poll_id}")
-def get_poll(poll_id: str):
-    counts = query_poll_counts(poll_id)
-    return {"poll_id": poll_id, "counts": counts, "node": NODE_ID}
\ No newline at end of file
+async def get_poll(
+    poll_id: str,
+    session: str | None = None,
+    x_session_token: str | None = Header(default=None),
+):
+    """
+    With a session token (query `session` or header X-Session-Token) from
+    /vote, the counts include that vote whenever it can be obtained.
+    """
+    token = session or x_session_token
+    satisfied = await wait_for_session(token, poll_id) if token else None
+
+    result = await io_executor.run(_read_poll, poll_id)
+    if satisfied is not None:
+        result["session_satisfied"] = satisfied
+    return result
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+Runtime cluster membership.
+
+Every node keeps a membership table url -> (node_id, status, version),
+seeded from PEERS at startup. Rows merge by version (higher wins; at equal
+versions "left" wins), so tables converge like the vote counters do:
+
+- join: a starting node announces itself to one peer
+  (POST /internal/membership/join), which bumps its row to active. A join
+  always skips one version, so it beats a concurrent leave of the same row
+- leave: POST /internal/membership/leave marks a member as left; the row
+  stays as a tombstone so that gossip cannot bring it back. A running node
+  that merges a table marking itself as left re-announces itself with a
+  higher version: only a stopped node stays out
+- gossip: heartbeat replies carry a digest of the table; on mismatch the
+  sender pushes its table to /internal/membership/sync and merges the reply
+
+Peers are indexed by URL, by (host, port) and by node id, so resolving a
+heartbeat sender or the origin of a session token is a dict lookup.
+Fanout, heartbeat/anti-entropy intervals and failure timeouts follow the
+number of active members (ClusterTuning).
+
+Tables are only modified on the event loop; other threads read immutable
+snapshots (peers tuple, index dicts replaced as a whole).
+"""
+import hashlib
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from .config import (
+    PEERS,
+    NODE_ID,
+    ADVERTISE_URL,
+    CLUSTER_SIZE,
+    adaptive_fanout,
+    adaptive_heartbeat_interval,
+    adaptive_anti_entropy_interval,
+    adaptive_anti_entropy_bounds,
+    adaptive_suspect_timeout,
+    adaptive_dead_timeout,
+    adaptive_connect_timeout,
+    adaptive_request_timeout,
+    adaptive_checkpoint_interval,
+)
+from .models import MemberEntry, MembershipTable, MemberJoin, MemberLeave
+from .security import verify_internal_token
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+ACTIVE = "active"
+LEFT = "left"
+
+# sender strings seen in heartbeats -> resolved peer; bounded, reset on change
+MAX_RESOLVE_CACHE = 4096
+
+
+def canonical_url(url: str) -> str:
+    url = url.strip().rstrip("/")
+    return url if "://" in url else f"http://{url}"
+
+
+def _address(url: str) -> Tuple[Optional[str], Optional[int]]:
+    parsed = urlparse(url if "://" in url else f"http://{url}")
+    try:
+        return parsed.hostname, parsed.port
+    except ValueError:
+        return parsed.hostname, None
+
+
+class ClusterTuning:
+    """
+    Timing values derived from the cluster size (adaptive_* in config.py).
+    Read the attributes at use time: they change with the membership.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.update(size)
+
+    def update(self, size: int) -> None:
+        self.size = size
+        self.fanout = adaptive_fanout(size)
+        self.heartbeat_interval = adaptive_heartbeat_interval(size)
+        self.anti_entropy_interval = adaptive_anti_entropy_interval(size)
+        self.anti_entropy_min_interval, self.anti_entropy_max_interval = adaptive_anti_entropy_bounds(size)
+        self.suspect_timeout = adaptive_suspect_timeout(size)
+        self.dead_timeout = adaptive_dead_timeout(size)
+        self.connect_timeout = adaptive_connect_timeout(size)
+        self.request_timeout = adaptive_request_timeout(size)
+        self.checkpoint_interval = adaptive_checkpoint_interval(size)
+
+    def snapshot(self) -> dict:
+        return dict(vars(self))
+
+
+class Member:
+    __slots__ = ("url", "node_id", "status", "version")
+
+    def __init__(self, url: str, node_id: Optional[str], status: str, version: int) -> None:
+        self.url = url
+        self.node_id = node_id
+        self.status = status
+        self.version = version
+
+    def to_entry(self) -> MemberEntry:
+        return MemberEntry(url=self.url, node_id=self.node_id, status=self.status, version=self.version)
+
+
+def _supersedes(entry: MemberEntry, cur: Member) -> bool:
+    if entry.version != cur.version:
+        return entry.version > cur.version
+    if entry.status != cur.status:
+        return entry.status == LEFT
+    # same row, the remote side knows the node id
+    return cur.node_id is None and entry.node_id is not None
+
+
+Listener = Callable[[List[str], List[str]], None]
+
+
+class PeerRegistry:
+    def __init__(self, self_url: str, self_node: str, seeds: Iterable[str]) -> None:
+        self.self_url = canonical_url(self_url)
+        self.self_node = self_node
+        self._members: Dict[str, Member] = {}
+        self._listeners: List[Listener] = []
+        self.peers: Tuple[str, ...] = ()
+        self._by_addr: Dict[Tuple[Optional[str], Optional[int]], str] = {}
+        self._by_host: Dict[Optional[str], Tuple[str, ...]] = {}
+        self._by_node: Dict[str, str] = {}
+        self._resolved: Dict[str, Optional[str]] = {}
+        self.digest = ""
+        self.changes = 0
+        self.rejoins = 0
+
+        for url in seeds:
+            url = canonical_url(url)
+            self._members[url] = Member(url, None, ACTIVE, 0)
+        self._members[self.self_url] = Member(self.self_url, self_node, ACTIVE, 1)
+        self._rebuild()
+
+    def subscribe(self, listener: Listener) -> None:
+        """
+        listener(added, removed) is called on the event loop whenever the
+        set of active peers changes.
+        """
+        self._listeners.append(listener)
+
+    def _rebuild(self) -> Tuple[List[str], List[str]]:
+        previous = set(self.peers)
+        peers = tuple(sorted(
+            url for url, m in self._members.items()
+            if m.status == ACTIVE and url != self.self_url
+        ))
+
+        by_addr: Dict[Tuple[Optional[str], Optional[int]], str] = {}
+        by_host: Dict[Optional[str], List[str]] = {}
+        by_node: Dict[str, str] = {}
+        for url in peers:
+            host, port = _address(url)
+            by_addr[(host, port)] = url
+            by_host.setdefault(host, []).append(url)
+            node_id = self._members[url].node_id
+            if node_id:
+                by_node[node_id] = url
+
+        self.peers = peers
+        self._by_addr = by_addr
+        self._by_host = {host: tuple(urls) for host, urls in by_host.items()}
+        self._by_node = by_node
+        self._resolved = {}
+
+        rows = sorted((m.url, m.version, m.status, m.node_id or "") for m in self._members.values())
+        self.digest = hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()[:16]
+
+        current = set(peers)
+        return sorted(current - previous), sorted(previous - current)
+
+    def _changed(self) -> None:
+        added, removed = self._rebuild()
+        self.changes += 1
+        if not added and not removed:
+            return
+
+        tuning.update(len(self.peers) + 1)
+        logger.info(
+            "Membership changed: +%s -%s (cluster size %d)",
+            added,
+            removed,
+            tuning.size,
+        )
+        for listener in self._listeners:
+            try:
+                listener(added, removed)
+            except Exception as e:
+                logger.warning("Membership listener failed: %r", e)
+
+    def resolve(self, sender: str) -> Optional[str]:
+        """
+        Active peer a heartbeat sender refers to:
+        - http://node2:8002 -> http://node2:8002
+        - node2:8002        -> http://node2:8002
+        - http://node2      -> http://node2:8002 (if only one peer has that host)
+        """
+        try:
+            return self._resolved[sender]
+        except KeyError:
+            pass
+
+        host, port = _address(sender.strip())
+        url = self._by_addr.get((host, port))
+        if url is None and port is None:
+            matches = self._by_host.get(host, ())
+            if len(matches) == 1:
+                url = matches[0]
+
+        if len(self._resolved) < MAX_RESOLVE_CACHE:
+            self._resolved[sender] = url
+        return url
+
+    def by_node(self, node_id: str) -> Optional[str]:
+        """
+        Active peer with this node id. Peers whose id is not known yet fall
+        back to the compose convention http://{node_id}:{port}.
+        """
+        url = self._by_node.get(node_id)
+        if url is not None:
+            return url
+        matches = self._by_host.get(node_id, ())
+        return matches[0] if len(matches) == 1 else None
+
+    def table(self) -> MembershipTable:
+        return MembershipTable(members=[m.to_entry() for m in self._members.values()])
+
+    def merge(self, entries: Iterable[MemberEntry]) -> bool:
+        changed = False
+        for entry in entries:
+            url = canonical_url(entry.url)
+            cur = self._members.get(url)
+            if cur is not None and not _supersedes(entry, cur):
+                continue
+
+            node_id = entry.node_id or (cur.node_id if cur is not None else None)
+            self._members[url] = Member(url, node_id, entry.status, entry.version)
+            changed = True
+
+        me = self._members[self.self_url]
+        if me.status == LEFT:
+            # still running: a leave (or a concurrent join that lost to it)
+            # must not leave this node out of everyone else's peer list
+            logger.warning("Marked as left at version %d, announcing this node again", me.version)
+            self._members[self.self_url] = Member(self.self_url, self.self_node, ACTIVE, me.version + 1)
+            self.rejoins += 1
+
+        if changed:
+            self._changed()
+        return changed
+
+    def join(self, url: str, node_id: str) -> None:
+        """
+        Bumps the row even if it is already active: a leave made
+        concurrently elsewhere gets cur.version + 1, the join cur.version + 2.
+        """
+        url = canonical_url(url)
+        cur = self._members.get(url)
+        version = cur.version + 2 if cur is not None else 1
+        self._members[url] = Member(url, node_id, ACTIVE, version)
+        self._changed()
+
+    def leave(self, url: str) -> bool:
+        url = canonical_url(url)
+        cur = self._members.get(url)
+        if cur is None:
+            raise KeyError(url)
+        if cur.status == LEFT:
+            return False
+
+        self._members[url] = Member(url, cur.node_id, LEFT, cur.version + 1)
+        self._changed()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "self": self.self_url,
+            "digest": self.digest,
+            "size": len(self.peers) + 1,
+            "changes": self.changes,
+            "rejoins": self.rejoins,
+            "left": sum(1 for m in self._members.values() if m.status == LEFT),
+        }
+
+
+tuning = ClusterTuning(CLUSTER_SIZE)
+registry = PeerRegistry(ADVERTISE_URL, NODE_ID, PEERS)
+
+
+def _reply() -> dict:
+    return {"node": NODE_ID, "digest": registry.digest, **registry.table().model_dump()}
+
+
+@router.get("/internal/membership")
+async def internal_membership(_: None = Depends(verify_internal_token)):
+    return {**_reply(), "peers": list(registry.peers), "tuning": tuning.snapshot()}
+
+
+@router.post("/internal/membership/join")
+async def internal_membership_join(body: MemberJoin, _: None = Depends(verify_internal_token)):
+    """
+    Add (or re-add) a node. Called by a starting node on one of its PEERS,
+    or by an operator; the change spreads through heartbeat gossip.
+    """
+    registry.join(body.url, body.node_id)
+    return _reply()
+
+
+@router.post("/internal/membership/leave")
+async def internal_membership_leave(body: MemberLeave, _: None = Depends(verify_internal_token)):
+    """
+    Remove a node from the cluster (it stops receiving heartbeats,
+    replication and anti-entropy). A node that restarts joins again.
+    """
+    try:
+        registry.leave(body.url)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown member")
+    return _reply()
+
+
+@router.post("/internal/membership/sync")
+async def internal_membership_sync(body: MembershipTable, _: None = Depends(verify_internal_token)):
+    """
+    Push-pull gossip: merge the caller's table and return ours.
+    """
+    registry.merge(body.members)
+    return _reply()
@@ -1,6 +1,8 @@
-from typing import Dict, Annotated
+from typing import Dict, List, Literal, Annotated
 from pydantic import BaseModel, Field, StringConstraints
 
+from .config import POLL_BATCH_MAX
+
 
 class VoteIn(BaseModel):
     poll_id: Annotated[
@@ -13,6 +15,21 @@ class VoteIn(BaseModel):
         StringConstraints(strip_whitespace=True, min_length=1, max_length=32)
     ] = Field(..., examples=["A"])
 
+    # overrides the poll's durability level for this vote (see durability.py)
+    durability: Literal["fsync", "group", "replicated", "memory"] | None = None
+
+
+class PollCountsQuery(BaseModel):
+    """
+    Batched read: counts of many polls from one consistent state view.
+    per_node adds the G-Counter components behind each total. The length
+    limit applies to the raw list, duplicates included.
+    """
+    poll_ids: List[
+        Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=64)]
+    ] = Field(..., min_length=1, max_length=POLL_BATCH_MAX, examples=[["poll1", "poll2"]])
+    per_node: bool = False
+
 
 class CounterUpdate(BaseModel):
     """
@@ -37,17 +54,65 @@ class CounterUpdate(BaseModel):
     value: int = Field(ge=0)
 
 
+class PollClose(BaseModel):
+    """
+    Marks a poll as closed. Closing is monotonic: a closed poll never reopens.
+    """
+    poll_id: Annotated[
+        str,
+        StringConstraints(strip_whitespace=True, min_length=1, max_length=64)
+    ]
+
+
 class PollCRDTState(BaseModel):
     """
     Full CRDT state for one poll:
     counts[option][node_id] = value
+    closed is a two-state lattice (open < closed), merged with OR.
     """
     counts: Dict[str, Dict[str, int]]
+    closed: bool = False
 
 
 class ClusterCRDTState(BaseModel):
     """
     Full CRDT state for all polls:
     polls[poll_id] = PollCRDTState
+    archived[poll_id] = digest of a closed poll evicted to the on-disk archive
     """
-    polls: Dict[str, PollCRDTState]
\ No newline at end of file
+    polls: Dict[str, PollCRDTState]
+    archived: Dict[str, str] = Field(default_factory=dict)
+
+
+class ExchangeResult(BaseModel):
+    """
+    Reply of a push-pull anti-entropy exchange:
+    missing holds only what the caller lacks.
+    """
+    missing: ClusterCRDTState
+    applied_updates: int
+    node: str
+
+
+class MemberEntry(BaseModel):
+    """
+    One row of the membership table. Rows merge by version; at equal
+    versions "left" wins over "active".
+    """
+    url: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=256)]
+    node_id: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=64)] | None = None
+    status: Literal["active", "left"] = "active"
+    version: int = Field(default=0, ge=0)
+
+
+class MembershipTable(BaseModel):
+    members: List[MemberEntry]
+
+
+class MemberJoin(BaseModel):
+    url: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=256)]
+    node_id: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=64)]
+
+
+class MemberLeave(BaseModel):
+    url: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=256)]
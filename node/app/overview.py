@@ -0,0 +1,187 @@
+"""
+Cluster-wide status and convergence in one request.
+
+GET /cluster/overview asks every peer that is not DEAD for its state
+digest (GET /internal/cluster/digest) in parallel, with a short timeout,
+and merges the replies with the local ones:
+
+- membership: each node's failure-detector view of the others
+  (observer url -> peer url -> state), plus its membership digest
+- nodes: per node, reachability, state digest and number of polls
+- divergent_polls: polls whose digest is not the same on every reachable
+  node (missing on a node counts as different)
+
+Each node splits its state into CLUSTER_DIGEST_BUCKETS buckets by poll id
+(state.convergence_summary). Equal state digests end the check after one
+round; otherwise only the buckets that differ are fetched again, this time
+as per-poll digests. Per-poll digests of hot and lazy polls are cached in
+state.py until the poll changes, so a repeated check does not re-read the
+state; archived polls are digested from the archive index each time.
+
+The result is cached for CLUSTER_OVERVIEW_TTL seconds and concurrent
+callers share one fan-out.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from fastapi import APIRouter, Depends, Query
+
+from .config import (
+    NODE_ID,
+    CLUSTER_OVERVIEW_TTL,
+    CLUSTER_OVERVIEW_TIMEOUT,
+    CLUSTER_DIGEST_BUCKETS,
+    CLUSTER_OVERVIEW_MAX_POLLS,
+)
+from .security import verify_internal_token
+from .state import convergence_summary, convergence_digests_in
+from .executors import merge_executor
+from .transport import peer_request
+from .failure import get_peer_states
+from .membership import registry
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_cached: dict | None = None
+_cached_at = 0.0
+_inflight: asyncio.Task | None = None
+
+
+async def _local_digest(buckets: int, selected: List[int] | None) -> dict:
+    reply = {
+        "node": NODE_ID,
+        "url": registry.self_url,
+        "members": registry.digest,
+        "peers": get_peer_states(),
+    }
+    if selected:
+        reply["poll_digests"] = await merge_executor.run(convergence_digests_in, selected, buckets)
+    else:
+        reply.update(await merge_executor.run(convergence_summary, buckets))
+    return reply
+
+
+@router.get("/internal/cluster/digest")
+async def internal_cluster_digest(
+    buckets: int = Query(CLUSTER_DIGEST_BUCKETS, ge=1, le=65536),
+    bucket: List[int] | None = Query(None),
+    _: None = Depends(verify_internal_token),
+):
+    """
+    State digest split in `buckets`, or with `bucket` the per-poll digests
+    of those buckets only. Also carries this node's view of its peers.
+    """
+    return await _local_digest(buckets, bucket)
+
+
+async def _fetch(peer: str, params: dict) -> dict | None:
+    try:
+        resp = await peer_request(
+            peer,
+            "GET",
+            "/internal/cluster/digest",
+            bounded=False,
+            params=params,
+            timeout=CLUSTER_OVERVIEW_TIMEOUT,
+        )
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        logger.info("Cluster digest from %s failed: %r", peer, e)
+        return None
+
+
+async def _gather(peers: List[str], params: dict) -> Dict[str, dict | None]:
+    selected = params.get("bucket")
+    replies = await asyncio.gather(
+        _local_digest(CLUSTER_DIGEST_BUCKETS, selected),
+        *[_fetch(peer, params) for peer in peers],
+    )
+    return dict(zip([registry.self_url, *peers], replies))
+
+
+def _divergent_buckets(summaries: List[dict]) -> List[int]:
+    return [
+        i for i in range(CLUSTER_DIGEST_BUCKETS)
+        if len({s["buckets"][i] for s in summaries}) > 1
+    ]
+
+
+async def _build() -> dict:
+    started = time.monotonic()
+    states = get_peer_states()
+    live = [peer for peer in registry.peers if states.get(peer) != "DEAD"]
+    node_ids = {m.url: m.node_id for m in registry.table().members}
+
+    replies = await _gather(live, {"buckets": CLUSTER_DIGEST_BUCKETS})
+    reachable = {url: r for url, r in replies.items() if r is not None}
+    summaries = list(reachable.values())
+
+    nodes = {}
+    for url in [registry.self_url, *registry.peers]:
+        reply = reachable.get(url)
+        entry = {"node_id": node_ids.get(url), "reachable": reply is not None}
+        if reply is not None:
+            entry.update(
+                node_id=reply["node"],
+                state_digest=reply["state_digest"],
+                polls=reply["polls"],
+                members=reply["members"],
+            )
+        elif url not in replies:
+            entry["skipped"] = states.get(url)
+        nodes[url] = entry
+
+    membership = {url: {**r["peers"], url: "SELF"} for url, r in reachable.items()}
+
+    divergent: Dict[str, Dict[str, str | None]] = {}
+    buckets = []
+    if len({s["state_digest"] for s in summaries}) > 1:
+        buckets = _divergent_buckets(summaries)
+        peers = [url for url in reachable if url != registry.self_url]
+        replies = await _gather(peers, {"buckets": CLUSTER_DIGEST_BUCKETS, "bucket": buckets})
+        per_node = {url: r["poll_digests"] for url, r in replies.items() if r is not None}
+        for poll_id in sorted(set().union(*per_node.values())):
+            digests = {url: d.get(poll_id) for url, d in per_node.items()}
+            if len(set(digests.values())) > 1:
+                divergent[poll_id] = digests
+
+    return {
+        "node": NODE_ID,
+        "generated_in_ms": round(1000 * (time.monotonic() - started), 2),
+        "converged": len(reachable) == len(nodes) and not buckets,
+        "membership_agrees": len({r["members"] for r in summaries}) == 1,
+        "nodes": nodes,
+        "membership": membership,
+        "divergent_buckets": len(buckets),
+        "divergent_polls_total": len(divergent),
+        "divergent_polls": dict(list(divergent.items())[:CLUSTER_OVERVIEW_MAX_POLLS]),
+    }
+
+
+@router.get("/cluster/overview")
+async def cluster_overview(refresh: bool = False):
+    """
+    Health and convergence of the whole cluster as seen from this node.
+    `refresh=true` skips the cache.
+    """
+    global _cached, _cached_at, _inflight
+
+    age = time.monotonic() - _cached_at
+    if _cached is not None and not refresh and age < CLUSTER_OVERVIEW_TTL:
+        return {**_cached, "cached": True, "age_seconds": round(age, 3)}
+
+    if _inflight is None or _inflight.done():
+        _inflight = asyncio.create_task(_build())
+    task = _inflight
+    try:
+        result = await asyncio.shield(task)
+    finally:
+        if _inflight is task and task.done():
+            _inflight = None
+
+    _cached, _cached_at = result, time.monotonic()
+    return {**result, "cached": False, "age_seconds": 0.0}
@@ -0,0 +1,174 @@
+"""
+Live profiling surface (internal, token-protected).
+
+- event-loop lag: a task that sleeps LAG_TICK and records how late it
+  wakes up; anything blocking the loop (sync I/O in an async handler)
+  shows up here
+- lock histograms: wait and hold times of state_lock / storage_lock
+- threadpool: usage of the worker threads that run sync handlers
+- CPU profile: samples every thread's stack for N seconds and returns
+  collapsed stacks ("frame;frame;frame count"), the input format of
+  flamegraph.pl / speedscope
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+import anyio.to_thread
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from .histogram import Histogram
+from .locks import state_lock, storage_lock
+from .security import verify_internal_token
+
+router = APIRouter()
+
+LAG_TICK = 0.1
+MAX_PROFILE_SECONDS = 60.0
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        self.lag = Histogram()
+        self.reset()
+
+    def reset(self) -> None:
+        self.lag.reset()
+        self.last_lag = 0.0
+        self.threadpool_peak = 0
+        self.threadpool_saturated_ticks = 0
+        self.ticks = 0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(LAG_TICK)
+            lag = max(0.0, loop.time() - t0 - LAG_TICK)
+            self.last_lag = lag
+            self.lag.observe(lag)
+
+            limiter = anyio.to_thread.current_default_thread_limiter()
+            borrowed = limiter.borrowed_tokens
+            self.threadpool_peak = max(self.threadpool_peak, borrowed)
+            if borrowed >= limiter.total_tokens:
+                self.threadpool_saturated_ticks += 1
+            self.ticks += 1
+
+
+loop_monitor = LoopMonitor()
+
+
+def _threadpool_stats() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "size": limiter.total_tokens,
+        "busy": limiter.borrowed_tokens,
+        "waiting": limiter.statistics().tasks_waiting,
+        "peak_busy": loop_monitor.threadpool_peak,
+        "saturated_ratio": (
+            round(loop_monitor.threadpool_saturated_ticks / loop_monitor.ticks, 4)
+            if loop_monitor.ticks else 0.0
+        ),
+    }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}"
+
+
+def _sample_stacks(seconds: float, interval: float) -> Counter:
+    me = threading.get_ident()
+    names: Dict[int, str] = {}
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            if ident not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame))
+                frame = frame.f_back
+            frames.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(frames))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+
+_profile_lock = threading.Lock()
+
+
+@router.get("/internal/profile")
+async def internal_profile_stats(_: None = Depends(verify_internal_token)):
+    return {
+        "loop_lag": {"last_ms": round(loop_monitor.last_lag * 1000, 3), **loop_monitor.lag.snapshot()},
+        "locks": {lock.name: lock.stats() for lock in (state_lock, storage_lock)},
+        "threadpool": _threadpool_stats(),
+    }
+
+
+@router.post("/internal/profile/reset")
+def internal_profile_reset(_: None = Depends(verify_internal_token)):
+    loop_monitor.reset()
+    state_lock.reset()
+    storage_lock.reset()
+    return {"ok": True}
+
+
+@router.get("/internal/profile/cpu", response_class=PlainTextResponse)
+async def internal_profile_cpu(
+    seconds: float = 5.0,
+    interval_ms: float = 5.0,
+    _: None = Depends(verify_internal_token),
+):
+    """
+    Sample all threads for `seconds` and return collapsed stacks.
+    Idle threads are included (their stacks end in wait/select).
+    """
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be >= 1")
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+
+    try:
+        # own thread: the sampler must not take a threadpool slot or the loop
+        loop = asyncio.get_running_loop()
+        done: asyncio.Future = loop.create_future()
+
+        def _finish(result: Counter | None, error: BaseException | None) -> None:
+            if done.done():
+                return
+            if error is not None:
+                done.set_exception(error)
+            else:
+                done.set_result(result)
+
+        def _run() -> None:
+            # always resolve `done`, or the request and _profile_lock hang
+            try:
+                result = _sample_stacks(seconds, interval_ms / 1000.0)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_finish, None, e)
+            else:
+                loop.call_soon_threadsafe(_finish, result, None)
+
+        threading.Thread(target=_run, name="cpu-profiler", daemon=True).start()
+        stacks = await done
+    finally:
+        _profile_lock.release()
+
+    return "\n".join(f"{stack} {n}" for stack, n in stacks.most_common()) + "\n"
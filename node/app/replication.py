@@ -1,65 +1,43 @@
 import asyncio
 import logging
 import random
-import httpx
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
 
-from .config import PEERS, NODE_ID, ANTI_ENTROPY_INTERVAL, INTERNAL_TOKEN, FANOUT, REQUEST_TIMEOUT, CONNECT_TIMEOUT, STARTUP_DELAY
-from .models import CounterUpdate, PollCRDTState, ClusterCRDTState
+from .config import NODE_ID, STARTUP_DELAY
+from .models import CounterUpdate, PollCRDTState, ClusterCRDTState, ExchangeResult
 from .state import (
     would_change_update,
     apply_update,
+    close_poll,
+    is_poll_closed,
+    poll_exists,
     export_poll_state,
-    export_cluster_state,
-    extract_new_updates_from_poll_state,
-    extract_new_updates_from_cluster_state,
-    g_counter,
+    plan_merge,
+    apply_merge,
+    archived_polls_to_fetch,
+    diff_cluster_state,
+    cluster_state_bytes,
 )
 from .utils import internal_auth_headers
-from .storage import append_wal_update
+from .storage import append_wal_update, append_wal_close, append_wal_batch
+from .codec import decode_cluster_state, decode_exchange_result, encode_exchange_result
 from .locks import state_lock
 from .security import verify_internal_token
 from .failure import get_peer_states
+from .transport import peer_request
+from .scheduler import anti_entropy_scheduler
+from .executors import merge_executor
+from .membership import registry, tuning
+from .groupcommit import group_commit
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-_replication_client: httpx.AsyncClient | None = None
-_anti_entropy_client: httpx.AsyncClient | None = None
-
-
-def get_replication_client() -> httpx.AsyncClient:
-    global _replication_client
-    if _replication_client is None:
-        _replication_client = httpx.AsyncClient(
-            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
-        )
-    return _replication_client
-
-
-def get_anti_entropy_client() -> httpx.AsyncClient:
-    global _anti_entropy_client
-    if _anti_entropy_client is None:
-        _anti_entropy_client = httpx.AsyncClient(
-            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
-        )
-    return _anti_entropy_client
-
-
-async def close_replication_clients() -> None:
-    global _replication_client, _anti_entropy_client
-
-    if _replication_client is not None:
-        await _replication_client.aclose()
-        _replication_client = None
-
-    if _anti_entropy_client is not None:
-        await _anti_entropy_client.aclose()
-        _anti_entropy_client = None
-
-def _live_peers_sample(max_targets: int = FANOUT) -> list[str]:
+def _live_peers_sample(max_targets: int | None = None) -> list[str]:
     states = get_peer_states()
-    candidates = [peer for peer in PEERS if states.get(peer) != "DEAD"]
+    candidates = [peer for peer in registry.peers if states.get(peer) != "DEAD"]
+    max_targets = tuning.fanout if max_targets is None else max_targets
     if len(candidates) <= max_targets:
         return candidates
     return random.sample(candidates, max_targets)
@@ -69,23 +47,35 @@ async def _replicate_update_to_peer(
     peer: str,
     payload: dict,
     headers: dict[str, str],
-) -> None:
-    client = get_replication_client()
+) -> bool:
+    """
+    Returns True iff the peer applied the update.
+    """
     try:
-        resp = await client.post(
-            f"{peer}/internal/counter/update",
+        resp = await peer_request(
+            peer,
+            "POST",
+            "/internal/counter/update",
             json=payload,
             headers=headers,
         )
-        logger.info(
-            "Replication to %s -> status=%s body=%s",
-            peer,
-            resp.status_code,
-            resp.text,
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Replication to %s -> status=%s",
+                peer,
+                resp.status_code,
+                extra={"category": "replication_push"},
+            )
         resp.raise_for_status()
+        return True
     except Exception as e:
-        logger.warning("Replication to %s failed: %r", peer, e)
+        logger.warning(
+            "Replication to %s failed: %r",
+            peer,
+            e,
+            extra={"category": "replication_error"},
+        )
+        return False
 
 
 async def replicate_update_to_peers(upd: CounterUpdate) -> None:
@@ -96,12 +86,15 @@ async def replicate_update_to_peers(upd: CounterUpdate) -> None:
     headers = internal_auth_headers()
     payload = upd.model_dump()
 
-    logger.info(
-        "Replicating update from %s payload=%s targets=%s",
-        NODE_ID,
-        payload,
-        targets,
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Replicating update poll=%s option=%s value=%s targets=%s",
+            upd.poll_id,
+            upd.option,
+            upd.value,
+            targets,
+            extra={"category": "replication_push"},
+        )
 
     await asyncio.gather(
         *[
@@ -112,59 +105,208 @@ async def replicate_update_to_peers(upd: CounterUpdate) -> None:
     )
 
 
+_ack_pushes: set[asyncio.Task] = set()
+
+
+async def replicate_update_with_acks(upd: CounterUpdate, acks: int, timeout: float) -> int:
+    """
+    Push to max(acks, fanout) live peers and return as soon as `acks` of
+    them applied the update, or when `timeout` expires. Pushes still in
+    flight keep running in the background.
+    Returns the number of acks received.
+    """
+    targets = _live_peers_sample(max(acks, tuning.fanout))
+    if not targets:
+        return 0
+
+    headers = internal_auth_headers()
+    payload = upd.model_dump()
+    pushes = [
+        asyncio.create_task(_replicate_update_to_peer(peer, payload, headers))
+        for peer in targets
+    ]
+    for task in pushes:
+        _ack_pushes.add(task)
+        task.add_done_callback(_ack_pushes.discard)
+
+    received = 0
+    try:
+        for push in asyncio.as_completed(pushes, timeout=timeout):
+            if await push:
+                received += 1
+                if received >= acks:
+                    break
+    except asyncio.TimeoutError:
+        pass
+    return received
+
+
+def apply_poll_close(poll_id: str) -> bool:
+    """
+    Durably close a poll locally (WAL first, then memory).
+    Returns True iff the poll was open before; raises KeyError for a poll
+    this node does not know.
+    """
+    with state_lock:
+        if is_poll_closed(poll_id):
+            return False
+        if not poll_exists(poll_id):
+            raise KeyError(poll_id)
+        append_wal_close(poll_id)
+        return close_poll(poll_id)
+
+
+async def replicate_poll_close_to_peers(poll_id: str) -> None:
+    """
+    Push the closed poll state to peers through the existing per-poll merge
+    endpoint. Best effort: anti-entropy carries the closed flag as well.
+    """
+    targets = _live_peers_sample()
+    if not targets:
+        return
+
+    headers = internal_auth_headers()
+    payload = export_poll_state(poll_id).model_dump()
+
+    async def _push(peer: str) -> None:
+        try:
+            resp = await peer_request(
+                peer,
+                "POST",
+                f"/internal/merge/{poll_id}",
+                json=payload,
+                headers=headers,
+            )
+            resp.raise_for_status()
+        except Exception as e:
+            logger.warning("Close replication of %s to %s failed: %r", poll_id, peer, e)
+
+    await asyncio.gather(*[_push(peer) for peer in targets], return_exceptions=True)
+
+
+def apply_remote_update(upd: CounterUpdate) -> bool:
+    """
+    Merge one component received from another node.
+    The WAL record is flushed by the next group commit instead of its own
+    fsync: the origin node still holds the component, so a copy lost in a
+    crash comes back through anti-entropy. This is also what makes the ack
+    of a "replicated" vote cheap (applied in memory, flushed shortly after).
+    Returns True iff local state changed.
+    """
+    with state_lock:
+        changed = would_change_update(upd)
+        if changed:
+            seq = append_wal_update(upd, sync=False)
+            apply_update(upd)
+    if changed:
+        group_commit.request(seq)
+    return changed
+
+
+def merge_cluster_state(other: dict) -> int:
+    """
+    Durably merge a decoded remote cluster state (components and closed
+    flags): one pass to find what is newer, one WAL batch with one fsync,
+    then the values are written in place.
+    Returns the number of applied component updates.
+    """
+    with state_lock:
+        plan = plan_merge(other["polls"], other["archived"])
+        if plan:
+            append_wal_batch(plan.components, plan.closes)
+            apply_merge(plan)
+
+    return len(plan.components)
+
+
+def merge_poll_state(poll_id: str, other: PollCRDTState) -> int:
+    """
+    Durably merge a remote poll state. Returns the number of applied updates.
+    """
+    return merge_cluster_state({
+        "polls": {poll_id: {"counts": other.counts, "closed": other.closed}},
+        "archived": {},
+    })
+
+
 @router.post("/internal/counter/update")
 def internal_counter_update(
     upd: CounterUpdate,
     _: None = Depends(verify_internal_token),
 ):
-    logger.info(
-        "[%s] RECEIVED update: poll=%s option=%s node=%s value=%s",
-        NODE_ID,
-        upd.poll_id,
-        upd.option,
-        upd.node_id,
-        upd.value,
-    )
-
-    with state_lock:
-        prev = g_counter.get(upd.poll_id, {}).get(upd.option, {}).get(upd.node_id, 0)
-        changed = would_change_update(upd)
-
-        logger.info(
-            "[%s] BEFORE apply: prev=%s incoming=%s changed=%s",
-            NODE_ID,
-            prev,
+    changed = apply_remote_update(upd)
+
+    # One sampled record per update, formatted off the request path.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Received update poll=%s option=%s node=%s value=%s changed=%s",
+            upd.poll_id,
+            upd.option,
+            upd.node_id,
             upd.value,
             changed,
+            extra={"category": "update_received"},
         )
 
-        if changed:
-            append_wal_update(upd)
-            apply_update(upd)
-            logger.info("[%s] APPLIED update", NODE_ID)
-        else:
-            logger.warning("[%s] IGNORED update (not newer)", NODE_ID)
-
     return {"ok": True, "changed": changed, "node": NODE_ID}
 
 
-@router.get("/internal/cluster-state")
-def internal_cluster_state(_: None = Depends(verify_internal_token)) -> ClusterCRDTState:
-    return export_cluster_state()
+@router.get("/internal/cluster-state", response_model=ClusterCRDTState)
+def internal_cluster_state(_: None = Depends(verify_internal_token)):
+    # encoded straight from g_counter, bypassing the response model
+    return Response(content=cluster_state_bytes(), media_type="application/json")
 
 
-@router.post("/internal/cluster-merge")
-def internal_cluster_merge(
-    other: ClusterCRDTState,
+def _parse_cluster_state(body: bytes) -> dict:
+    try:
+        return decode_cluster_state(body)
+    except ValueError as e:
+        raise RequestValidationError([{"type": "value_error", "loc": ("body",), "msg": str(e), "input": None}])
+
+
+# Full cluster states can be large: the body is taken raw and decoded on the
+# merge executor, because FastAPI validates declared bodies on the event loop.
+_CLUSTER_STATE_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/ClusterCRDTState"}}},
+    }
+}
+
+
+def _cluster_merge(body: bytes) -> int:
+    return merge_cluster_state(_parse_cluster_state(body))
+
+
+@router.post("/internal/cluster-merge", openapi_extra=_CLUSTER_STATE_BODY)
+async def internal_cluster_merge(
+    request: Request,
     _: None = Depends(verify_internal_token),
 ):
+    applied = await merge_executor.run(_cluster_merge, await request.body())
+    return {"ok": True, "applied_updates": applied, "node": NODE_ID}
+
+
+def _exchange(body: bytes) -> bytes:
+    other = _parse_cluster_state(body)
     with state_lock:
-        updates = extract_new_updates_from_cluster_state(other)
-        for upd in updates:
-            append_wal_update(upd)
-            apply_update(upd)
+        applied = merge_cluster_state(other)
+        missing = diff_cluster_state(other)
+
+    return encode_exchange_result(missing, applied, NODE_ID)
+
 
-    return {"ok": True, "applied_updates": len(updates), "node": NODE_ID}
+@router.post("/internal/exchange", response_model=ExchangeResult, openapi_extra=_CLUSTER_STATE_BODY)
+async def internal_exchange(
+    request: Request,
+    _: None = Depends(verify_internal_token),
+):
+    """
+    Push-pull anti-entropy in one round trip: merge the caller's state,
+    then reply with only what the caller is missing.
+    """
+    reply = await merge_executor.run(_exchange, await request.body())
+    return Response(content=reply, media_type="application/json")
 
 
 @router.get("/internal/state/{poll_id}")
@@ -181,13 +323,8 @@ def internal_merge(
     other: PollCRDTState,
     _: None = Depends(verify_internal_token),
 ):
-    with state_lock:
-        updates = extract_new_updates_from_poll_state(poll_id, other)
-        for upd in updates:
-            append_wal_update(upd)
-            apply_update(upd)
-
-    return {"ok": True, "applied_updates": len(updates), "node": NODE_ID}
+    applied = merge_poll_state(poll_id, other)
+    return {"ok": True, "applied_updates": applied, "node": NODE_ID}
 
 
 @router.post("/internal/sync/{poll_id}")
@@ -196,27 +333,18 @@ async def internal_sync(poll_id: str, _: None = Depends(verify_internal_token)):
     if not targets:
         raise HTTPException(status_code=503, detail="No peer reachable for sync")
 
-    client = get_replication_client()
-
     for peer in targets:
         try:
-            st = await client.get(
-                f"{peer}/internal/state/{poll_id}",
-                headers=internal_auth_headers(),
-            )
+            st = await peer_request(peer, "GET", f"/internal/state/{poll_id}")
             st.raise_for_status()
             other = PollCRDTState(**st.json())
 
-            with state_lock:
-                updates = extract_new_updates_from_poll_state(poll_id, other)
-                for upd in updates:
-                    append_wal_update(upd)
-                    apply_update(upd)
+            applied = await merge_executor.run(merge_poll_state, poll_id, other)
 
             return {
                 "ok": True,
                 "synced_from": peer,
-                "applied_updates": len(updates),
+                "applied_updates": applied,
                 "node": NODE_ID,
             }
         except Exception as e:
@@ -225,47 +353,94 @@ async def internal_sync(poll_id: str, _: None = Depends(verify_internal_token)):
     raise HTTPException(status_code=503, detail="No peer reachable for sync")
 
 
-async def _pull_cluster_state_from_peer(peer: str) -> ClusterCRDTState | None:
-    client = get_anti_entropy_client()
+async def _exchange_with_peer(peer: str, body: bytes) -> tuple[tuple[dict, int, str], int] | None:
+    """
+    Send our state, receive what we lack. Returns the reply and the number
+    of bytes moved in both directions.
+    """
     try:
-        resp = await client.get(
-            f"{peer}/internal/cluster-state",
-            headers=internal_auth_headers(),
+        resp = await peer_request(
+            peer,
+            "POST",
+            "/internal/exchange",
+            content=body,
+            headers={**internal_auth_headers(), "Content-Type": "application/json"},
         )
         resp.raise_for_status()
-        return ClusterCRDTState(**resp.json())
+        reply = await merge_executor.run(decode_exchange_result, resp.content)
+        return reply, len(body) + len(resp.content)
     except Exception as e:
         logger.warning("Anti-entropy failed from %s: %r", peer, e)
         return None
 
 
+async def _pull_poll_state_from_peer(peer: str, poll_id: str) -> PollCRDTState | None:
+    try:
+        resp = await peer_request(peer, "GET", f"/internal/state/{poll_id}")
+        resp.raise_for_status()
+        return PollCRDTState(**resp.json())
+    except Exception as e:
+        logger.warning("Anti-entropy pull of poll %s from %s failed: %r", poll_id, peer, e)
+        return None
+
+
+async def _sync_archived_polls(peer: str, other: dict) -> int:
+    """
+    Archived polls travel as digests only; pull the full state of a poll
+    only when its digest differs from the local copy.
+    Returns the number of applied updates.
+    """
+    applied = 0
+    for poll_id in await merge_executor.run(archived_polls_to_fetch, other["archived"]):
+        poll_state = await _pull_poll_state_from_peer(peer, poll_id)
+        if poll_state is None:
+            continue
+
+        applied += await merge_executor.run(merge_poll_state, poll_id, poll_state)
+
+    return applied
+
+
+def _anti_entropy_targets() -> list[str]:
+    states = get_peer_states()
+    candidates = [peer for peer in registry.peers if states.get(peer) != "DEAD"]
+    return anti_entropy_scheduler.select(candidates, tuning.fanout)
+
+
 async def anti_entropy_loop() -> None:
-    if not PEERS:
-        return
+    # runs even without peers: members may join later
+    anti_entropy_scheduler.attach()
 
     # lascia assestare il cluster all'avvio
     await asyncio.sleep(STARTUP_DELAY + random.uniform(0, 3))
 
     while True:
+        round_applied = 0
         try:
-            targets = _live_peers_sample()
+            targets = _anti_entropy_targets()
 
             if targets:
-                states = await asyncio.gather(
-                    *[_pull_cluster_state_from_peer(peer) for peer in targets],
+                body = await merge_executor.run(cluster_state_bytes)
+                results = await asyncio.gather(
+                    *[_exchange_with_peer(peer, body) for peer in targets],
                     return_exceptions=True,
                 )
 
-                with state_lock:
-                    for other in states:
-                        if isinstance(other, Exception) or other is None:
-                            continue
-
-                        updates = extract_new_updates_from_cluster_state(other)
-                        for upd in updates:
-                            append_wal_update(upd)
-                            apply_update(upd)
+                pulled: list[tuple[str, dict, int]] = []
+                for peer, res in zip(targets, results):
+                    if isinstance(res, BaseException) or res is None:
+                        continue
+                    (missing, peer_applied, _), nbytes = res
+                    pulled.append((peer, missing, nbytes))
+                    # divergence the peer repaired on its side counts too
+                    round_applied += peer_applied
+
+                for peer, other, nbytes in pulled:
+                    applied = await merge_executor.run(merge_cluster_state, other)
+                    applied += await _sync_archived_polls(peer, other)
+                    anti_entropy_scheduler.record(peer, applied, nbytes)
+                    round_applied += applied
         except Exception as e:
             logger.warning("Anti-entropy loop error: %r", e)
 
-        await asyncio.sleep(ANTI_ENTROPY_INTERVAL)
\ No newline at end of file
+        await anti_entropy_scheduler.wait(anti_entropy_scheduler.end_round(round_applied))
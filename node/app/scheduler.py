@@ -0,0 +1,163 @@
+# anti-entropy scheduling: divergence-driven peer selection + adaptive interval
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from .config import ANTI_ENTROPY_ADAPTIVE
+from .membership import tuning
+
+
+class PeerSyncResult:
+    def __init__(self) -> None:
+        self.last_sync = 0.0
+        self.last_applied = 0
+        self.last_bytes = 0
+        self.rounds = 0
+        self.applied_total = 0
+        self.bytes_total = 0
+
+
+class AntiEntropyScheduler:
+    """
+    Decides whom to pull from and when.
+
+    Peers are ranked by: just returned from SUSPECT/DEAD, then recently
+    delivered updates, then time since their last sync (so in-sync peers are
+    still visited, just less often). The interval backs off while rounds
+    apply nothing and snaps to the minimum after divergence or a recovery.
+    With ANTI_ENTROPY_ADAPTIVE=0 it behaves like the old fixed random
+    schedule, which keeps the two comparable through the same metrics.
+    """
+
+    def __init__(self) -> None:
+        self.interval = tuning.anti_entropy_interval
+        self.peers: Dict[str, PeerSyncResult] = {}
+        self.recovered_at: Dict[str, float] = {}
+        self.rounds = 0
+        self.applied_total = 0
+        self.bytes_total = 0
+        self._wakeup: asyncio.Event | None = None
+
+    def attach(self) -> None:
+        """Bind to the running event loop (called from anti_entropy_loop)."""
+        self._wakeup = asyncio.Event()
+
+    def _result(self, peer: str) -> PeerSyncResult:
+        result = self.peers.get(peer)
+        if result is None:
+            result = PeerSyncResult()
+            self.peers[peer] = result
+        return result
+
+    def mark_recovered(self, peer: str) -> None:
+        """
+        A peer came back from SUSPECT/DEAD. Called on the event loop by
+        the heartbeat handler.
+        """
+        self.recovered_at[peer] = time.monotonic()
+
+        if ANTI_ENTROPY_ADAPTIVE and self._wakeup is not None:
+            self._wakeup.set()
+
+    def forget(self, peer: str) -> None:
+        """
+        Drop the per-peer entries of a peer that left the cluster.
+        """
+        self.peers.pop(peer, None)
+        self.recovered_at.pop(peer, None)
+
+    def select(self, candidates: List[str], k: int) -> List[str]:
+        if len(candidates) <= k:
+            return list(candidates)
+
+        if not ANTI_ENTROPY_ADAPTIVE:
+            return random.sample(candidates, k)
+
+        now = time.monotonic()
+        max_interval = tuning.anti_entropy_max_interval
+        recovered = self.recovered_at
+
+        def score(peer: str) -> float:
+            result = self._result(peer)
+            s = 0.0
+            if now - recovered.get(peer, float("-inf")) <= 2 * max_interval:
+                s += 1000.0
+            if result.last_applied > 0:
+                s += 100.0 + min(result.last_applied, 100)
+            # staleness: a peer not visited for a full max interval wins
+            # over one that was just synced and had nothing new
+            s += min(now - result.last_sync, 10 * max_interval) / max_interval * 10.0
+            return s + random.random()
+
+        return sorted(candidates, key=score, reverse=True)[:k]
+
+    def record(self, peer: str, applied: int, nbytes: int) -> None:
+        result = self._result(peer)
+        result.last_sync = time.monotonic()
+        result.last_applied = applied
+        result.last_bytes = nbytes
+        result.rounds += 1
+        result.applied_total += applied
+        result.bytes_total += nbytes
+        self.applied_total += applied
+        self.bytes_total += nbytes
+
+        if applied > 0:
+            self.recovered_at.pop(peer, None)
+
+    def end_round(self, applied: int) -> float:
+        """
+        Close one round and return how long to wait before the next one.
+        """
+        self.rounds += 1
+
+        if not ANTI_ENTROPY_ADAPTIVE:
+            self.interval = tuning.anti_entropy_interval
+            return self.interval
+
+        if applied > 0:
+            self.interval = tuning.anti_entropy_min_interval
+        else:
+            self.interval = min(self.interval * 1.5, tuning.anti_entropy_max_interval)
+        return self.interval
+
+    async def wait(self, interval: float) -> None:
+        """
+        Sleep for `interval`, or less if a peer recovers meanwhile.
+        """
+        if self._wakeup is None:
+            await asyncio.sleep(interval)
+            return
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            return
+        # Cleared only once consumed: a recovery signalled while the last
+        # round was running ends this wait right away.
+        self._wakeup.clear()
+        self.interval = tuning.anti_entropy_min_interval
+
+    def stats(self) -> dict:
+        return {
+            "adaptive": ANTI_ENTROPY_ADAPTIVE,
+            "interval": round(self.interval, 3),
+            "rounds": self.rounds,
+            "applied_total": self.applied_total,
+            "bytes_total": self.bytes_total,
+            "peers": {
+                peer: {
+                    "last_sync_seconds_ago": None if r.last_sync == 0.0 else round(time.monotonic() - r.last_sync, 2),
+                    "last_applied": r.last_applied,
+                    "last_bytes": r.last_bytes,
+                    "rounds": r.rounds,
+                    "applied_total": r.applied_total,
+                    "bytes_total": r.bytes_total,
+                }
+                for peer, r in self.peers.items()
+            },
+        }
+
+
+anti_entropy_scheduler = AntiEntropyScheduler()
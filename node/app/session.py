@@ -0,0 +1,134 @@
+"""
+Read-your-writes across nodes through session tokens.
+
+/vote returns a token naming the one G-Counter component it wrote:
+(poll_id, option, node_id, value). A read that carries the token is
+served once the local component is at least that value. A node that is
+behind first asks the origin node for that single component, then waits
+up to SESSION_WAIT_TIMEOUT for replication to deliver it. No full poll
+sync is needed.
+
+Token: base64url (no padding) of the compact JSON array
+[poll_id, option, node_id, value]. node_id may be a per-boot component
+"node@epoch" (see durability.py); its origin is the node before the "@".
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
+
+from .config import NODE_ID, SESSION_WAIT_TIMEOUT
+from .models import CounterUpdate
+from .security import verify_internal_token
+from .state import get_component
+from .replication import apply_remote_update
+from .transport import peer_request
+from .executors import io_executor
+from .membership import registry
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_POLL_STEP = 0.05
+
+def encode_token(upd: CounterUpdate) -> str:
+    raw = json.dumps(
+        [upd.poll_id, upd.option, upd.node_id, upd.value],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_token(token: str) -> CounterUpdate:
+    """
+    Raises HTTPException(400) if the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        poll_id, option, node_id, value = json.loads(raw)
+        return CounterUpdate(poll_id=poll_id, option=option, node_id=node_id, value=value)
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        raise HTTPException(status_code=400, detail="Invalid session token")
+
+
+async def _is_satisfied(want: CounterUpdate) -> bool:
+    value = await io_executor.run(get_component, want.poll_id, want.option, want.node_id)
+    return value >= want.value
+
+
+def _origin(node_id: str) -> str:
+    return node_id.partition("@")[0]
+
+
+async def _fetch_from_origin(want: CounterUpdate) -> bool:
+    # Tokens never carry a URL: the origin is looked up among current
+    # members, so the node only contacts peers it already knows.
+    peer = registry.by_node(_origin(want.node_id))
+    if peer is None:
+        return False
+
+    try:
+        resp = await peer_request(
+            peer,
+            "GET",
+            f"/internal/component/{want.poll_id}",
+            params={"option": want.option, "node_id": want.node_id},
+        )
+        resp.raise_for_status()
+        upd = CounterUpdate.model_validate(resp.json())
+    except Exception as e:
+        logger.info("Session read: origin %s unavailable: %r", peer, e)
+        return False
+
+    await io_executor.run(apply_remote_update, upd)
+    return upd.value >= want.value
+
+
+async def wait_for_session(token: str, poll_id: str) -> Optional[bool]:
+    """
+    Make the component named by `token` visible locally if possible.
+    Returns None if the token is for another poll, else whether the read
+    is guaranteed to include the session's write.
+    """
+    want = decode_token(token)
+    if want.poll_id != poll_id:
+        return None
+
+    if await _is_satisfied(want):
+        return True
+
+    if _origin(want.node_id) != NODE_ID and await _fetch_from_origin(want):
+        return True
+
+    deadline = time.monotonic() + SESSION_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_STEP)
+        if await _is_satisfied(want):
+            return True
+
+    return False
+
+
+@router.get("/internal/component/{poll_id}", response_model=CounterUpdate)
+def internal_component(
+    poll_id: str,
+    option: str,
+    node_id: str,
+    _: None = Depends(verify_internal_token),
+):
+    """
+    Current value of one G-Counter component.
+    """
+    return CounterUpdate(
+        poll_id=poll_id,
+        option=option,
+        node_id=node_id,
+        value=get_component(poll_id, option, node_id),
+    )
@@ -1,20 +1,83 @@
-from typing import Dict, List
+import hashlib
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
 
 from .models import CounterUpdate, PollCRDTState, ClusterCRDTState
 from .locks import state_lock
+from .config import ARCHIVE_AFTER, CHECKPOINT_FILE, LAZY_EVICT_AFTER
+from .codec import Counter, encode_cluster_state
+from .checkpoint import LazyCheckpoint, encode_checkpoint_chunks
+from .archive import (
+    archive_polls,
+    archived_digest,
+    archived_digests,
+    is_archived,
+    poll_digest,
+    read_archived_poll,
+)
 
 # g_counter[poll_id][option][node_id] = int
+# Only "hot" polls live here. Polls in the last checkpoint that have not been
+# touched since are read from it lazily (see checkpoint.py); closed polls that
+# went cold are evicted to the on-disk archive (see archive.py).
 g_counter: Dict[str, Dict[str, Dict[str, int]]] = {}
 
+# Polls of the mmap'd checkpoint not materialized in g_counter.
+lazy_checkpoint = LazyCheckpoint()
+
+# Hot polls that have been closed. Archived polls are closed by definition,
+# lazy polls carry their flag in the checkpoint index.
+closed_polls: Set[str] = set()
+
+# poll_last_change[poll_id] = monotonic time of the last in-memory change
+poll_last_change: Dict[str, float] = {}
+
+# convergence_digests[poll_id] = (hash(poll_id), digest, hash(poll_id, digest))
+# of hot and lazy polls for the cluster overview; dropped whenever the
+# poll's counts or closed flag change, or when it is archived
+convergence_digests: Dict[str, Tuple[int, int, int]] = {}
+
 
 def list_polls() -> List[str]:
     with state_lock:
-        return list(g_counter.keys())
+        return list(g_counter.keys() | lazy_checkpoint.index.keys() | archived_digests().keys())
+
+
+def _is_resident(poll_id: str) -> bool:
+    """
+    True iff the poll is part of hot state (in memory or in the checkpoint).
+    """
+    return poll_id in g_counter or poll_id in lazy_checkpoint
+
+
+def _is_closed(poll_id: str) -> bool:
+    return (
+        poll_id in closed_polls
+        or lazy_checkpoint.is_closed(poll_id)
+        or is_archived(poll_id)
+    )
 
 
 def ensure_poll(poll_id: str) -> None:
     if poll_id not in g_counter:
-        g_counter[poll_id] = {}
+        if poll_id in lazy_checkpoint:
+            # first access since the checkpoint was opened: parse it now
+            if lazy_checkpoint.is_closed(poll_id):
+                closed_polls.add(poll_id)
+            g_counter[poll_id] = lazy_checkpoint.read(poll_id)
+            lazy_checkpoint.discard(poll_id)
+            poll_last_change[poll_id] = time.monotonic()
+            return
+
+        archived = read_archived_poll(poll_id)
+        if archived is None:
+            g_counter[poll_id] = {}
+        else:
+            # A late update for an archived poll: bring it back into memory.
+            # It is evicted again once it goes cold.
+            g_counter[poll_id] = {opt: dict(nodes) for opt, nodes in archived.items()}
+            closed_polls.add(poll_id)
+        poll_last_change[poll_id] = time.monotonic()
 
 
 def ensure_option(poll_id: str, option: str) -> None:
@@ -23,6 +86,83 @@ def ensure_option(poll_id: str, option: str) -> None:
         g_counter[poll_id][option] = {}
 
 
+def _poll_view(poll_id: str) -> Dict[str, Dict[str, int]]:
+    """
+    Read-only view of one poll, hot, lazy or archived. Never materializes.
+    """
+    poll_data = g_counter.get(poll_id)
+    if poll_data is not None:
+        return poll_data
+    if poll_id in lazy_checkpoint:
+        return lazy_checkpoint.read(poll_id)
+    return read_archived_poll(poll_id) or {}
+
+
+def _resident_polls(
+    skip: Callable[[str, str, bool], bool] | None = None,
+) -> Iterator[Tuple[str, Dict[str, Dict[str, int]], bool]]:
+    """
+    (poll_id, counts, closed) for every hot and lazy poll. Lazy polls are
+    parsed one at a time and not kept; those for which
+    skip(poll_id, digest, closed) is true are not parsed at all.
+    """
+    for poll_id, poll_data in g_counter.items():
+        yield poll_id, poll_data, poll_id in closed_polls
+    for poll_id, (_, _, closed) in list(lazy_checkpoint.index.items()):
+        if poll_id in g_counter:
+            continue
+        if skip is not None and skip(poll_id, lazy_checkpoint.digest(poll_id), closed):
+            continue
+        yield poll_id, lazy_checkpoint.read(poll_id), closed
+
+
+def _resident_digest(poll_id: str) -> str:
+    """
+    poll_digest() of a hot or lazy poll. Lazy polls take it from the
+    checkpoint index instead of parsing their counts.
+    """
+    poll_data = g_counter.get(poll_id)
+    if poll_data is not None:
+        return poll_digest(poll_data)
+    return lazy_checkpoint.digest(poll_id)
+
+
+def _archived_only() -> Dict[str, str]:
+    return {
+        poll_id: digest
+        for poll_id, digest in archived_digests().items()
+        if not _is_resident(poll_id)
+    }
+
+
+def is_poll_closed(poll_id: str) -> bool:
+    with state_lock:
+        return _is_closed(poll_id)
+
+
+def poll_exists(poll_id: str) -> bool:
+    """
+    True iff the poll is hot, lazy or archived.
+    """
+    with state_lock:
+        return _is_resident(poll_id) or is_archived(poll_id)
+
+
+def close_poll(poll_id: str) -> bool:
+    """
+    Move a poll to the closed state.
+    Returns True iff the poll was open before.
+    """
+    with state_lock:
+        if _is_closed(poll_id):
+            return False
+        ensure_poll(poll_id)
+        closed_polls.add(poll_id)
+        poll_last_change[poll_id] = time.monotonic()
+        convergence_digests.pop(poll_id, None)
+        return True
+
+
 def build_local_update(poll_id: str, option: str, node_id: str) -> CounterUpdate:
     ensure_option(poll_id, option)
     current = g_counter[poll_id][option].get(node_id, 0)
@@ -38,8 +178,7 @@ def build_local_update(poll_id: str, option: str, node_id: str) -> CounterUpdate
 def would_change_update(upd: CounterUpdate) -> bool:
     with state_lock:
         prev = (
-            g_counter
-            .get(upd.poll_id, {})
+            _poll_view(upd.poll_id)
             .get(upd.option, {})
             .get(upd.node_id, 0)
         )
@@ -56,99 +195,400 @@ def apply_update(upd: CounterUpdate) -> bool:
         newv = max(prev, upd.value)
         changed = newv != prev
         g_counter[upd.poll_id][upd.option][upd.node_id] = newv
+        if changed:
+            poll_last_change[upd.poll_id] = time.monotonic()
+            convergence_digests.pop(upd.poll_id, None)
         return changed
 
 
+def get_component(poll_id: str, option: str, node_id: str) -> int:
+    with state_lock:
+        return _poll_view(poll_id).get(option, {}).get(node_id, 0)
+
+
 def export_poll_state(poll_id: str) -> PollCRDTState:
     with state_lock:
-        poll_data = g_counter.get(poll_id, {})
+        poll_data = _poll_view(poll_id)
         counts = {opt: dict(nodes) for opt, nodes in poll_data.items()}
-        return PollCRDTState(counts=counts)
+        return PollCRDTState(
+            counts=counts,
+            closed=_is_closed(poll_id),
+        )
 
 
 def export_cluster_state() -> ClusterCRDTState:
+    """
+    Hot and lazy polls are exported in full, archived polls only by digest.
+    """
     with state_lock:
         polls: Dict[str, PollCRDTState] = {}
-        for poll_id, poll_data in g_counter.items():
+        for poll_id, poll_data, closed in _resident_polls():
             counts = {opt: dict(nodes) for opt, nodes in poll_data.items()}
-            polls[poll_id] = PollCRDTState(counts=counts)
-        return ClusterCRDTState(polls=polls)
+            polls[poll_id] = PollCRDTState(counts=counts, closed=closed)
+
+        return ClusterCRDTState(polls=polls, archived=_archived_only())
 
 
 def query_poll_counts(poll_id: str) -> Dict[str, int]:
     with state_lock:
-        poll_data = g_counter.get(poll_id, {})
+        poll_data = _poll_view(poll_id)
         return {opt: sum(nodes.values()) for opt, nodes in poll_data.items()}
 
 
-def replace_cluster_state(other: ClusterCRDTState) -> None:
+def query_polls(poll_ids: Iterable[str], per_node: bool = False) -> Dict[str, dict]:
+    """
+    Counts and closed flag of many polls under a single state_lock hold, so
+    all of them come from the same state view. With per_node, each poll also
+    carries nodes[option][node_id].
+    """
+    result: Dict[str, dict] = {}
+    with state_lock:
+        for poll_id in poll_ids:
+            poll_data = _poll_view(poll_id)
+            entry = {
+                "counts": {opt: sum(nodes.values()) for opt, nodes in poll_data.items()},
+                "closed": _is_closed(poll_id),
+            }
+            if per_node:
+                entry["nodes"] = {opt: dict(nodes) for opt, nodes in poll_data.items()}
+            result[poll_id] = entry
+    return result
+
+
+def replace_cluster_state(
+    counter: Counter,
+    closed: List[str],
+    lazy: LazyCheckpoint | None = None,
+) -> None:
     """
     Replace in-memory state with a recovered snapshot.
-    Used only during startup recovery.
+    Used only during startup recovery; takes ownership of `counter` and `lazy`.
     """
-    global g_counter
+    global g_counter, lazy_checkpoint
     with state_lock:
-        new_state: Dict[str, Dict[str, Dict[str, int]]] = {}
-        for poll_id, poll_state in other.polls.items():
-            new_state[poll_id] = {}
-            for opt, nodes in poll_state.counts.items():
-                new_state[poll_id][opt] = dict(nodes)
-        g_counter = new_state
+        g_counter = counter
+        lazy_checkpoint.close()
+        lazy_checkpoint = lazy if lazy is not None else LazyCheckpoint()
 
+        now = time.monotonic()
+        closed_polls.clear()
+        closed_polls.update(closed)
+        poll_last_change.clear()
+        poll_last_change.update({pid: now for pid in counter})
+        convergence_digests.clear()
 
-def extract_new_updates_from_poll_state(
-    poll_id: str,
-    other: PollCRDTState,
-) -> List[CounterUpdate]:
+
+def checkpoint_chunks() -> Iterator[bytes]:
     """
-    Compare a remote poll state with local state and return only the updates
-    that would increase at least one local component.
+    Stream hot and lazy state as a v3 checkpoint. Lazy polls are copied from
+    the current checkpoint as raw bytes. Must be consumed under state_lock,
+    then followed by remap_checkpoint().
     """
-    updates: List[CounterUpdate] = []
+    return encode_checkpoint_chunks(g_counter, closed_polls, lazy_checkpoint)
+
 
+def remap_checkpoint() -> int:
+    """
+    Switch lazy reads to the checkpoint just written and drop from memory
+    the open polls that have not changed for LAZY_EVICT_AFTER seconds: they
+    are in that checkpoint and come back on their next access.
+    Returns the number of polls moved out of memory.
+    """
+    global lazy_checkpoint
     with state_lock:
-        ensure_poll(poll_id)
-        for opt, nodes in other.counts.items():
-            ensure_option(poll_id, opt)
-            for node_id, value in nodes.items():
-                prev = g_counter[poll_id][opt].get(node_id, 0)
-                if value > prev:
-                    updates.append(
-                        CounterUpdate(
-                            poll_id=poll_id,
-                            option=opt,
-                            node_id=node_id,
-                            value=value,
-                        )
-                    )
+        fresh = LazyCheckpoint.open(CHECKPOINT_FILE)
+        lazy_checkpoint.close()
+        lazy_checkpoint = fresh
+
+        now = time.monotonic()
+        idle: List[str] = []
+        if LAZY_EVICT_AFTER > 0:
+            idle = [
+                poll_id for poll_id in g_counter
+                if poll_id not in closed_polls
+                and now - poll_last_change.get(poll_id, now) >= LAZY_EVICT_AFTER
+            ]
+        for poll_id in idle:
+            del g_counter[poll_id]
+            poll_last_change.pop(poll_id, None)
 
-    return updates
+        for poll_id in g_counter:
+            fresh.discard(poll_id)
 
+        return len(idle)
 
-def extract_new_updates_from_cluster_state(
-    other: ClusterCRDTState,
-) -> List[CounterUpdate]:
+
+def cluster_state_bytes() -> bytes:
     """
-    Compare a full remote cluster state with local state and return only the
-    component updates that are actually newer than local state.
+    Same content as export_cluster_state(), encoded straight to JSON bytes.
     """
-    updates: List[CounterUpdate] = []
+    with state_lock:
+        return encode_cluster_state(g_counter, closed_polls, _archived_only(), lazy_checkpoint)
 
+
+def evict_cold_polls() -> int:
+    """
+    Move closed polls that have not changed for ARCHIVE_AFTER seconds from
+    memory to the on-disk archive. Closed lazy polls have not been touched
+    since the last checkpoint and are archived directly.
+    Returns the number of evicted polls. Must run right before a checkpoint
+    so that the checkpoint stops carrying them (see checkpoint_loop).
+    """
     with state_lock:
-        for poll_id, poll_state in other.polls.items():
-            ensure_poll(poll_id)
-            for opt, nodes in poll_state.counts.items():
-                ensure_option(poll_id, opt)
+        now = time.monotonic()
+        cold = {
+            poll_id: g_counter[poll_id]
+            for poll_id in closed_polls
+            if poll_id in g_counter
+            and now - poll_last_change.get(poll_id, now) >= ARCHIVE_AFTER
+        }
+        for poll_id, (_, _, closed) in lazy_checkpoint.index.items():
+            if closed and poll_id not in g_counter:
+                cold[poll_id] = lazy_checkpoint.read(poll_id)
+        if not cold:
+            return 0
+
+        archive_polls(cold)
+
+        for poll_id in cold:
+            g_counter.pop(poll_id, None)
+            lazy_checkpoint.discard(poll_id)
+            closed_polls.discard(poll_id)
+            poll_last_change.pop(poll_id, None)
+            convergence_digests.pop(poll_id, None)
+
+        return len(cold)
+
+
+def _digest64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _convergence_digest(poll_id: str) -> Tuple[int, int, int]:
+    """
+    Digest of one poll's counts and closed flag, with the hashes used for
+    bucketing (see convergence_summary). Archived polls reuse their archive
+    digest, so they are never read back from disk, and are not cached:
+    archiving moves them out of memory. Caller holds state_lock.
+    """
+    cached = convergence_digests.get(poll_id)
+    if cached is not None:
+        return cached
+
+    resident = _is_resident(poll_id)
+    if resident:
+        counts = _resident_digest(poll_id)
+    else:
+        counts = archived_digest(poll_id) or ""
+    digest = _digest64(f"{counts}:{int(_is_closed(poll_id))}")
+
+    entry = (_digest64(poll_id), digest, _digest64(f"{poll_id}:{digest}"))
+    if resident:
+        convergence_digests[poll_id] = entry
+    return entry
+
+
+def convergence_summary(buckets: int, chunk: int = 512) -> dict:
+    """
+    Digest of the whole state, split in `buckets` by poll id: each bucket is
+    the XOR of hash(poll_id, poll digest) over its polls. Two nodes with the
+    same bucket digest hold the same polls in that bucket. state_lock is
+    taken per chunk of polls, so large states do not block votes.
+    """
+    values = [0] * buckets
+    poll_ids = list_polls()
+    for start in range(0, len(poll_ids), chunk):
+        with state_lock:
+            for poll_id in poll_ids[start:start + chunk]:
+                id_hash, _, mix = _convergence_digest(poll_id)
+                values[id_hash % buckets] ^= mix
+
+    state = hashlib.blake2b(digest_size=8)
+    for value in values:
+        state.update(value.to_bytes(8, "big"))
+    return {
+        "state_digest": state.hexdigest(),
+        "polls": len(poll_ids),
+        "buckets": [format(value, "016x") for value in values],
+    }
+
+
+def convergence_digests_in(selected: Iterable[int], buckets: int, chunk: int = 512) -> Dict[str, str]:
+    """
+    Per-poll digests of the polls that fall in the `selected` buckets.
+    """
+    selected = set(selected)
+    result: Dict[str, str] = {}
+    poll_ids = list_polls()
+    for start in range(0, len(poll_ids), chunk):
+        with state_lock:
+            for poll_id in poll_ids[start:start + chunk]:
+                id_hash, digest, _ = _convergence_digest(poll_id)
+                if id_hash % buckets in selected:
+                    result[poll_id] = format(digest, "016x")
+    return result
+
+
+# One component of a remote state: (poll_id, option, node_id, value)
+Component = Tuple[str, str, str, int]
+
+# Wire layout of a remote cluster state, as decoded by codec.py:
+# {"polls": {poll_id: {"counts": {...}, "closed": bool}}, "archived": {poll_id: digest}}
+RemoteState = Dict[str, Dict]
+
+
+class MergePlan:
+    """
+    Result of one pass over a remote state: the components that are newer
+    than local state (for the WAL) and, for each one, the local dict to
+    write it into, plus the polls to close.
+    """
+
+    __slots__ = ("components", "targets", "closes")
+
+    def __init__(self) -> None:
+        self.components: List[Component] = []
+        self.targets: List[Tuple[Dict[str, int], str, int]] = []
+        self.closes: List[str] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.components or self.closes)
+
+
+def plan_merge(polls: Dict[str, Dict], archived: Dict[str, str] | None = None) -> MergePlan:
+    """
+    Compare a remote state with local state in a single traversal. Only
+    polls with something newer are materialized; nothing is applied yet.
+    Caller holds state_lock until apply_merge(), with the WAL batch in between.
+    """
+    plan = MergePlan()
+    components = plan.components
+    targets = plan.targets
+    now = time.monotonic()
+
+    with state_lock:
+        for poll_id, remote in polls.items():
+            if remote.get("closed") and not _is_closed(poll_id):
+                plan.closes.append(poll_id)
+
+            counts = remote["counts"]
+            if not counts:
+                continue
+
+            local = g_counter.get(poll_id)
+            if local is None:
+                # same digest as the lazy copy: nothing newer, do not parse it
+                if poll_id in lazy_checkpoint and lazy_checkpoint.digest(poll_id) == poll_digest(counts):
+                    continue
+                local = _poll_view(poll_id)
+
+            newer: List[Tuple[str, str, int]] = []
+            for opt, nodes in counts.items():
+                local_nodes = local.get(opt)
+                if local_nodes is None:
+                    newer.extend((opt, node_id, value) for node_id, value in nodes.items() if value > 0)
+                    continue
                 for node_id, value in nodes.items():
-                    prev = g_counter[poll_id][opt].get(node_id, 0)
-                    if value > prev:
-                        updates.append(
-                            CounterUpdate(
-                                poll_id=poll_id,
-                                option=opt,
-                                node_id=node_id,
-                                value=value,
-                            )
-                        )
-
-    return updates
\ No newline at end of file
+                    if value > local_nodes.get(node_id, 0):
+                        newer.append((opt, node_id, value))
+
+            if not newer:
+                continue
+
+            ensure_poll(poll_id)
+            poll_data = g_counter[poll_id]
+            for opt, node_id, value in newer:
+                nodes = poll_data.get(opt)
+                if nodes is None:
+                    nodes = poll_data[opt] = {}
+                components.append((poll_id, opt, node_id, value))
+                targets.append((nodes, node_id, value))
+            poll_last_change[poll_id] = now
+            convergence_digests.pop(poll_id, None)
+
+        for poll_id in archived or ():
+            # a poll archived remotely is closed there
+            if not _is_closed(poll_id) and poll_id not in plan.closes:
+                plan.closes.append(poll_id)
+
+    return plan
+
+
+def apply_merge(plan: MergePlan) -> None:
+    """
+    Apply a plan once its WAL batch is durable. Values only grow: each
+    target was compared under the same state_lock hold.
+    """
+    with state_lock:
+        for nodes, node_id, value in plan.targets:
+            nodes[node_id] = value
+        for poll_id in plan.closes:
+            close_poll(poll_id)
+
+
+def archived_polls_to_fetch(other_archived: Dict[str, str]) -> List[str]:
+    """
+    Return the remote archived polls whose digest differs from the local
+    copy (hot or archived). Only these need a full per-poll pull.
+    """
+    with state_lock:
+        result: List[str] = []
+        local_archived = archived_digests()
+        for poll_id, digest in other_archived.items():
+            if _is_resident(poll_id):
+                local_digest = _resident_digest(poll_id)
+            else:
+                local_digest = local_archived.get(poll_id)
+            if local_digest != digest:
+                result.append(poll_id)
+        return result
+
+
+def diff_cluster_state(other: RemoteState) -> RemoteState:
+    """
+    Return the part of local state that `other` lacks: components that are
+    larger locally, closed flags it has not seen, and archived polls whose
+    digest differs from its copy. Same wire layout as `other`.
+    Lazy polls whose digest matches the remote copy are not parsed.
+    """
+    other_polls = other["polls"]
+    other_archived = other["archived"]
+
+    def remote_has(poll_id: str, digest: str, closed: bool) -> bool:
+        remote = other_polls.get(poll_id)
+        if remote is None:
+            return other_archived.get(poll_id) == digest
+        return (remote["closed"] or not closed) and poll_digest(remote["counts"]) == digest
+
+    with state_lock:
+        polls: Dict[str, Dict] = {}
+
+        for poll_id, poll_data, closed in _resident_polls(remote_has):
+            remote = other_polls.get(poll_id)
+
+            if remote is None and other_archived.get(poll_id) == poll_digest(poll_data):
+                continue
+
+            remote_counts = remote["counts"] if remote is not None else {}
+            counts: Dict[str, Dict[str, int]] = {}
+            for opt, nodes in poll_data.items():
+                remote_nodes = remote_counts.get(opt, {})
+                newer = {
+                    node_id: value
+                    for node_id, value in nodes.items()
+                    if value > remote_nodes.get(node_id, 0)
+                }
+                if newer:
+                    counts[opt] = newer
+
+            remote_closed = (remote is not None and remote["closed"]) or poll_id in other_archived
+            if counts or (closed and not remote_closed):
+                polls[poll_id] = {"counts": counts, "closed": closed}
+
+        archived = {
+            poll_id: digest
+            for poll_id, digest in _archived_only().items()
+            if other_archived.get(poll_id) != digest
+        }
+
+        return {"polls": polls, "archived": archived}
@@ -2,35 +2,78 @@ import json
 import logging
 import os
 import threading
-from typing import List
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from pydantic import ValidationError
 
-from .config import DATA_DIR, CHECKPOINT_FILE, WAL_FILE
-from .models import CounterUpdate, ClusterCRDTState
+from .config import (
+    DATA_DIR,
+    CHECKPOINT_FILE,
+    WAL_FILE,
+    WAL_SEALED_FILE,
+    WAL_COMPACTED_FILE,
+    BOOT_EPOCH_FILE,
+)
+from .models import CounterUpdate, PollClose
+from .codec import Counter, decode_checkpoint
+from .checkpoint import LazyCheckpoint, empty_checkpoint, is_v3
 from .locks import storage_lock
 
 logger = logging.getLogger(__name__)
 
+WalRecord = Union[CounterUpdate, PollClose]
+
+# Append sequence numbers: every WAL append gets the next one. Records up to
+# _wal_synced are known to be on disk (fsynced, or covered by a checkpoint).
+_wal_seq = 0
+_wal_synced = 0
 
 
 def ensure_storage() -> None:
     os.makedirs(DATA_DIR, exist_ok=True)
 
     if not os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
-            json.dump({"polls": {}}, f)
+        with open(CHECKPOINT_FILE, "wb") as f:
+            f.write(empty_checkpoint())
 
     if not os.path.exists(WAL_FILE):
         open(WAL_FILE, "a", encoding="utf-8").close()
 
 
-def append_wal_update(upd: CounterUpdate) -> None:
+def next_boot_epoch() -> int:
+    """
+    Durably allocate this process's boot epoch: larger than the previous
+    one, and at least the current Unix time so that a node whose data
+    directory was wiped does not reuse an epoch of an earlier life.
+    """
+    ensure_storage()
+    previous = 0
+    try:
+        with open(BOOT_EPOCH_FILE, "r", encoding="utf-8") as f:
+            previous = int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    epoch = max(previous + 1, int(time.time()))
+
+    tmp_file = BOOT_EPOCH_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(str(epoch))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, BOOT_EPOCH_FILE)
+    return epoch
+
+
+def append_wal_update(upd: CounterUpdate, sync: bool = True) -> int:
     """
     Write-ahead log append.
     One JSON record per line.
+    With sync=False the record is written but not fsynced; it becomes
+    durable with the next sync_wal() (see groupcommit.py).
+    Returns the append sequence number of the record.
     """
-    ensure_storage()
     record = {
         "kind": "counter_update",
         "poll_id": upd.poll_id,
@@ -39,93 +82,232 @@ def append_wal_update(upd: CounterUpdate) -> None:
         "value": upd.value,
     }
 
+    return _append_wal_record(record, sync)
+
+
+def append_wal_close(poll_id: str) -> None:
+    _append_wal_record({"kind": "poll_close", "poll_id": poll_id})
+
+
+def _format_wal_batch(
+    components: Iterable[Tuple[str, str, str, int]],
+    closes: Iterable[str],
+) -> List[str]:
+    dumps = json.dumps
+    lines = [
+        '{"kind":"counter_update","poll_id":%s,"option":%s,"node_id":%s,"value":%d}\n'
+        % (dumps(poll_id, ensure_ascii=False), dumps(option, ensure_ascii=False),
+           dumps(node_id, ensure_ascii=False), value)
+        for poll_id, option, node_id, value in components
+    ]
+    lines.extend(
+        '{"kind":"poll_close","poll_id":%s}\n' % dumps(poll_id, ensure_ascii=False)
+        for poll_id in closes
+    )
+    return lines
+
+
+def append_wal_batch(
+    components: Iterable[Tuple[str, str, str, int]],
+    closes: Iterable[str] = (),
+) -> None:
+    """
+    Append many records with a single write and a single fsync.
+    components are (poll_id, option, node_id, value) tuples.
+    """
+    lines = _format_wal_batch(components, closes)
+    if not lines:
+        return
+
+    global _wal_seq, _wal_synced
+
+    ensure_storage()
+    with storage_lock:
+        with open(WAL_FILE, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        _wal_seq += 1
+        _wal_synced = _wal_seq
+
+
+def _append_wal_record(record: dict, sync: bool = True) -> int:
+    global _wal_seq, _wal_synced
+
+    ensure_storage()
     line = json.dumps(record, ensure_ascii=False)
 
     with storage_lock:
         with open(WAL_FILE, "a", encoding="utf-8") as f:
             f.write(line + "\n")
             f.flush()
-            os.fsync(f.fileno())
+            if sync:
+                os.fsync(f.fileno())
+        _wal_seq += 1
+        if sync:
+            # fsync covers everything written to the file before, too
+            _wal_synced = _wal_seq
+        return _wal_seq
 
 
-def load_checkpoint() -> ClusterCRDTState:
+def sync_wal() -> int:
+    """
+    fsync the active WAL without holding storage_lock during the fsync, so
+    appends continue meanwhile. Returns the sequence number up to which
+    records are now durable.
+    """
+    global _wal_synced
+
     ensure_storage()
     with storage_lock:
-        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        target = _wal_seq
+        if target <= _wal_synced:
+            return _wal_synced
+        f = open(WAL_FILE, "a", encoding="utf-8")
+
+    # A rotation by compaction may rename the file meanwhile; the open
+    # descriptor still refers to the file that holds our records.
+    try:
+        os.fsync(f.fileno())
+    finally:
+        f.close()
 
-    return ClusterCRDTState(**data)
+    with storage_lock:
+        _wal_synced = max(_wal_synced, target)
+        return _wal_synced
 
 
-def write_checkpoint(state: ClusterCRDTState) -> None:
+def load_checkpoint() -> Tuple[Counter, List[str], LazyCheckpoint]:
+    """
+    Load the checkpoint as (g_counter, closed poll ids, lazy checkpoint).
+    A v3 checkpoint is only mapped: g_counter starts empty and polls are
+    parsed on first access. Older JSON checkpoints are loaded eagerly.
+    Local data is trusted: only structural checks, no model validation.
+    """
+    ensure_storage()
+    with storage_lock:
+        if is_v3(CHECKPOINT_FILE):
+            return {}, [], LazyCheckpoint.open(CHECKPOINT_FILE)
+
+        with open(CHECKPOINT_FILE, "rb") as f:
+            raw = f.read()
+
+    counter, closed = decode_checkpoint(raw)
+    return counter, closed, LazyCheckpoint()
+
+
+def is_checkpoint_empty() -> bool:
+    ensure_storage()
+    with storage_lock:
+        if is_v3(CHECKPOINT_FILE):
+            lazy = LazyCheckpoint.open(CHECKPOINT_FILE)
+            empty = len(lazy) == 0
+            lazy.close()
+            return empty
+
+        with open(CHECKPOINT_FILE, "rb") as f:
+            raw = f.read()
+
+    counter, _ = decode_checkpoint(raw)
+    return not counter
+
+
+def write_checkpoint(chunks: Iterable[bytes]) -> None:
     """
     Atomic checkpoint write:
     write tmp -> fsync -> replace
     """
     ensure_storage()
     tmp_file = CHECKPOINT_FILE + ".tmp"
-    payload = state.model_dump()
 
     with storage_lock:
-        with open(tmp_file, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        with open(tmp_file, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
             f.flush()
             os.fsync(f.fileno())
 
         os.replace(tmp_file, CHECKPOINT_FILE)
 
 
-def load_wal_updates() -> List[CounterUpdate]:
+def _wal_segments() -> List[str]:
+    """
+    WAL files, oldest first: the folded output of earlier compactions, a
+    segment sealed for compaction, then the active WAL. Replay is max-merge
+    plus close flags, so a record present in two segments is harmless.
+    """
+    return [p for p in (WAL_COMPACTED_FILE, WAL_SEALED_FILE, WAL_FILE) if os.path.exists(p)]
+
+
+def load_wal_records() -> List[WalRecord]:
     ensure_storage()
-    updates: List[CounterUpdate] = []
+    updates: List[WalRecord] = []
     skipped = 0
 
     with storage_lock:
-        with open(WAL_FILE, "r", encoding="utf-8") as f:
-            for line_no, raw_line in enumerate(f, start=1):
-                line = raw_line.strip()
-                if not line:
-                    continue
+        for path in _wal_segments():
+            name = os.path.basename(path)
+            with open(path, "r", encoding="utf-8") as f:
+                for line_no, raw_line in enumerate(f, start=1):
+                    line = raw_line.strip()
+                    if not line:
+                        continue
 
-                try:
-                    rec = json.loads(line)
-                except json.JSONDecodeError as e:
-                    skipped += 1
-                    logger.warning(
-                        "Skipping corrupted WAL line %d: invalid JSON (%s)",
-                        line_no,
-                        e,
-                    )
-                    continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        skipped += 1
+                        logger.warning(
+                            "Skipping corrupted WAL line %s:%d: invalid JSON (%s)",
+                            name,
+                            line_no,
+                            e,
+                        )
+                        continue
 
-                if rec.get("kind") != "counter_update":
-                    skipped += 1
-                    logger.warning(
-                        "Skipping WAL line %d: unsupported kind=%r",
-                        line_no,
-                        rec.get("kind"),
-                    )
-                    continue
+                    if rec.get("kind") == "poll_close":
+                        try:
+                            updates.append(PollClose.model_validate({"poll_id": rec.get("poll_id")}))
+                        except ValidationError as e:
+                            skipped += 1
+                            logger.warning(
+                                "Skipping invalid WAL line %s:%d: %s",
+                                name,
+                                line_no,
+                                e.errors(),
+                            )
+                        continue
 
-                try:
-                    upd = CounterUpdate.model_validate(
-                        {
-                            "poll_id": rec.get("poll_id"),
-                            "option": rec.get("option"),
-                            "node_id": rec.get("node_id"),
-                            "value": rec.get("value"),
-                        }
-                    )
-                except ValidationError as e:
-                    skipped += 1
-                    logger.warning(
-                        "Skipping invalid WAL line %d: %s",
-                        line_no,
-                        e.errors(),
-                    )
-                    continue
+                    if rec.get("kind") != "counter_update":
+                        skipped += 1
+                        logger.warning(
+                            "Skipping WAL line %s:%d: unsupported kind=%r",
+                            name,
+                            line_no,
+                            rec.get("kind"),
+                        )
+                        continue
+
+                    try:
+                        upd = CounterUpdate.model_validate(
+                            {
+                                "poll_id": rec.get("poll_id"),
+                                "option": rec.get("option"),
+                                "node_id": rec.get("node_id"),
+                                "value": rec.get("value"),
+                            }
+                        )
+                    except ValidationError as e:
+                        skipped += 1
+                        logger.warning(
+                            "Skipping invalid WAL line %s:%d: %s",
+                            name,
+                            line_no,
+                            e.errors(),
+                        )
+                        continue
 
-                updates.append(upd)
+                    updates.append(upd)
 
     logger.info(
         "WAL recovery completed: recovered=%d skipped=%d",
@@ -135,10 +317,184 @@ def load_wal_updates() -> List[CounterUpdate]:
     return updates
 
 
+def read_wal_bytes() -> bytes:
+    """
+    All WAL segments concatenated, oldest first (a valid single WAL).
+    """
+    with storage_lock:
+        parts = []
+        for path in _wal_segments():
+            with open(path, "rb") as f:
+                parts.append(f.read())
+    return b"".join(parts)
+
+
+def wal_size_bytes() -> int:
+    total = 0
+    for path in (WAL_COMPACTED_FILE, WAL_SEALED_FILE, WAL_FILE):
+        try:
+            total += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return total
+
+
 def truncate_wal() -> None:
+    """
+    Drop every WAL segment: called right after a checkpoint has persisted
+    the full state. A compaction in flight notices the new generation and
+    discards its output.
+    """
+    global _wal_generation, _wal_synced
+
     ensure_storage()
     with storage_lock:
         with open(WAL_FILE, "w", encoding="utf-8") as f:
             f.truncate(0)
             f.flush()
-            os.fsync(f.fileno())
\ No newline at end of file
+            os.fsync(f.fileno())
+        # everything appended so far is in the checkpoint
+        _wal_synced = _wal_seq
+
+        for path in (WAL_SEALED_FILE, WAL_COMPACTED_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        _wal_generation += 1
+
+
+# --- WAL compaction ---------------------------------------------------------
+#
+# Every record carries the absolute component value, so only the highest
+# value per (poll_id, option, node_id) matters. Compaction:
+#   1. under storage_lock: rename the active WAL to WAL_SEALED_FILE and start
+#      a new empty one (appends continue there)
+#   2. without locks: fold WAL_COMPACTED_FILE + WAL_SEALED_FILE to the max
+#      per component plus the set of closed polls, into a temporary file
+#   3. under storage_lock: replace WAL_COMPACTED_FILE and drop the sealed
+#      segment, unless a checkpoint truncated the WAL in the meantime
+# A crash at any point leaves every record in at least one segment.
+
+_wal_generation = 0
+_compact_lock = threading.Lock()
+_compaction_stats = {
+    "runs": 0,
+    "records_in": 0,
+    "records_out": 0,
+    "last_ms": 0.0,
+    "discarded": 0,
+}
+
+
+def _iter_wal_file(path: str) -> Iterator[dict]:
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(rec, dict):
+                yield rec
+
+
+def _fold_wal(paths: Iterable[str]) -> Tuple[Dict[Tuple[str, str, str], int], Set[str], int]:
+    """
+    Max value per component and closed poll ids over the given segments.
+    Records that replay would skip are dropped.
+    """
+    components: Dict[Tuple[str, str, str], int] = {}
+    closes: Set[str] = set()
+    records = 0
+
+    for path in paths:
+        for rec in _iter_wal_file(path):
+            records += 1
+            kind = rec.get("kind")
+            poll_id = rec.get("poll_id")
+            if not isinstance(poll_id, str):
+                continue
+
+            if kind == "poll_close":
+                closes.add(poll_id)
+            elif kind == "counter_update":
+                option, node_id, value = rec.get("option"), rec.get("node_id"), rec.get("value")
+                if (
+                    not isinstance(option, str)
+                    or not isinstance(node_id, str)
+                    or type(value) is not int
+                    or value < 0
+                ):
+                    continue
+                key = (poll_id, option, node_id)
+                if value > components.get(key, -1):
+                    components[key] = value
+
+    return components, closes, records
+
+
+def compact_wal(min_bytes: int) -> Optional[Tuple[int, int]]:
+    """
+    Seal the active WAL if it holds at least `min_bytes` and fold it into
+    the compacted segment. Appends only wait for the rename in step 1 and
+    the replace in step 3.
+    Returns (records read, records written), or None if nothing was done.
+    """
+    if not _compact_lock.acquire(blocking=False):
+        return None
+
+    try:
+        ensure_storage()
+        t0 = time.perf_counter()
+
+        with storage_lock:
+            # A sealed segment left by an interrupted run is folded first.
+            if not os.path.exists(WAL_SEALED_FILE):
+                if os.path.getsize(WAL_FILE) < max(1, min_bytes):
+                    return None
+                # records written without fsync (group commit) must be on
+                # disk before they move to the segment being folded
+                sync_wal()
+                os.replace(WAL_FILE, WAL_SEALED_FILE)
+                open(WAL_FILE, "a", encoding="utf-8").close()
+            generation = _wal_generation
+
+        components, closes, records_in = _fold_wal((WAL_COMPACTED_FILE, WAL_SEALED_FILE))
+
+        tmp_file = WAL_COMPACTED_FILE + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            lines = _format_wal_batch(
+                ((p, o, n, v) for (p, o, n), v in components.items()),
+                sorted(closes),
+            )
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        records_out = len(lines)
+        del lines
+
+        with storage_lock:
+            if generation != _wal_generation:
+                os.remove(tmp_file)
+                _compaction_stats["discarded"] += 1
+                return None
+            os.replace(tmp_file, WAL_COMPACTED_FILE)
+            os.remove(WAL_SEALED_FILE)
+
+        _compaction_stats["runs"] += 1
+        _compaction_stats["records_in"] += records_in
+        _compaction_stats["records_out"] += records_out
+        _compaction_stats["last_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        return records_in, records_out
+    finally:
+        _compact_lock.release()
+
+
+def wal_stats() -> dict:
+    return {
+        "size_bytes": wal_size_bytes(),
+        "segments": [os.path.basename(p) for p in _wal_segments()],
+        "compaction": dict(_compaction_stats),
+    }
@@ -0,0 +1,167 @@
+# shared internal HTTP transport: per-peer pools, in-flight caps, stats
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict
+
+import httpx
+
+from .config import (
+    PEER_MAX_INFLIGHT,
+    PEER_MAX_CONNECTIONS,
+    PEER_KEEPALIVE_EXPIRY,
+)
+from .utils import internal_auth_headers
+from .membership import registry, tuning
+
+logger = logging.getLogger(__name__)
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(tuning.request_timeout, connect=tuning.connect_timeout)
+
+
+class PeerChannel:
+    """
+    Keepalive connection pool + in-flight cap for one peer.
+
+    Bounded requests wait on the semaphore first; that wait is reported as
+    pool wait. The pool holds a couple of connections more than the cap, so
+    unbounded traffic (heartbeats) always finds a free connection and is
+    never queued behind a replication burst.
+    """
+
+    def __init__(self, peer: str):
+        self.peer = peer
+        self.client = httpx.AsyncClient(
+            base_url=peer,
+            timeout=_timeout(),
+            limits=httpx.Limits(
+                max_connections=PEER_MAX_CONNECTIONS,
+                max_keepalive_connections=PEER_MAX_CONNECTIONS,
+                keepalive_expiry=PEER_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(PEER_MAX_INFLIGHT)
+        self.inflight = 0
+        self.requests = 0
+        self.bounded_requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.pool_wait_total = 0.0
+        self.pool_wait_max = 0.0
+        self._seen_streams: "weakref.WeakSet" = weakref.WeakSet()
+
+    def _track_connection(self, resp: httpx.Response) -> None:
+        stream = resp.extensions.get("network_stream")
+        if stream is None:
+            return
+        try:
+            if stream not in self._seen_streams:
+                self._seen_streams.add(stream)
+                self.new_connections += 1
+        except TypeError:
+            pass
+
+    async def request(self, method: str, path: str, bounded: bool = True, **kwargs) -> httpx.Response:
+        headers = kwargs.pop("headers", None) or internal_auth_headers()
+        # timeouts follow the cluster size, which may change after creation
+        kwargs.setdefault("timeout", _timeout())
+
+        if bounded:
+            started = time.monotonic()
+            await self.semaphore.acquire()
+            waited = time.monotonic() - started
+            self.bounded_requests += 1
+            self.pool_wait_total += waited
+            self.pool_wait_max = max(self.pool_wait_max, waited)
+
+        self.inflight += 1
+        self.requests += 1
+        try:
+            resp = await self.client.request(method, path, headers=headers, **kwargs)
+            self._track_connection(resp)
+            return resp
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.inflight -= 1
+            if bounded:
+                self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "bounded_requests": self.bounded_requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            # only bounded requests wait for the semaphore
+            "pool_wait_avg_ms": (
+                round(1000 * self.pool_wait_total / self.bounded_requests, 3) if self.bounded_requests else 0.0
+            ),
+            "pool_wait_max_ms": round(1000 * self.pool_wait_max, 3),
+        }
+
+
+_channels: Dict[str, PeerChannel] = {}
+
+
+def get_channel(peer: str) -> PeerChannel:
+    channel = _channels.get(peer)
+    if channel is None:
+        channel = PeerChannel(peer)
+        _channels[peer] = channel
+    return channel
+
+
+async def peer_request(peer: str, method: str, path: str, **kwargs) -> httpx.Response:
+    return await get_channel(peer).request(method, path, **kwargs)
+
+
+async def warm_up() -> None:
+    """
+    Open one connection per peer at startup so the first replication burst
+    does not pay TCP setup. Unreachable peers are simply skipped.
+    """
+
+    async def _warm(peer: str) -> None:
+        try:
+            await peer_request(peer, "GET", "/status", bounded=False)
+        except Exception as e:
+            logger.info("Warm-up of %s failed: %r", peer, e)
+
+    await asyncio.gather(*[_warm(peer) for peer in registry.peers], return_exceptions=True)
+
+
+def _drop_channels(added: list[str], removed: list[str]) -> None:
+    """
+    Close the pools of peers that left the cluster.
+    """
+    for peer in removed:
+        channel = _channels.pop(peer, None)
+        if channel is not None:
+            asyncio.get_running_loop().create_task(channel.client.aclose())
+
+
+registry.subscribe(_drop_channels)
+
+
+async def close_transport() -> None:
+    channels = list(_channels.values())
+    _channels.clear()
+    for channel in channels:
+        await channel.client.aclose()
+
+
+def transport_stats() -> dict:
+    return {
+        "limits": {
+            "peer_max_inflight": PEER_MAX_INFLIGHT,
+            "peer_max_connections": PEER_MAX_CONNECTIONS,
+            "peer_keepalive_expiry": PEER_KEEPALIVE_EXPIRY,
+        },
+        "peers": {peer: channel.stats() for peer, channel in _channels.items()},
+    }
@@ -20,8 +20,25 @@ export async function fetchPolls() {
   return fetchJson(`${baseUrl()}/polls`)
 }
 
-export async function fetchPoll(pollId) {
-  return fetchJson(`${baseUrl()}/poll/${encodeURIComponent(pollId)}`)
+// the node accepts up to POLL_BATCH_MAX (default 1000) ids per request
+const POLL_BATCH_SIZE = 500
+
+export async function fetchPollCounts(pollIds) {
+  const polls = {}
+  for (let i = 0; i < pollIds.length; i += POLL_BATCH_SIZE) {
+    const res = await fetchJson(`${baseUrl()}/polls/counts`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ poll_ids: pollIds.slice(i, i + POLL_BATCH_SIZE) }),
+    })
+    Object.assign(polls, res.polls)
+  }
+  return polls
+}
+
+export async function fetchPoll(pollId, sessionToken) {
+  const opts = sessionToken ? { headers: { "X-Session-Token": sessionToken } } : undefined
+  return fetchJson(`${baseUrl()}/poll/${encodeURIComponent(pollId)}`, opts)
 }
 
 export async function fetchStatus() {
@@ -14,7 +14,7 @@ async function refreshAll() {
     await refreshStatus()
 
     if (!isEditingPollId) {
-      await refreshPoll()
+      await refreshPoll({ useBatch: true })
     }
 
     els.lastUpdate().textContent = `Last update: ${new Date().toLocaleTimeString()}`
@@ -38,7 +38,10 @@ async function sendVote() {
   btn.disabled = true
 
   try {
-    await sendVoteRequest(pollId, option)
+    const res = await sendVoteRequest(pollId, option)
+    if (res.session_token) {
+      uiState.sessionTokens[pollId] = res.session_token
+    }
     await refreshAll()
   } catch (e) {
     setError(String(e.message || e))
@@ -50,7 +53,7 @@ async function sendVote() {
 function bindEvents() {
   els.voteBtn().addEventListener("click", sendVote)
 
-  els.pollId().addEventListener("blur", refreshPoll)
+  els.pollId().addEventListener("blur", () => refreshPoll())
 
   els.pollId().addEventListener("input", (e) => {
     renderSelectedPollInList(e.target.value.trim())
@@ -1,5 +1,6 @@
-import { fetchPolls, fetchPoll } from "./api.js"
+import { fetchPolls, fetchPoll, fetchPollCounts } from "./api.js"
 import { els } from "./dom.js"
+import { uiState } from "./state.js"
 
 export function setSelectedPoll(pollId) {
   els.pollId().value = pollId
@@ -21,6 +22,8 @@ export function renderSelectedPollInList(selectedPollId) {
 export async function refreshPollList() {
   const data = await fetchPolls()
   const pollIds = data.poll_ids || []
+  // one round trip for the totals of every listed poll
+  uiState.pollCounts = pollIds.length > 0 ? await fetchPollCounts(pollIds) : {}
 
   const pollList = els.pollList()
   const pollInput = els.pollId()
@@ -48,6 +51,15 @@ export async function refreshPollList() {
     btn.dataset.pollId = pollId
     btn.textContent = pollId
 
+    const poll = uiState.pollCounts[pollId]
+    if (poll) {
+      const total = Object.values(poll.counts || {}).reduce((a, b) => a + b, 0)
+      const meta = document.createElement("span")
+      meta.className = "poll-list-total"
+      meta.textContent = poll.closed ? `${total} · closed` : String(total)
+      btn.appendChild(meta)
+    }
+
     if (isExistingPoll && pollId === selectedPollId) {
       btn.classList.add("active")
     }
@@ -63,7 +75,9 @@ export async function refreshPollList() {
   renderSelectedPollInList(isExistingPoll ? selectedPollId : "")
 }
 
-export async function refreshPoll() {
+// useBatch: reuse the counts of the last refreshPollList() instead of a
+// GET /poll/{id}, unless a session token is pending for the poll
+export async function refreshPoll({ useBatch = false } = {}) {
   const pollId = els.pollId().value.trim()
   const tbody = els.pollTableBody()
 
@@ -76,7 +90,9 @@ export async function refreshPoll() {
 
   renderSelectedPollInList(pollId)
 
-  const data = await fetchPoll(pollId)
+  const token = uiState.sessionTokens[pollId]
+  const cached = useBatch && !token ? uiState.pollCounts[pollId] : undefined
+  const data = cached ? { poll_id: pollId, ...cached } : await fetchPoll(pollId, token)
 
   tbody.innerHTML = ""
 
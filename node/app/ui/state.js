@@ -1,3 +1,7 @@
 export const uiState = {
   refreshIntervalMs: 2000,
+  // last session token per poll, returned by /vote (read-your-writes)
+  sessionTokens: {},
+  // counts and closed flag per poll from the last batched read
+  pollCounts: {},
 }
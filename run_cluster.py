@@ -1,12 +1,59 @@
 from pathlib import Path
+from typing import NamedTuple, Optional
+import ipaddress
+import os
 import subprocess
 import sys
 
 OUT_FILE = Path("docker-compose.generated.yml")
 NGINX_FILE = Path("nginx.conf")
 
-
-def build_node_service(node_index: int, total_nodes: int, expose_node_ports: bool = False) -> str:
+# The proxy gets a fixed address so that nodes can trust its X-Real-IP
+# header (TRUSTED_PROXIES) and nobody else's. Other containers draw their
+# addresses from the upper half of the subnet (ip_range), which does not
+# contain the proxy's.
+DEFAULT_SUBNET_BASE = "172.30.0.0"
+DEFAULT_SUBNET_PREFIX = 24
+
+
+class ClusterNetwork(NamedTuple):
+    subnet: str
+    ip_range: str
+    proxy_ip: str
+
+
+def cluster_network(total_nodes: int, subnet: Optional[str] = None) -> ClusterNetwork:
+    """
+    Subnet for the cluster. Without `subnet`, a /24 at DEFAULT_SUBNET_BASE,
+    widened until its upper half holds every node. A given subnet must be
+    large enough; a bare address (no /prefix) is sized the same way.
+    """
+    if subnet is None:
+        subnet = DEFAULT_SUBNET_BASE
+
+    if "/" in subnet:
+        network = ipaddress.IPv4Network(subnet, strict=True)
+    else:
+        # upper half minus its broadcast address holds the nodes
+        prefix = DEFAULT_SUBNET_PREFIX
+        while 2 ** (32 - prefix) // 2 - 1 < total_nodes:
+            prefix -= 1
+        network = ipaddress.IPv4Network(f"{subnet}/{prefix}", strict=True)
+
+    ip_range = list(network.subnets(prefixlen_diff=1))[1] if network.prefixlen < 31 else None
+    if ip_range is None or ip_range.num_addresses - 1 < total_nodes:
+        raise ValueError(f"subnet {network} is too small for {total_nodes} nodes")
+
+    # .1 is the gateway
+    return ClusterNetwork(str(network), str(ip_range), str(network.network_address + 2))
+
+
+def build_node_service(
+    node_index: int,
+    total_nodes: int,
+    net: ClusterNetwork,
+    expose_node_ports: bool = False,
+) -> str:
     node_name = f"node{node_index}"
     port = 8000 + node_index
 
@@ -29,13 +76,14 @@ def build_node_service(node_index: int, total_nodes: int, expose_node_ports: boo
       - CLUSTER_SIZE={total_nodes}
       - BASE_STARTUP_DELAY=4
       - DATA_DIR=/data
+      - TRUSTED_PROXIES={net.proxy_ip}
 {ports_block}    volumes:
       - {node_name}_data:/data
 """
 
 
-def build_proxy_service() -> str:
-    return """  proxy:
+def build_proxy_service(net: ClusterNetwork) -> str:
+    return f"""  proxy:
     image: nginx:alpine
     depends_on:
       - node1
@@ -43,25 +91,105 @@ def build_proxy_service() -> str:
       - "18080:80"
     volumes:
       - ./nginx.conf:/etc/nginx/nginx.conf:ro
+    networks:
+      default:
+        ipv4_address: {net.proxy_ip}
 """
 
 
-def build_compose(total_nodes: int, expose_node_ports: bool = False) -> str:
+def build_compose(total_nodes: int, net: ClusterNetwork, expose_node_ports: bool = False) -> str:
     node_services = "".join(
-        build_node_service(i, total_nodes, expose_node_ports)
+        build_node_service(i, total_nodes, net, expose_node_ports)
         for i in range(1, total_nodes + 1)
     )
-    proxy_service = build_proxy_service()
+    proxy_service = build_proxy_service(net)
     volumes = "".join(f"  node{i}_data:\n" for i in range(1, total_nodes + 1))
 
     return f"""services:
 {proxy_service}{node_services}
+networks:
+  default:
+    ipam:
+      config:
+        - subnet: {net.subnet}
+          ip_range: {net.ip_range}
+
 volumes:
 {volumes}
 """
 
 
-def build_nginx_conf(total_nodes: int) -> str:
+LB_KEEPALIVE = 32
+LB_MAX_FAILS = 2
+LB_FAIL_TIMEOUT = "5s"
+
+
+def build_lb_upstreams(total_nodes: int, sticky: bool = False) -> str:
+    """
+    Upstreams for the load-balanced entry point.
+    Open-source nginx has no active health checks, so node health is tracked
+    passively: a node that fails LB_MAX_FAILS requests is skipped for
+    LB_FAIL_TIMEOUT.
+    """
+    servers = "".join(
+        f"        server node{i}:{8000 + i} max_fails={LB_MAX_FAILS} fail_timeout={LB_FAIL_TIMEOUT};\n"
+        for i in range(1, total_nodes + 1)
+    )
+
+    upstreams = f"""    upstream cluster_lc {{
+        least_conn;
+{servers}        keepalive {LB_KEEPALIVE};
+    }}
+"""
+
+    if sticky:
+        # hash and least_conn cannot be combined in one upstream.
+        upstreams += f"""
+    # poll_id from /poll/<id>/... or from the X-Poll-Id header (for /vote,
+    # whose poll_id is in the body). Requests without one spread randomly.
+    map $uri $poll_from_uri {{
+        ~^/poll/(?<pid>[^/]+) $pid;
+        default "";
+    }}
+
+    map "$http_x_poll_id$poll_from_uri" $poll_key {{
+        "" $request_id;
+        default "$http_x_poll_id$poll_from_uri";
+    }}
+
+    upstream cluster_sticky {{
+        hash $poll_key consistent;
+{servers}        keepalive {LB_KEEPALIVE};
+    }}
+"""
+
+    return upstreams
+
+
+def build_lb_locations(sticky: bool = False) -> str:
+    upstream = "cluster_sticky" if sticky else "cluster_lc"
+    proxy_block = f"""            proxy_pass http://{upstream};
+            proxy_http_version 1.1;
+            proxy_set_header Connection "";
+            proxy_set_header Host $host;
+            proxy_set_header X-Real-IP $remote_addr;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header X-Forwarded-Proto $scheme;
+            proxy_next_upstream error timeout http_502 http_504;
+            proxy_next_upstream_tries 2;
+            proxy_connect_timeout 1s;"""
+
+    return "".join(
+        f"""        location {path} {{
+{proxy_block}
+        }}
+
+"""
+        for path in ("= /vote", "/poll/", "/polls")
+    )
+
+
+def build_nginx_conf(total_nodes: int, load_balance: bool = False, sticky: bool = False) -> str:
     locations = []
 
     for i in range(1, total_nodes + 1):
@@ -83,10 +211,13 @@ def build_nginx_conf(total_nodes: int) -> str:
 
     joined_locations = "\n".join(locations)
 
+    upstreams = build_lb_upstreams(total_nodes, sticky) + "\n" if load_balance else ""
+    lb_locations = build_lb_locations(sticky) if load_balance else ""
+
     return f"""events {{}}
 
 http {{
-    server {{
+{upstreams}    server {{
         listen 80;
 
         location = / {{
@@ -94,18 +225,24 @@ http {{
             return 200 "<html><body><h1>Distributed Voting Cluster</h1><p>Open a node UI at <code>/node/1/</code>, <code>/node/2/</code>, ...</p></body></html>";
         }}
 
-{joined_locations}
+{lb_locations}{joined_locations}
     }}
 }}
 """
 
 
-def generate_files(total_nodes: int, expose_node_ports: bool = False) -> None:
-    OUT_FILE.write_text(build_compose(total_nodes, expose_node_ports), encoding="utf-8")
-    NGINX_FILE.write_text(build_nginx_conf(total_nodes), encoding="utf-8")
+def generate_files(
+    total_nodes: int,
+    net: ClusterNetwork,
+    expose_node_ports: bool = False,
+    load_balance: bool = False,
+    sticky: bool = False,
+) -> None:
+    OUT_FILE.write_text(build_compose(total_nodes, net, expose_node_ports), encoding="utf-8")
+    NGINX_FILE.write_text(build_nginx_conf(total_nodes, load_balance, sticky), encoding="utf-8")
     print(
-        f"Generated {OUT_FILE} and {NGINX_FILE} for {total_nodes} nodes "
-        f"(expose_node_ports={expose_node_ports})."
+        f"Generated {OUT_FILE} and {NGINX_FILE} for {total_nodes} nodes on {net.subnet} "
+        f"(expose_node_ports={expose_node_ports}, load_balance={load_balance}, sticky={sticky})."
     )
 
 
@@ -119,9 +256,13 @@ def build_node_image() -> None:
     subprocess.run(cmd, check=True)
 
 
+SUPPORTED_FLAGS = ("--expose-nodes", "--load-balance", "--sticky", "--subnet=<cidr>")
+USAGE = "Usage: python run_cluster.py <num_nodes> [--expose-nodes] [--load-balance] [--sticky] [--subnet=<cidr>]"
+
+
 def main():
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("Usage: python run_cluster.py <num_nodes> [--expose-nodes]")
+    if len(sys.argv) < 2:
+        print(USAGE)
         sys.exit(1)
 
     try:
@@ -134,14 +275,29 @@ def main():
         print("Error: <num_nodes> must be at least 1.")
         sys.exit(1)
 
-    expose_node_ports = False
-    if len(sys.argv) == 3:
-        if sys.argv[2] != "--expose-nodes":
-            print("Error: only supported optional flag is --expose-nodes")
+    subnet = os.environ.get("CLUSTER_SUBNET") or None
+    flags = []
+    for flag in sys.argv[2:]:
+        if flag.startswith("--subnet="):
+            subnet = flag.split("=", 1)[1]
+        elif flag in SUPPORTED_FLAGS:
+            flags.append(flag)
+        else:
+            print(f"Error: supported optional flags are {', '.join(SUPPORTED_FLAGS)}")
             sys.exit(1)
-        expose_node_ports = True
 
-    generate_files(total_nodes, expose_node_ports)
+    try:
+        net = cluster_network(total_nodes, subnet)
+    except ValueError as e:
+        print(f"Error: invalid subnet: {e}")
+        sys.exit(1)
+
+    expose_node_ports = "--expose-nodes" in flags
+    sticky = "--sticky" in flags
+    # --sticky only makes sense on top of the load-balanced entry point
+    load_balance = "--load-balance" in flags or sticky
+
+    generate_files(total_nodes, net, expose_node_ports, load_balance, sticky)
     build_node_image()
     run_compose()
 
@@ -0,0 +1,74 @@
+. "$PSScriptRoot/common.ps1"
+
+$poll = "test_close"
+$ErrorActionPreference = "Stop"
+
+Print-Step "Submit votes"
+Vote 1 $poll "A" | Out-Null
+Vote 2 $poll "B" | Out-Null
+
+Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 1 1 30 | Out-Null
+
+Print-Step "Close the poll on node2"
+Close-Poll 2 $poll | Out-Null
+
+Print-Step "Wait until every node sees the poll as closed"
+$deadline = (Get-Date).AddSeconds(30)
+$allClosed = $false
+
+while ((Get-Date) -lt $deadline) {
+    $allClosed = $true
+    foreach ($nodeId in @(1, 2, 3)) {
+        $r = Get-Poll $nodeId $poll
+        Write-Host "Node $nodeId -> closed=$($r.closed)"
+        if (-not $r.closed) {
+            $allClosed = $false
+        }
+    }
+
+    if ($allClosed) {
+        break
+    }
+
+    Start-Sleep -Seconds 1
+}
+
+if (-not $allClosed) {
+    throw "Close of poll '$poll' did not reach every node"
+}
+
+Print-Step "Votes on a closed poll are rejected"
+foreach ($nodeId in @(1, 2, 3)) {
+    $status = $null
+    try {
+        Vote $nodeId $poll "A" | Out-Null
+    } catch {
+        $status = [int]$_.Exception.Response.StatusCode
+    }
+
+    if ($status -ne 409) {
+        throw "Expected 409 from node $nodeId for a vote on closed poll, got '$status'"
+    }
+}
+
+Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 1 1 15 | Out-Null
+
+Print-Step "Closing an unknown poll is rejected"
+$unknown = "test_close_unknown"
+$status = $null
+try {
+    Close-Poll 1 $unknown | Out-Null
+} catch {
+    $status = [int]$_.Exception.Response.StatusCode
+}
+
+if ($status -ne 404) {
+    throw "Expected 404 for closing unknown poll '$unknown', got '$status'"
+}
+
+$polls = (Invoke-RestMethod "$(Get-DirectNodeUrl 1)/polls").poll_ids
+if ($polls -contains $unknown) {
+    throw "Closing unknown poll '$unknown' created it"
+}
+
+Print-Ok "Closed polls are replicated and frozen"
@@ -0,0 +1,63 @@
+. "$PSScriptRoot/common.ps1"
+
+$ErrorActionPreference = "Stop"
+$pollPrefix = "test_lag"
+$pollCount = 3000
+$maxLagMs = 250
+$nodes = @(1, 2, 3)
+
+Print-Step "Reset profiling counters"
+foreach ($nodeId in $nodes) {
+    Reset-Profile $nodeId | Out-Null
+}
+
+Print-Step "Merge a large state into node1 ($pollCount polls)"
+$polls = @{}
+for ($i = 0; $i -lt $pollCount; $i++) {
+    $polls["${pollPrefix}_$i"] = @{
+        counts = @{ A = @{ loadgen = 1 }; B = @{ loadgen = 1 } }
+        closed = $false
+    }
+}
+$body = @{ polls = $polls } | ConvertTo-Json -Depth 10 -Compress
+
+Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl 1)/internal/cluster-merge" `
+    -ContentType "application/json" `
+    -Headers (Get-InternalHeaders) `
+    -Body $body `
+    -TimeoutSec 120 | Out-Null
+
+Print-Step "Vote while the state spreads through anti-entropy and checkpoints"
+for ($i = 0; $i -lt 30; $i++) {
+    Vote 2 "${pollPrefix}_votes" "A" | Out-Null
+}
+
+Wait-UntilAllNodesPollCounts $nodes "${pollPrefix}_$($pollCount - 1)" 1 1 60 | Out-Null
+Wait-UntilAllNodesPollCounts $nodes "${pollPrefix}_votes" 30 0 30 | Out-Null
+
+# at least one checkpoint of the merged state on every node
+Wait-Seconds 16
+
+Print-Step "Event-loop lag stayed under $maxLagMs ms"
+foreach ($nodeId in $nodes) {
+    $p = Get-Profile $nodeId
+    $lag = [double]$p.loop_lag.max_ms
+    $hold = [double]$p.locks.state_lock.hold.max_ms
+    Write-Host "Node $nodeId -> loop lag max=$lag ms, state_lock hold max=$hold ms"
+
+    if ($lag -ge $maxLagMs) {
+        throw "Node $nodeId event-loop lag reached $lag ms (limit $maxLagMs ms)"
+    }
+}
+
+Print-Step "No peer was suspected meanwhile"
+foreach ($nodeId in $nodes) {
+    $status = Get-Status $nodeId
+    foreach ($peer in $status.peers) {
+        if ($peer.state -ne "ALIVE") {
+            throw "Node $nodeId sees $($peer.peer) as $($peer.state)"
+        }
+    }
+}
+
+Print-Ok "Checkpoints and heavy merges do not stall the event loop"
@@ -0,0 +1,103 @@
+. "$PSScriptRoot/common.ps1"
+
+$poll = "test_membership"
+$node3Url = "http://node3:8003"
+$ErrorActionPreference = "Stop"
+
+function Test-IsPeer($nodeId, $url) {
+    return (Get-Membership $nodeId).peers -contains $url
+}
+
+function Wait-Membership($nodeIds, $url, $expected, $timeoutSec = 30) {
+    $deadline = (Get-Date).AddSeconds($timeoutSec)
+    while ((Get-Date) -lt $deadline) {
+        $ok = $true
+        foreach ($nodeId in $nodeIds) {
+            $isPeer = Test-IsPeer $nodeId $url
+            Write-Host "Node $nodeId -> $url member=$isPeer"
+            if ($isPeer -ne $expected) {
+                $ok = $false
+            }
+        }
+
+        if ($ok) {
+            return
+        }
+        Start-Sleep -Seconds 1
+    }
+
+    throw "Membership of $url did not become '$expected' on nodes $nodeIds"
+}
+
+function Get-MemberRow($nodeId, $url) {
+    return (Get-Membership $nodeId).members | Where-Object { $_.url -eq $url }
+}
+
+try {
+    Print-Step "Stop node3 and remove it from the cluster (requested on node1)"
+    # a running node announces itself again (checked at the end)
+    docker compose -f docker-compose.generated.yml stop node3 | Out-Null
+    Post-Membership 1 "leave" @{ url = $node3Url } | Out-Null
+
+    Print-Step "Wait until the leave has spread through gossip"
+    Wait-Membership @(1, 2) $node3Url $false 30
+
+    $status = Get-Status 2
+    if ($null -ne (Get-PeerState $status "node3")) {
+        throw "node2 still reports node3 in /status after it left"
+    }
+
+    $size = (Get-Membership 2).tuning.size
+    if ($size -ne 2) {
+        throw "Expected cluster size 2 on node2 after the leave, got $size"
+    }
+
+    Print-Step "Vote while node3 is out"
+    Vote 1 $poll "A" | Out-Null
+    Wait-UntilAllNodesPollCounts @(1, 2) $poll 1 0 30 | Out-Null
+
+    Print-Step "node3 joins again (requested on node2) and starts"
+    Post-Membership 2 "join" @{ url = $node3Url; node_id = "node3" } | Out-Null
+    Wait-Membership @(1, 2) $node3Url $true 30
+    docker compose -f docker-compose.generated.yml start node3 | Out-Null
+    Wait-HttpReadyDirect 3 45
+
+    $aliveAgain = Wait-ForPeerState `
+        -observerUrl (Get-DirectNodeUrl 1) `
+        -peerName "node3" `
+        -expectedStates @("ALIVE") `
+        -timeoutSec 30 `
+        -intervalSec 1
+
+    if (-not $aliveAgain) {
+        throw "node1 did not see node3 ALIVE after the rejoin"
+    }
+
+    Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 1 0 40 | Out-Null
+
+    Print-Step "Remove node3 while it is running"
+    $left = Post-Membership 1 "leave" @{ url = $node3Url }
+    $leftVersion = [int](($left.members | Where-Object { $_.url -eq $node3Url }).version)
+
+    $deadline = (Get-Date).AddSeconds(30)
+    $row = $null
+    while ((Get-Date) -lt $deadline) {
+        $row = Get-MemberRow 1 $node3Url
+        Write-Host "Node 1 -> node3 row status=$($row.status) version=$($row.version) (left at $leftVersion)"
+        if ($row.status -eq "active" -and [int]$row.version -gt $leftVersion) {
+            break
+        }
+        Start-Sleep -Seconds 1
+    }
+
+    if ($row.status -ne "active" -or [int]$row.version -le $leftVersion) {
+        throw "node3 did not announce itself again after being marked as left"
+    }
+    Wait-Membership @(1, 2) $node3Url $true 30
+
+    Print-Ok "Leave and join spread through gossip; a running node stays a member"
+}
+finally {
+    docker compose -f docker-compose.generated.yml start node3 | Out-Null
+    Wait-HttpReadyDirect 3 45
+}
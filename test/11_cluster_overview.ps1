@@ -0,0 +1,38 @@
+. "$PSScriptRoot/common.ps1"
+
+$poll = "test_overview"
+$ErrorActionPreference = "Stop"
+
+Print-Step "Wait until the cluster overview reports convergence"
+$overview = Wait-UntilClusterConverged 1 60
+
+foreach ($observer in $overview.membership.PSObject.Properties) {
+    foreach ($peer in $observer.Value.PSObject.Properties) {
+        if ($peer.Value -ne "ALIVE" -and $peer.Value -ne "SELF") {
+            throw "$($observer.Name) sees $($peer.Name) as $($peer.Value)"
+        }
+    }
+}
+
+if (-not $overview.membership_agrees) {
+    throw "Nodes report different membership tables"
+}
+
+Print-Step "Write one component on node2 only"
+$upd = @{ poll_id = $poll; option = "A"; node_id = "node_overview"; value = 3 }
+Post-InternalUpdate 8002 $upd (Get-InternalHeaders) | Out-Null
+
+$overview = Get-ClusterOverview 1 -Refresh
+Write-Host "converged=$($overview.converged) divergent=$($overview.divergent_polls_total)"
+
+# anti-entropy may already have copied it; until then the poll must be listed
+if (-not $overview.converged -and $null -eq $overview.divergent_polls.PSObject.Properties[$poll]) {
+    $json = $overview | ConvertTo-Json -Depth 10
+    throw "Cluster is not converged but '$poll' is not among the divergent polls: $json"
+}
+
+Print-Step "Wait until anti-entropy removes the divergence"
+Wait-UntilClusterConverged 1 60 | Out-Null
+Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 3 0 15 | Out-Null
+
+Print-Ok "Cluster overview tracks membership and convergence"
@@ -0,0 +1,63 @@
+. "$PSScriptRoot/common.ps1"
+
+$poll = "test_batch"
+$unknown = "test_batch_unknown"
+$ErrorActionPreference = "Stop"
+
+Print-Step "Submit votes"
+Vote 1 $poll "A" | Out-Null
+Vote 1 $poll "A" | Out-Null
+Vote 2 $poll "B" | Out-Null
+
+Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 2 1 30 | Out-Null
+
+Print-Step "Batched read with a duplicate id, an unknown poll and per_node"
+$r = Get-PollsCounts 3 @($poll, $unknown, $poll) -PerNode
+$r | ConvertTo-Json -Depth 10
+
+$ids = @($r.polls.PSObject.Properties.Name)
+if ($ids.Count -ne 2 -or $ids -notcontains $poll -or $ids -notcontains $unknown) {
+    throw "Expected exactly '$poll' and '$unknown' once each, got: $($ids -join ', ')"
+}
+
+$entry = $r.polls.$poll
+$a = Get-CountValue $entry.counts "A"
+$b = Get-CountValue $entry.counts "B"
+if ($a -ne 2 -or $b -ne 1 -or $entry.closed) {
+    throw "Expected A=2 B=1 open for '$poll', got A=$a B=$b closed=$($entry.closed)"
+}
+
+$fromNode1 = Get-CountValue $entry.nodes.A "node1"
+$fromNode2 = Get-CountValue $entry.nodes.B "node2"
+if ($fromNode1 -ne 2 -or $fromNode2 -ne 1) {
+    throw "Expected per_node A.node1=2 B.node2=1, got A.node1=$fromNode1 B.node2=$fromNode2"
+}
+
+$missing = $r.polls.$unknown
+if (@($missing.counts.PSObject.Properties).Count -ne 0 -or $missing.closed) {
+    throw "Expected no counts and closed=false for '$unknown', got: $($missing | ConvertTo-Json -Depth 10)"
+}
+Print-Ok "Duplicates are collapsed, unknown polls are empty, per_node carries the components"
+
+Print-Step "Without per_node there are no components"
+$r = Get-PollsCounts 3 @($poll)
+if ($null -ne $r.polls.$poll.PSObject.Properties["nodes"]) {
+    throw "'nodes' returned without per_node"
+}
+
+Print-Step "More than POLL_BATCH_MAX ids are rejected"
+$max = if ($env:POLL_BATCH_MAX) { [int]$env:POLL_BATCH_MAX } else { 1000 }
+$tooMany = 1..($max + 1) | ForEach-Object { "batch_$_" }
+
+$status = $null
+try {
+    Get-PollsCounts 3 $tooMany | Out-Null
+} catch {
+    $status = [int]$_.Exception.Response.StatusCode
+}
+
+if ($status -ne 422) {
+    throw "Expected 422 for $($max + 1) poll ids, got '$status'"
+}
+
+Print-Ok "Batched poll read works"
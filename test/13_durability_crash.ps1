@@ -0,0 +1,55 @@
+. "$PSScriptRoot/common.ps1"
+
+$poll = "test_durability_crash"
+$ErrorActionPreference = "Stop"
+
+try {
+    Print-Step "Memory vote on node1"
+    $memory = Vote-WithDurability 1 $poll "A" "memory"
+    $memoryComponent = $memory.update.node_id
+
+    if ($memoryComponent -notlike "node1@*") {
+        throw "Expected a per-boot component 'node1@<epoch>' for a memory vote, got '$memoryComponent'"
+    }
+
+    Print-Step "Group vote on node1"
+    # counted before its flush completes, so it must not use component 'node1'
+    $group = Vote-WithDurability 1 $poll "A" "group"
+    if ($group.update.node_id -ne $memoryComponent) {
+        throw "Expected the group vote in '$memoryComponent', got '$($group.update.node_id)'"
+    }
+
+    # only wait for one peer: node1 must crash before its next checkpoint
+    Wait-UntilPollCounts 2 $poll 2 0 15 | Out-Null
+
+    Print-Step "Crash node1 (SIGKILL) and restart it"
+    docker compose -f docker-compose.generated.yml kill node1 | Out-Null
+    docker compose -f docker-compose.generated.yml start node1 | Out-Null
+    Wait-HttpReadyDirect 1 45
+
+    Print-Step "fsync vote on node1 after the restart"
+    $fsync = Vote-WithDurability 1 $poll "A" "fsync"
+
+    if ($fsync.update.node_id -ne "node1") {
+        throw "Expected the fsync vote in component 'node1', got '$($fsync.update.node_id)'"
+    }
+
+    $restarted = Vote-WithDurability 1 $poll "B" "memory"
+    if ($restarted.update.node_id -eq $memoryComponent) {
+        throw "Memory votes reuse component '$memoryComponent' after a restart"
+    }
+
+    $restartedGroup = Vote-WithDurability 1 $poll "B" "group"
+    if ($restartedGroup.update.node_id -ne $restarted.update.node_id) {
+        throw "Expected the group vote in '$($restarted.update.node_id)', got '$($restartedGroup.update.node_id)'"
+    }
+
+    Print-Step "All three A votes survive on every node"
+    Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 3 2 40 | Out-Null
+
+    Print-Ok "A crash after memory and group votes does not mask later votes"
+}
+finally {
+    docker compose -f docker-compose.generated.yml start node1 | Out-Null
+    Wait-HttpReadyDirect 1 45
+}
@@ -0,0 +1,66 @@
+. "$PSScriptRoot/common.ps1"
+
+$ErrorActionPreference = "Stop"
+
+function Test-WalHasUpdate($nodeId, $upd) {
+    foreach ($rec in Get-WalRecords $nodeId) {
+        if ($rec.kind -eq "counter_update" -and
+            $rec.poll_id -eq $upd.poll_id -and
+            $rec.option -eq $upd.option -and
+            $rec.node_id -eq $upd.node_id -and
+            [int]$rec.value -eq [int]$upd.value) {
+            return $true
+        }
+    }
+    return $false
+}
+
+function Assert-DurabilityResponse($r, $level) {
+    if ($r.durability.level -ne $level) {
+        throw "Expected durability level '$level', got '$($r.durability.level)'"
+    }
+
+    $component = $r.update.node_id
+    if ($level -eq "fsync") {
+        if ($component -ne "node1") {
+            throw "Expected a '$level' vote in component 'node1', got '$component'"
+        }
+    } elseif ($component -notlike "node1@*") {
+        throw "Expected a '$level' vote in a per-boot component 'node1@<epoch>', got '$component'"
+    }
+
+    if ($level -eq "replicated" -and [int]$r.durability.acks -lt 1 -and $r.durability.fallback -ne "group") {
+        throw "Replicated vote got $($r.durability.acks) acks and no group fallback"
+    }
+}
+
+foreach ($level in @("fsync", "group", "replicated")) {
+    Print-Step "'$level' vote is acknowledged and written to the WAL"
+    $poll = "test_durability_$level"
+    $found = $false
+
+    # a checkpoint between the vote and the read empties the WAL: vote again
+    for ($attempt = 1; $attempt -le 3 -and -not $found; $attempt++) {
+        $r = Vote-WithDurability 1 $poll "A" $level
+        Write-Host "Attempt $attempt -> $($r.durability | ConvertTo-Json -Compress) component=$($r.update.node_id) value=$($r.update.value)"
+        Assert-DurabilityResponse $r $level
+        $found = Test-WalHasUpdate 1 $r.update
+    }
+
+    if (-not $found) {
+        throw "No WAL record on node1 for the '$level' vote on '$poll'"
+    }
+    Print-Ok "'$level' vote acknowledged and found in the WAL"
+}
+
+Print-Step "'memory' vote is acknowledged without a WAL record"
+$poll = "test_durability_memory"
+$r = Vote-WithDurability 1 $poll "A" "memory"
+Assert-DurabilityResponse $r "memory"
+
+if (Test-WalHasUpdate 1 $r.update) {
+    throw "Found a WAL record on node1 for the memory vote on '$poll'"
+}
+
+Wait-UntilAllNodesPollCounts @(1, 2, 3) $poll 1 0 30 | Out-Null
+Print-Ok "'memory' vote has no WAL record and still reaches every node"
@@ -15,10 +15,28 @@ function Vote($nodeId, $poll, $option) {
         -Body "{""poll_id"":""$poll"",""option"":""$option""}"
 }
 
+function Vote-WithDurability($nodeId, $poll, $option, $level) {
+    $body = @{ poll_id = $poll; option = $option; durability = $level } | ConvertTo-Json
+    Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl $nodeId)/vote" `
+        -ContentType "application/json" `
+        -Body $body
+}
+
+function Close-Poll($nodeId, $poll) {
+    Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl $nodeId)/poll/$poll/close"
+}
+
 function Get-Poll($nodeId, $poll) {
     Invoke-RestMethod "$(Get-DirectNodeUrl $nodeId)/poll/$poll"
 }
 
+function Get-PollsCounts($nodeId, $pollIds, [switch]$PerNode) {
+    $body = @{ poll_ids = @($pollIds); per_node = [bool]$PerNode } | ConvertTo-Json -Depth 5
+    Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl $nodeId)/polls/counts" `
+        -ContentType "application/json" `
+        -Body $body
+}
+
 function Get-Status($nodeId) {
     Invoke-RestMethod "$(Get-DirectNodeUrl $nodeId)/status"
 }
@@ -34,6 +52,69 @@ function Post-InternalUpdate($port, $updateObj, $headers = @{}) {
         -Body ($updateObj | ConvertTo-Json -Depth 10)
 }
 
+function Get-InternalHeaders {
+    $headers = @{}
+    if ($env:INTERNAL_TOKEN) {
+        $headers["X-Internal-Token"] = $env:INTERNAL_TOKEN
+    }
+    return $headers
+}
+
+function Get-WalRecords($nodeId) {
+    # every WAL segment, oldest first (see storage.py)
+    $lines = docker compose -f docker-compose.generated.yml exec -T "node$nodeId" `
+        sh -c "cat /data/wal.compacted.jsonl /data/wal.sealed.jsonl /data/wal.jsonl 2>/dev/null; true"
+    return @($lines | Where-Object { $_ } | ForEach-Object { $_ | ConvertFrom-Json })
+}
+
+function Get-Profile($nodeId) {
+    Invoke-RestMethod "$(Get-DirectNodeUrl $nodeId)/internal/profile" -Headers (Get-InternalHeaders)
+}
+
+function Reset-Profile($nodeId) {
+    Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl $nodeId)/internal/profile/reset" -Headers (Get-InternalHeaders)
+}
+
+function Get-Membership($nodeId) {
+    Invoke-RestMethod "$(Get-DirectNodeUrl $nodeId)/internal/membership" -Headers (Get-InternalHeaders)
+}
+
+function Post-Membership($nodeId, $action, $bodyObj) {
+    Invoke-RestMethod -Method POST "$(Get-DirectNodeUrl $nodeId)/internal/membership/$action" `
+        -ContentType "application/json" `
+        -Headers (Get-InternalHeaders) `
+        -Body ($bodyObj | ConvertTo-Json -Depth 10)
+}
+
+function Get-ClusterOverview($nodeId, [switch]$Refresh) {
+    $query = if ($Refresh) { "?refresh=true" } else { "" }
+    Invoke-RestMethod "$(Get-DirectNodeUrl $nodeId)/cluster/overview$query"
+}
+
+function Wait-UntilClusterConverged($nodeId, $timeoutSec = 40) {
+    $deadline = (Get-Date).AddSeconds($timeoutSec)
+    $last = $null
+
+    while ((Get-Date) -lt $deadline) {
+        try {
+            $last = Get-ClusterOverview $nodeId -Refresh
+            Write-Host "Overview from node $nodeId -> converged=$($last.converged) divergent=$($last.divergent_polls_total)"
+
+            if ($last.converged) {
+                return $last
+            }
+        }
+        catch {
+            Write-Host "Overview from node $nodeId -> not reachable yet"
+        }
+
+        Start-Sleep -Seconds 1
+    }
+
+    $lastJson = $last | ConvertTo-Json -Depth 10
+    throw "Timeout waiting for the cluster to converge (seen from node $nodeId). Last overview: $lastJson"
+}
+
 function Wait-Seconds($s) {
     Start-Sleep -Seconds $s
 }
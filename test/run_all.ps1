@@ -48,6 +48,13 @@ try {
     & "$PSScriptRoot\05_idempotent_internal_update.ps1"
     & "$PSScriptRoot\06_concurrent_updates_convergence.ps1"
     & "$PSScriptRoot\07_network_partition_healing.ps1"
+    & "$PSScriptRoot\08_poll_close.ps1"
+    & "$PSScriptRoot\09_loop_lag.ps1"
+    & "$PSScriptRoot\10_membership.ps1"
+    & "$PSScriptRoot\11_cluster_overview.ps1"
+    & "$PSScriptRoot\12_poll_batch.ps1"
+    & "$PSScriptRoot\13_durability_crash.ps1"
+    & "$PSScriptRoot\14_durability_levels.ps1"
 
     Write-Host "`nAll tests completed." -ForegroundColor Green
     exit 0